@@ -0,0 +1,84 @@
+import os
+import threading
+import traceback
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence
+
+
+INSERTADA = 'insertada'
+MODIFICADA = 'modificada'
+BORRADA = 'borrada'
+
+
+@dataclass(frozen=True)
+class RegistroDimension:
+    """Valores de una fila de dimensiones tal como quedaron en la base."""
+    paciente: str                   # código del paciente
+    pensamiento: str                # código del pensamiento
+    fecha: str                      # AAAA-MM-DD
+    cantidad: int
+    duracion: Optional[int]
+    intensidad: Optional[int]
+
+
+@dataclass(frozen=True)
+class CambioDimension:
+    """Una fila insertada, modificada o borrada.
+
+    nuevo es None en los borrados y anterior es None en las inserciones.
+    """
+    tipo: str
+    nuevo: Optional[RegistroDimension] = None
+    anterior: Optional[RegistroDimension] = None
+
+
+Suscriptor = Callable[[List[CambioDimension]], None]
+
+
+class BusCambios:
+    """Avisa dentro del proceso de las dimensiones escritas en una base.
+
+    Quien escribe publica los cambios después del commit; cada suscriptor
+    recibe la lista completa en el hilo que publica. El error de un
+    suscriptor se imprime y no impide avisar a los demás.
+    """
+    def __init__(self):
+        self._suscriptores: Dict[int, Suscriptor] = {}
+        self._siguiente = 0
+        self._lock = threading.Lock()
+
+    def suscribir(self, funcion: Suscriptor) -> Callable[[], None]:
+        """Registra funcion y devuelve otra que cancela la suscripción."""
+        with self._lock:
+            clave = self._siguiente
+            self._siguiente += 1
+            self._suscriptores[clave] = funcion
+
+        def cancelar():
+            with self._lock:
+                self._suscriptores.pop(clave, None)
+        return cancelar
+
+    def publicar(self, cambios: Sequence[CambioDimension]):
+        """Entrega los cambios a todos los suscriptores."""
+        if not cambios:
+            return
+        cambios = list(cambios)
+        with self._lock:
+            suscriptores = list(self._suscriptores.values())
+        for funcion in suscriptores:
+            try:
+                funcion(cambios)
+            except Exception:
+                traceback.print_exc()
+
+
+_buses: Dict[str, BusCambios] = {}
+_buses_lock = threading.Lock()
+
+
+def obtener_bus(ruta_db: str) -> BusCambios:
+    """Devuelve el bus compartido de la base, también para sus instantáneas."""
+    clave = os.path.abspath(ruta_db)
+    with _buses_lock:
+        return _buses.setdefault(clave, BusCambios())
@@ -0,0 +1,122 @@
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional, Sequence, Tuple
+
+
+# Límites por defecto: número de resultados y filas retenidas en total
+MAX_ENTRADAS = 256
+MAX_FILAS = 500_000
+
+_LITERALES = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+_ESPACIOS = re.compile(r'\s+')
+
+
+def normalizar_sql(sql: str) -> str:
+    """Compacta los espacios fuera de los literales para que el texto sirva de clave."""
+    partes = _LITERALES.split(sql)
+    for i in range(0, len(partes), 2):
+        partes[i] = _ESPACIOS.sub(' ', partes[i])
+    return ''.join(partes).strip()
+
+
+@dataclass
+class Entrada:
+    valor: Any
+    filas: int
+    version: int
+
+
+class CacheConsultas:
+    """Caché LRU de resultados de consultas de lectura.
+
+    La clave es el SQL normalizado más los parámetros. Cada resultado se
+    guarda con el PRAGMA data_version leído antes de calcularlo en una
+    conexión propia que nunca escribe; como ese valor cambia con cualquier
+    commit de otra conexión (del pool o de otro proceso), un resultado solo
+    se sirve mientras la base no haya cambiado desde que se leyó.
+    Quien lea de otra fuente puede pasar su propia función version.
+    """
+    def __init__(self, ruta_db: str, max_entradas: int = MAX_ENTRADAS,
+                 max_filas: int = MAX_FILAS, version: Optional[Callable[[], int]] = None):
+        self.ruta_db = ruta_db
+        if version is not None:
+            self.version = version
+        self.max_entradas = max_entradas
+        self.max_filas = max_filas
+        self.aciertos = 0
+        self.fallos = 0
+        self._entradas: 'OrderedDict[Hashable, Entrada]' = OrderedDict()
+        self._filas = 0
+        self._lock = threading.Lock()
+        self._vigia: Optional[sqlite3.Connection] = None
+        self._vigia_lock = threading.Lock()
+
+    def version(self) -> int:
+        """Devuelve el data_version actual de la base."""
+        with self._vigia_lock:
+            if self._vigia is None:
+                self._vigia = sqlite3.connect(self.ruta_db, check_same_thread=False,
+                                              isolation_level=None)
+            return self._vigia.execute('PRAGMA data_version').fetchone()[0]
+
+    def clave(self, sql: str, parametros: Sequence[Any] = (),
+              forma: Hashable = None) -> Tuple[str, tuple, Hashable]:
+        return normalizar_sql(sql), tuple(parametros), forma
+
+    def obtener(self, sql: str, parametros: Sequence[Any], calcular: Callable[[], Any],
+                forma: Hashable = None, filas: Callable[[Any], int] = len) -> Any:
+        """Devuelve el resultado guardado o lo calcula con calcular().
+
+        forma distingue resultados de la misma consulta con distinta
+        estructura (tuplas, diccionarios, DataFrame). El valor devuelto se
+        comparte entre llamadas y no debe modificarse.
+        """
+        clave = self.clave(sql, parametros, forma)
+        version = self.version()
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                if entrada.version == version:
+                    self._entradas.move_to_end(clave)
+                    self.aciertos += 1
+                    return entrada.valor
+                self._quitar(clave)
+            self.fallos += 1
+        valor = calcular()
+        self._guardar(clave, Entrada(valor, filas(valor), version))
+        return valor
+
+    def invalidar(self):
+        """Descarta todos los resultados guardados."""
+        with self._lock:
+            self._entradas.clear()
+            self._filas = 0
+
+    def cerrar(self):
+        """Vacía la caché y cierra la conexión de vigilancia."""
+        self.invalidar()
+        with self._vigia_lock:
+            if self._vigia is not None:
+                self._vigia.close()
+                self._vigia = None
+
+    def _guardar(self, clave: Hashable, entrada: Entrada):
+        """Inserta la entrada y expulsa las menos usadas hasta cumplir los límites."""
+        if entrada.filas > self.max_filas:
+            return
+        with self._lock:
+            if clave in self._entradas:
+                self._quitar(clave)
+            # Lo calculado con una versión antigua ya no es válido
+            for vieja in [c for c, e in self._entradas.items() if e.version < entrada.version]:
+                self._quitar(vieja)
+            self._entradas[clave] = entrada
+            self._filas += entrada.filas
+            while len(self._entradas) > self.max_entradas or self._filas > self.max_filas:
+                self._quitar(next(iter(self._entradas)))
+
+    def _quitar(self, clave: Hashable):
+        self._filas -= self._entradas.pop(clave).filas
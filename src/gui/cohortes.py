@@ -0,0 +1,195 @@
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from motor_estadisticas import Fecha, inicios_periodo, series_periodo
+from servicio_bd import RUTA_DB, ServicioBD, obtener_servicio, pool_procesos
+
+
+# Columnas de pacientes por las que se puede agrupar
+CRITERIOS = ('enfermedad', 'sexo')
+
+SIN_DATO = 'Sin dato'
+
+# Lotes por proceso: más lotes reparten mejor a pacientes con muchos registros
+LOTES_POR_PROCESO = 4
+
+# (código, cohorte, fecha de registro)
+Paciente = Tuple[str, str, Optional[str]]
+
+
+@dataclass
+class ParcialCohortes:
+    """Sumas por cohorte de un grupo de pacientes; se combinan sumándolas.
+
+    Cada paciente aporta su intensidad media en cada periodo donde tiene
+    registros con intensidad, de modo que todos pesan lo mismo en la media
+    de la cohorte.
+    """
+    n_periodos: int
+    semanas: int
+    pacientes: Dict[str, int] = field(default_factory=dict)
+    suma_medias: Dict[str, np.ndarray] = field(default_factory=dict)
+    con_datos: Dict[str, np.ndarray] = field(default_factory=dict)
+    suma_medias_registro: Dict[str, np.ndarray] = field(default_factory=dict)
+    con_datos_registro: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    def _cohorte(self, nombre: str):
+        if nombre not in self.pacientes:
+            self.pacientes[nombre] = 0
+            self.suma_medias[nombre] = np.zeros(self.n_periodos)
+            self.con_datos[nombre] = np.zeros(self.n_periodos, dtype=np.int64)
+            self.suma_medias_registro[nombre] = np.zeros(self.semanas)
+            self.con_datos_registro[nombre] = np.zeros(self.semanas, dtype=np.int64)
+
+    def sumar(self, cohorte: str, medias: np.ndarray, medias_registro: np.ndarray):
+        """Añade las medias de un paciente (NaN donde no tiene datos)."""
+        self._cohorte(cohorte)
+        self.pacientes[cohorte] += 1
+        self.suma_medias[cohorte] += np.nan_to_num(medias)
+        self.con_datos[cohorte] += ~np.isnan(medias)
+        self.suma_medias_registro[cohorte] += np.nan_to_num(medias_registro)
+        self.con_datos_registro[cohorte] += ~np.isnan(medias_registro)
+
+    def combinar(self, otro: 'ParcialCohortes') -> 'ParcialCohortes':
+        for nombre, cuantos in otro.pacientes.items():
+            self._cohorte(nombre)
+            self.pacientes[nombre] += cuantos
+            self.suma_medias[nombre] += otro.suma_medias[nombre]
+            self.con_datos[nombre] += otro.con_datos[nombre]
+            self.suma_medias_registro[nombre] += otro.suma_medias_registro[nombre]
+            self.con_datos_registro[nombre] += otro.con_datos_registro[nombre]
+        return self
+
+
+@dataclass
+class CurvasCohorte:
+    """Trayectorias de intensidad media por cohorte (una fila por cohorte)."""
+    criterio: str
+    resolucion: str
+    periodos: np.ndarray                # datetime64[D], inicio de cada periodo
+    cohortes: np.ndarray
+    pacientes: np.ndarray               # pacientes de cada cohorte
+    intensidad: np.ndarray              # media de las medias por paciente; NaN sin datos
+    con_datos: np.ndarray               # pacientes con intensidad en cada periodo
+    intensidad_registro: np.ndarray     # igual, por semana desde el registro del paciente
+    con_datos_registro: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.cohortes)
+
+
+def _media(suma: np.ndarray, cuantos: np.ndarray) -> np.ndarray:
+    """suma / cuantos con NaN donde cuantos es 0."""
+    resultado = np.full(suma.shape, np.nan)
+    np.divide(suma, cuantos, out=resultado, where=cuantos > 0)
+    return resultado
+
+
+def _vectores_paciente(servicio: ServicioBD, codigo: str, registro: Optional[str], desde: str, hasta: str,
+                       resolucion: str, semanas: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Intensidad media del paciente por periodo y por semana desde su registro."""
+    series = series_periodo(servicio, codigo, desde, hasta, resolucion)
+    suma = np.nan_to_num(series.intensidad) * series.registros_intensidad
+    medias = _media(suma.sum(axis=0), series.registros_intensidad.sum(axis=0))
+
+    medias_registro = np.full(semanas, np.nan)
+    if registro:
+        inicio = np.datetime64(registro[:10], 'D')
+        diarias = series_periodo(servicio, codigo, str(inicio), str(inicio + 7 * semanas - 1), 'dia')
+        if len(diarias):
+            semana = np.arange(len(diarias.periodos)) // 7
+            suma = (np.nan_to_num(diarias.intensidad) * diarias.registros_intensidad).sum(axis=0)
+            registros = diarias.registros_intensidad.sum(axis=0)
+            medias_registro = _media(np.bincount(semana, suma, minlength=semanas),
+                                     np.bincount(semana, registros, minlength=semanas))
+    return medias, medias_registro
+
+
+def procesar_lote(ruta_db: str, pacientes: Sequence[Paciente], desde: str, hasta: str,
+                  resolucion: str, semanas: int) -> ParcialCohortes:
+    """Calcula las sumas parciales de un lote; se ejecuta en un proceso del pool."""
+    servicio = obtener_servicio(ruta_db)
+    parcial = ParcialCohortes(len(inicios_periodo(desde, hasta, resolucion)), semanas)
+    for codigo, cohorte, registro in pacientes:
+        parcial.sumar(cohorte, *_vectores_paciente(servicio, codigo, registro, desde, hasta,
+                                                   resolucion, semanas))
+    return parcial
+
+
+def _lotes(pacientes: List[Paciente], cuantos: int) -> List[List[Paciente]]:
+    # Reparto intercalado para que cada lote reciba pacientes de toda la lista
+    return [lote for lote in (pacientes[i::cuantos] for i in range(cuantos)) if lote]
+
+
+def curvas_cohorte(criterio: str, desde: Fecha, hasta: Fecha, resolucion: str = 'mes',
+                   semanas: int = 26, ruta_db: str = RUTA_DB,
+                   procesos: Optional[int] = None) -> CurvasCohorte:
+    """Trayectorias de intensidad de toda la clínica agrupadas por criterio.
+
+    Los pacientes se reparten en lotes entre procesos (por defecto uno por
+    núcleo); cada proceso arranca limpio con pool_procesos, abre su propia
+    conexión y devuelve sumas parciales que aquí se combinan. Con
+    procesos=1 todo se calcula en este proceso.
+    """
+    if criterio not in CRITERIOS:
+        raise ValueError(f'Criterio desconocido: {criterio}')
+    periodos = inicios_periodo(desde, hasta, resolucion)
+    pacientes = [(codigo, cohorte or SIN_DATO, registro) for codigo, cohorte, registro in
+                 obtener_servicio(ruta_db).consultar(
+                     f'SELECT codigo, {criterio}, fecha_registro FROM pacientes ORDER BY codigo')]
+
+    procesos = procesos or os.cpu_count() or 1
+    total = ParcialCohortes(len(periodos), semanas)
+    if procesos == 1:
+        total.combinar(procesar_lote(ruta_db, pacientes, desde, hasta, resolucion, semanas))
+    else:
+        with pool_procesos(procesos, ruta_db) as pool:
+            futuros = [pool.submit(procesar_lote, ruta_db, lote, desde, hasta, resolucion, semanas)
+                       for lote in _lotes(pacientes, procesos * LOTES_POR_PROCESO)]
+            for futuro in futuros:
+                total.combinar(futuro.result())
+
+    cohortes = np.array(sorted(total.pacientes), dtype=object)
+    apilar = lambda sumas: np.array([sumas[c] for c in cohortes]).reshape(len(cohortes), -1)
+    con_datos = apilar(total.con_datos)
+    con_datos_registro = apilar(total.con_datos_registro)
+    return CurvasCohorte(
+        criterio, resolucion, periodos, cohortes,
+        np.array([total.pacientes[c] for c in cohortes], dtype=np.int64),
+        _media(apilar(total.suma_medias), con_datos),
+        con_datos,
+        _media(apilar(total.suma_medias_registro), con_datos_registro),
+        con_datos_registro)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Intensidad media por cohorte de pacientes')
+    parser.add_argument('criterio', choices=CRITERIOS)
+    parser.add_argument('desde', help='AAAA-MM-DD')
+    parser.add_argument('hasta', help='AAAA-MM-DD')
+    parser.add_argument('--resolucion', choices=('dia', 'semana', 'mes', 'trimestre'), default='mes')
+    parser.add_argument('--semanas', type=int, default=26,
+                        help='semanas desde el registro del paciente')
+    parser.add_argument('--procesos', type=int, default=None, help='por defecto, uno por núcleo')
+    parser.add_argument('--db', default=RUTA_DB, help='ruta de la base de datos')
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    curvas = curvas_cohorte(args.criterio, args.desde, args.hasta, args.resolucion,
+                            args.semanas, args.db, args.procesos)
+    segundos = time.perf_counter() - inicio
+
+    formato = lambda fila: ' '.join('   -' if np.isnan(v) else f'{v:4.1f}' for v in fila)
+    print(f"{'cohorte':28} {'pac.':>5}  " + ' '.join(str(p)[2:7] for p in curvas.periodos))
+    for i, cohorte in enumerate(curvas.cohortes):
+        print(f'{cohorte:28} {curvas.pacientes[i]:>5}  {formato(curvas.intensidad[i])}')
+    print(f'\nSemanas desde el registro (1..{args.semanas})')
+    for i, cohorte in enumerate(curvas.cohortes):
+        print(f'{cohorte:28} {curvas.pacientes[i]:>5}  {formato(curvas.intensidad_registro[i])}')
+    print(f'\n{curvas.pacientes.sum()} pacientes en {segundos:.2f} s')
@@ -0,0 +1,156 @@
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from motor_estadisticas import CONSULTA_AGRUPADA, RESOLUCIONES, Fecha, SeriesAgrupadas, series_periodo
+from servicio_bd import RUTA_DB, ServicioBD, obtener_servicio
+
+
+DESFASE_MAXIMO = 7              # días de adelanto que se prueban en la correlación cruzada
+MIN_DIAS_COMUNES = 7            # días con dato de ambos pensamientos para dar un valor
+
+
+@dataclass
+class Correlaciones:
+    """Correlaciones entre los pensamientos de un paciente en un periodo.
+
+    cruzada[k, i, j] es la correlación entre el pensamiento i un día y el
+    j k días después; cruzada[0] es la correlación del mismo día. NaN si no
+    hay MIN_DIAS_COMUNES días comunes o alguna de las dos series es constante.
+    """
+    dimension: str
+    codigos: np.ndarray
+    dias: np.ndarray                # días con registros de cada pensamiento
+    cruzada: np.ndarray             # (desfase, pensamiento, pensamiento)
+
+    def __len__(self) -> int:
+        return len(self.codigos)
+
+    @property
+    def correlacion(self) -> np.ndarray:
+        return self.cruzada[0]
+
+    @property
+    def desfases(self) -> np.ndarray:
+        return np.arange(len(self.cruzada))
+
+    def fila(self, codigo: str) -> Optional[int]:
+        i = np.flatnonzero(self.codigos == codigo)
+        return int(i[0]) if len(i) else None
+
+    def mejor_desfase(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(desfase, correlación) de mayor valor absoluto para cada par."""
+        absoluta = np.nan_to_num(np.abs(self.cruzada), nan=-1.0)
+        desfase = np.argmax(absoluta, axis=0)
+        return desfase, np.take_along_axis(self.cruzada, desfase[None], axis=0)[0]
+
+    def pares(self, minimo: float = 0.5, desfase: int = 0) -> List[Tuple[str, str, float]]:
+        """[(código, código, r)] con |r| >= minimo, de mayor a menor |r|.
+
+        Con desfase 0 cada par aparece una vez; con desfase k el primero
+        es el que va por delante.
+        """
+        r = self.cruzada[desfase]
+        mascara = np.abs(np.nan_to_num(r)) >= minimo
+        if desfase == 0:
+            mascara &= np.triu(np.ones_like(mascara), 1)
+        else:
+            np.fill_diagonal(mascara, False)
+        i, j = np.nonzero(mascara)
+        orden = np.argsort(-np.abs(r[i, j]), kind='stable')
+        return [(self.codigos[a], self.codigos[b], float(r[a, b])) for a, b in zip(i[orden], j[orden])]
+
+
+def matriz_diaria(series: SeriesAgrupadas, dimension: str) -> np.ndarray:
+    """Matriz pensamiento × día para correlacionar.
+
+    En cantidad y duración un día sin registros vale 0 (el pensamiento no
+    apareció); en intensidad no hay dato y queda NaN.
+    """
+    if series.resolucion != 'dia':
+        raise ValueError('Las correlaciones trabajan sobre series diarias')
+    valores = series.valores(dimension).astype(float)
+    if dimension == 'intensidad':
+        return np.where(series.registros_intensidad > 0, valores, np.nan)
+    return valores
+
+
+def _correlacionar(a: np.ndarray, b: np.ndarray, min_dias: int) -> np.ndarray:
+    """Correlación de Pearson de cada fila de a con cada fila de b usando los días
+    en que ambas tienen dato; todo con productos de matrices."""
+    ma, mb = (~np.isnan(a)).astype(float), (~np.isnan(b)).astype(float)
+    a0, b0 = np.nan_to_num(a), np.nan_to_num(b)
+    n = ma @ mb.T
+    suma_a, suma_b = a0 @ mb.T, ma @ b0.T
+    covarianza = n * (a0 @ b0.T) - suma_a * suma_b
+    varianza_a = n * ((a0 ** 2) @ mb.T) - suma_a ** 2
+    varianza_b = n * (ma @ (b0 ** 2).T) - suma_b ** 2
+    producto = varianza_a * varianza_b
+    validos = (n >= min_dias) & (producto > 1e-12 * np.maximum(n, 1) ** 4)
+    r = np.full(n.shape, np.nan)
+    np.divide(covarianza, np.sqrt(np.where(validos, producto, 1.0)), out=r, where=validos)
+    return np.clip(r, -1.0, 1.0)
+
+
+def correlacionar(x: np.ndarray, desfase_maximo: int = DESFASE_MAXIMO,
+                  min_dias: int = MIN_DIAS_COMUNES) -> np.ndarray:
+    """Correlación cruzada (desfase, fila, fila) de todas las filas de x."""
+    n, dias = x.shape
+    cruzada = np.full((desfase_maximo + 1, n, n), np.nan)
+    for k in range(min(desfase_maximo, max(dias - 1, 0)) + 1):
+        cruzada[k] = _correlacionar(x[:, :dias - k], x[:, k:], min_dias)
+    return cruzada
+
+
+def calcular_correlaciones(series: SeriesAgrupadas, dimension: str = 'cantidad',
+                           desfase_maximo: int = DESFASE_MAXIMO) -> Correlaciones:
+    x = matriz_diaria(series, dimension)
+    return Correlaciones(dimension, series.codigos, (series.registros > 0).sum(axis=1),
+                         correlacionar(x, desfase_maximo))
+
+
+def correlaciones_paciente(servicio: ServicioBD, codigo_paciente: str, desde: Fecha, hasta: Fecha,
+                           dimension: str = 'cantidad',
+                           desfase_maximo: int = DESFASE_MAXIMO) -> Correlaciones:
+    """Correlaciones de todos los pensamientos del paciente.
+
+    El resultado se guarda en la caché de consultas del servicio con la
+    misma clave que la serie diaria que lo origina, así que se reutiliza
+    mientras la base no cambie.
+    """
+    sql = CONSULTA_AGRUPADA.format(periodo=RESOLUCIONES['dia'][0])
+    return servicio.cache.obtener(
+        sql, (codigo_paciente, str(desde), str(hasta)),
+        lambda: calcular_correlaciones(series_periodo(servicio, codigo_paciente, desde, hasta, 'dia'),
+                                       dimension, desfase_maximo),
+        ('correlaciones', dimension, desfase_maximo), filas=lambda c: c.cruzada.size)
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+    from datetime import date, timedelta
+
+    parser = argparse.ArgumentParser(description='Pares de pensamientos que aparecen juntos')
+    parser.add_argument('paciente')
+    parser.add_argument('--dias', type=int, default=90, help='días hasta hoy que se analizan')
+    parser.add_argument('--hasta', default=date.today().isoformat(), help='AAAA-MM-DD')
+    parser.add_argument('--dimension', choices=('cantidad', 'duracion', 'intensidad'),
+                        default='cantidad')
+    parser.add_argument('--minimo', type=float, default=0.5, help='|r| mínimo que se lista')
+    parser.add_argument('--db', default=RUTA_DB, help='ruta de la base de datos')
+    args = parser.parse_args()
+
+    servicio = obtener_servicio(args.db)
+    hasta = date.fromisoformat(args.hasta)
+    desde = hasta - timedelta(days=args.dias - 1)
+    inicio = time.perf_counter()
+    correlaciones = correlaciones_paciente(servicio, args.paciente, desde, hasta, args.dimension)
+    segundos = time.perf_counter() - inicio
+
+    desfase, mejor = correlaciones.mejor_desfase()
+    for a, b, r in correlaciones.pares(args.minimo):
+        i, j = correlaciones.fila(a), correlaciones.fila(b)
+        print(f'{a:14} {b:14} r={r:+.2f}  mejor desfase {desfase[i, j]} d (r={mejor[i, j]:+.2f})')
+    print(f'{len(correlaciones)} pensamientos en {segundos * 1000:.1f} ms')
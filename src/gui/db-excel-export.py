@@ -3,11 +3,13 @@ import pandas as pd
 from datetime import datetime
 from openpyxl.styles import PatternFill, Font, Alignment
 from openpyxl.utils import get_column_letter
+from cache_consultas import CacheConsultas
 
 class ExportadorDB:
     def __init__(self, ruta_db="db_psicologia_clinic.db"):
         self.ruta_db = ruta_db
         self.fecha_export = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.cache = CacheConsultas(ruta_db)
         
     def conectar_db(self):
         """Establece conexión con la base de datos."""
@@ -16,6 +18,10 @@ class ExportadorDB:
         except sqlite3.Error as e:
             raise Exception(f"Error conectando a la base de datos: {e}")
     
+    def leer_tabla(self, query, conn):
+        """Lee la consulta en un DataFrame, reutilizándolo si la base no ha cambiado."""
+        return self.cache.obtener(query, (), lambda: pd.read_sql_query(query, conn), 'dataframe')
+    
     def obtener_datos_relacionados(self):
         """Obtiene todos los datos relacionados de las tablas."""
         try:
@@ -45,12 +51,12 @@ class ExportadorDB:
             """
             
             # Obtener datos generales relacionados
-            df_general = pd.read_sql_query(query, conn)
+            df_general = self.leer_tabla(query, conn)
             
             # Obtener datos individuales de cada tabla
-            df_pacientes = pd.read_sql_query("SELECT * FROM pacientes", conn)
-            df_pensamientos = pd.read_sql_query("SELECT * FROM pensamientos", conn)
-            df_dimensiones = pd.read_sql_query("SELECT * FROM dimensiones", conn)
+            df_pacientes = self.leer_tabla("SELECT * FROM pacientes", conn)
+            df_pensamientos = self.leer_tabla("SELECT * FROM pensamientos", conn)
+            df_dimensiones = self.leer_tabla("SELECT * FROM dimensiones", conn)
             
             conn.close()
             
@@ -0,0 +1,221 @@
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from motor_estadisticas import Fecha, SeriesAgrupadas, series_clinica, series_periodo
+from servicio_bd import RUTA_DB, ServicioBD, obtener_servicio
+
+
+# Parámetros por defecto de la detección, en días
+VENTANA = 28                    # media móvil y referencia del z-score
+MIN_OBSERVACIONES = 7           # días con dato necesarios en la ventana y a cada lado del cambio
+ALFA_EWMA = 0.2
+UMBRAL_Z = 3.0
+UMBRAL_CAMBIO = 5.0             # estadístico t del mejor punto de corte
+DIAS_RECIENTES = 7              # una anomalía solo se marca si cae en estos últimos días
+
+
+@dataclass
+class Alertas:
+    """Resultado de la detección; matrices con una fila por pensamiento y una columna por día."""
+    dimension: str
+    fechas: np.ndarray              # datetime64[D]
+    codigos: np.ndarray
+    valores: np.ndarray             # NaN en los días sin registros
+    media_movil: np.ndarray
+    ewma: np.ndarray
+    z: np.ndarray                   # respecto a la ventana anterior; NaN si no hay referencia
+    anomalias: np.ndarray           # |z| > umbral
+    cambio: np.ndarray              # columna donde empieza el nuevo nivel; -1 si no hay
+    salto: np.ndarray               # media después del cambio menos media antes
+    pendiente: np.ndarray           # tendencia de todo el periodo, por semana
+    marcas: np.ndarray              # texto para mostrar; '' si no hay nada que señalar
+
+    def __len__(self) -> int:
+        return len(self.codigos)
+
+    def fila(self, codigo: str) -> Optional[int]:
+        i = np.flatnonzero(self.codigos == codigo)
+        return int(i[0]) if len(i) else None
+
+    def marca(self, codigo: str) -> str:
+        i = self.fila(codigo)
+        return '' if i is None else self.marcas[i]
+
+    def marcadas(self) -> np.ndarray:
+        """Filas de los pensamientos con alguna marca."""
+        return np.flatnonzero(self.marcas != '')
+
+
+def _acumulados(x: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Sumas acumuladas de valores, cuadrados y datos presentes con una columna inicial de ceros."""
+    presentes = ~np.isnan(x)
+    valores = np.where(presentes, x, 0.0)
+    ceros = np.zeros((x.shape[0], 1))
+    return (np.hstack([ceros, np.cumsum(valores, axis=1)]),
+            np.hstack([ceros, np.cumsum(valores ** 2, axis=1)]),
+            np.hstack([ceros, np.cumsum(presentes, axis=1)]))
+
+
+def _dividir(numerador: np.ndarray, denominador: np.ndarray, minimo: float = 1) -> np.ndarray:
+    resultado = np.full(np.broadcast(numerador, denominador).shape, np.nan)
+    np.divide(numerador, denominador, out=resultado, where=denominador >= minimo)
+    return resultado
+
+
+def media_movil(x: np.ndarray, ventana: int = VENTANA,
+                min_observaciones: int = MIN_OBSERVACIONES) -> np.ndarray:
+    """Media de los últimos `ventana` días de cada fila, ignorando los NaN."""
+    suma, _, cuenta = _acumulados(x)
+    fin = np.arange(1, x.shape[1] + 1)
+    inicio = np.maximum(fin - ventana, 0)
+    return _dividir(suma[:, fin] - suma[:, inicio], cuenta[:, fin] - cuenta[:, inicio],
+                    min_observaciones)
+
+
+def ewma(x: np.ndarray, alfa: float = ALFA_EWMA) -> np.ndarray:
+    """Media móvil exponencial por fila; los días sin dato conservan el valor anterior.
+
+    El bucle recorre los días y opera sobre todos los pensamientos a la vez.
+    """
+    resultado = np.full(x.shape, np.nan)
+    actual = np.full(x.shape[0], np.nan)
+    for t in range(x.shape[1]):
+        columna = x[:, t]
+        nuevo = np.where(np.isnan(actual), columna, alfa * columna + (1 - alfa) * actual)
+        actual = np.where(np.isnan(columna), actual, nuevo)
+        resultado[:, t] = actual
+    return resultado
+
+
+def z_movil(x: np.ndarray, ventana: int = VENTANA,
+            min_observaciones: int = MIN_OBSERVACIONES) -> np.ndarray:
+    """Desviación de cada día respecto a la media y desviación típica de los `ventana` días previos."""
+    suma, cuadrados, cuenta = _acumulados(x)
+    fin = np.arange(x.shape[1])
+    inicio = np.maximum(fin - ventana, 0)
+    n = cuenta[:, fin] - cuenta[:, inicio]
+    media = _dividir(suma[:, fin] - suma[:, inicio], n, min_observaciones)
+    varianza = _dividir(cuadrados[:, fin] - cuadrados[:, inicio], n, min_observaciones) - media ** 2
+    desviacion = np.sqrt(np.maximum(varianza, 0))
+    return _dividir(x - media, desviacion, 1e-9)
+
+
+def punto_cambio(x: np.ndarray, min_observaciones: int = MIN_OBSERVACIONES
+                 ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Mejor corte en dos niveles de cada fila: (columna, estadístico t, salto de media).
+
+    Se evalúan todos los cortes a la vez con sumas acumuladas y varianza
+    dentro de cada tramo.
+    """
+    suma, cuadrados, cuenta = _acumulados(x)
+    s1, q1, n1 = suma[:, 1:-1], cuadrados[:, 1:-1], cuenta[:, 1:-1]
+    s2, q2, n2 = suma[:, -1:] - s1, cuadrados[:, -1:] - q1, cuenta[:, -1:] - n1
+    validos = (n1 >= min_observaciones) & (n2 >= min_observaciones)
+    m1 = _dividir(s1, n1)
+    m2 = _dividir(s2, n2)
+    residuo = np.nan_to_num(q1 - n1 * m1 ** 2) + np.nan_to_num(q2 - n2 * m2 ** 2)
+    varianza = _dividir(residuo, n1 + n2 - 2)
+    error = np.sqrt(np.maximum(varianza, 1e-9) * (_dividir(1.0, n1) + _dividir(1.0, n2)))
+    t = np.where(validos, np.abs(m2 - m1) / error, 0.0)
+    t = np.nan_to_num(t)
+
+    filas = np.arange(x.shape[0])
+    mejor = np.argmax(t, axis=1) if t.shape[1] else np.zeros(x.shape[0], dtype=np.int64)
+    estadistico = t[filas, mejor] if t.shape[1] else np.zeros(x.shape[0])
+    salto = (m2 - m1)[filas, mejor] if t.shape[1] else np.zeros(x.shape[0])
+    # El corte k deja k + 1 días en el primer tramo
+    return mejor + 1, estadistico, salto
+
+
+def pendiente(x: np.ndarray) -> np.ndarray:
+    """Pendiente de mínimos cuadrados de cada fila, en unidades por semana."""
+    presentes = ~np.isnan(x)
+    n = presentes.sum(axis=1)
+    dias = np.where(presentes, np.arange(x.shape[1]), 0.0)
+    valores = np.where(presentes, x, 0.0)
+    media_dia = _dividir(dias.sum(axis=1), n)
+    media_valor = _dividir(valores.sum(axis=1), n)
+    covarianza = (dias * valores).sum(axis=1) - n * media_dia * media_valor
+    varianza = (dias ** 2).sum(axis=1) - n * media_dia ** 2
+    return _dividir(covarianza, varianza, 1e-9) * 7
+
+
+def detectar(series: SeriesAgrupadas, dimension: str = 'cantidad', ventana: int = VENTANA,
+             umbral_z: float = UMBRAL_Z, umbral_cambio: float = UMBRAL_CAMBIO,
+             dias_recientes: int = DIAS_RECIENTES) -> Alertas:
+    """Calcula tendencias, anomalías y cambios de nivel de todas las filas de una vez.
+
+    series debe ser diaria. Solo cuentan los días con registros (y, en
+    intensidad, con intensidad anotada); los demás son NaN.
+    """
+    if series.resolucion != 'dia':
+        raise ValueError('La detección trabaja sobre series diarias')
+    x = np.where(series.registros > 0, series.valores(dimension), np.nan)
+    z = z_movil(x, ventana)
+    anomalias = np.abs(np.nan_to_num(z)) > umbral_z
+    cambio, estadistico, salto = punto_cambio(x)
+    hay_cambio = estadistico > umbral_cambio
+
+    marcas = np.full(len(series), '', dtype=object)
+    recientes = anomalias[:, -dias_recientes:].any(axis=1) if x.shape[1] else anomalias.any(axis=1)
+    for i in np.flatnonzero(recientes | hay_cambio):
+        partes = []
+        if recientes[i]:
+            partes.append('anomalía reciente')
+        if hay_cambio[i]:
+            sentido = 'al alza' if salto[i] > 0 else 'a la baja'
+            partes.append(f'cambio {sentido} desde {series.periodos[cambio[i]]}')
+        marcas[i] = '; '.join(partes)
+
+    return Alertas(dimension, series.periodos, series.codigos, x, media_movil(x, ventana), ewma(x), z,
+                   anomalias, np.where(hay_cambio, cambio, -1), np.where(hay_cambio, salto, 0.0),
+                   pendiente(x), marcas)
+
+
+def alertas_paciente(servicio: ServicioBD, codigo_paciente: str, desde: Fecha, hasta: Fecha,
+                     dimension: str = 'cantidad') -> Alertas:
+    """Detección sobre todos los pensamientos de un paciente."""
+    return detectar(series_periodo(servicio, codigo_paciente, desde, hasta, 'dia'), dimension)
+
+
+def alertas_clinica(servicio: ServicioBD, desde: Fecha, hasta: Fecha,
+                    dimension: str = 'cantidad') -> Alertas:
+    """Detección sobre todos los pensamientos de todos los pacientes en un solo lote."""
+    return detectar(series_clinica(servicio, desde, hasta, 'dia'), dimension)
+
+
+def listar(alertas: Alertas) -> List[Tuple[str, str, float]]:
+    """[(código, marca, pendiente por semana)] de los pensamientos marcados."""
+    return [(alertas.codigos[i], alertas.marcas[i], float(alertas.pendiente[i]))
+            for i in alertas.marcadas()]
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+    from datetime import date, timedelta
+
+    parser = argparse.ArgumentParser(description='Pensamientos con anomalías o cambios de nivel')
+    parser.add_argument('--dias', type=int, default=90, help='días hasta hoy que se analizan')
+    parser.add_argument('--hasta', default=date.today().isoformat(), help='AAAA-MM-DD')
+    parser.add_argument('--dimension', choices=('cantidad', 'duracion', 'intensidad'),
+                        default='cantidad')
+    parser.add_argument('--paciente', help='limitar a un paciente')
+    parser.add_argument('--db', default=RUTA_DB, help='ruta de la base de datos')
+    args = parser.parse_args()
+
+    servicio = obtener_servicio(args.db)
+    hasta = date.fromisoformat(args.hasta)
+    desde = hasta - timedelta(days=args.dias - 1)
+    inicio = time.perf_counter()
+    if args.paciente:
+        alertas = alertas_paciente(servicio, args.paciente, desde, hasta, args.dimension)
+    else:
+        alertas = alertas_clinica(servicio, desde, hasta, args.dimension)
+    segundos = time.perf_counter() - inicio
+
+    for codigo, marca, ritmo in listar(alertas):
+        print(f'{codigo:14} {ritmo:+7.2f}/sem  {marca}')
+    print(f'{len(alertas.marcadas())} de {len(alertas)} pensamientos marcados en {segundos:.2f} s')
@@ -0,0 +1,196 @@
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from esquema import ANCHO_DURACION
+from motor_estadisticas import Fecha
+from servicio_bd import RUTA_DB, ServicioBD, obtener_servicio
+
+
+# (primer intervalo, último intervalo, ancho) de cada dimensión
+INTERVALOS = {
+    'intensidad': (0, 10, 1),
+    'duracion': (0, 120, ANCHO_DURACION),
+}
+
+CONSULTA_MESES = """
+    SELECT enfermedad, valor, SUM(registros)
+    FROM histogramas_cohorte
+    WHERE dimension = ? AND mes BETWEEN ? AND ?
+    GROUP BY enfermedad, valor
+"""
+
+CONSULTA_DIAS = """
+    SELECT IFNULL(pa.enfermedad, ''), h.valor, SUM(h.registros)
+    FROM histogramas_diarios h
+    JOIN pacientes pa ON pa.id = h.paciente_id
+    WHERE h.dimension = ? AND h.fecha BETWEEN ? AND ?
+    GROUP BY 1, h.valor
+"""
+
+CONSULTA_PACIENTE = """
+    SELECT h.valor, SUM(h.registros)
+    FROM histogramas_diarios h
+    WHERE h.paciente_id = (SELECT id FROM pacientes WHERE codigo = ?)
+    AND h.dimension = ? AND h.fecha BETWEEN ? AND ?
+    GROUP BY h.valor
+"""
+
+
+@dataclass
+class Histograma:
+    """Registros por intervalo de una dimensión; se combinan sumando intervalos."""
+    dimension: str
+    registros: np.ndarray           # uno por intervalo
+
+    @classmethod
+    def vacio(cls, dimension: str) -> 'Histograma':
+        primero, ultimo, ancho = INTERVALOS[dimension]
+        return cls(dimension, np.zeros((ultimo - primero) // ancho + 1, dtype=np.int64))
+
+    @property
+    def ancho(self) -> int:
+        return INTERVALOS[self.dimension][2]
+
+    @property
+    def inicios(self) -> np.ndarray:
+        """Límite inferior de cada intervalo."""
+        primero, _, ancho = INTERVALOS[self.dimension]
+        return primero + ancho * np.arange(len(self.registros))
+
+    def sumar(self, valores: Sequence[int], registros: Sequence[int]):
+        """Añade registros a los intervalos que empiezan en valores."""
+        primero, _, ancho = INTERVALOS[self.dimension]
+        np.add.at(self.registros, (np.asarray(valores, dtype=np.int64) - primero) // ancho,
+                  np.asarray(registros, dtype=np.int64))
+
+    def combinar(self, otro: 'Histograma') -> 'Histograma':
+        self.registros += otro.registros
+        return self
+
+    def total(self) -> int:
+        return int(self.registros.sum())
+
+    def media(self) -> float:
+        """Media tomando el centro de cada intervalo; NaN si está vacío."""
+        if not self.total():
+            return float('nan')
+        centros = self.inicios + (self.ancho - 1) / 2
+        return float(np.average(centros, weights=self.registros))
+
+    def percentiles(self, q: Sequence[float]) -> np.ndarray:
+        """Percentiles (0-100). Con intervalos de un valor son exactos; si no, se
+        interpola dentro del intervalo suponiendo registros repartidos por igual."""
+        q = np.asarray(q, dtype=float)
+        total = self.total()
+        if not total:
+            return np.full(q.shape, np.nan)
+        acumulado = np.cumsum(self.registros)
+        objetivo = np.maximum(q / 100 * total, 1e-9)
+        i = np.minimum(np.searchsorted(acumulado, objetivo), len(acumulado) - 1)
+        if self.ancho == 1:
+            return self.inicios[i].astype(float)
+        anteriores = acumulado[i] - self.registros[i]
+        fraccion = (objetivo - anteriores) / np.maximum(self.registros[i], 1)
+        return self.inicios[i] + fraccion * self.ancho
+
+
+def _mes_siguiente(dia: date) -> date:
+    return (dia.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _tramos(desde: str, hasta: str) -> Tuple[Optional[Tuple[str, str]], List[Tuple[str, str]]]:
+    """Divide el periodo en (primer mes, último mes) completos y rangos de días sueltos."""
+    inicio, fin = date.fromisoformat(desde), date.fromisoformat(hasta)
+    primer_mes = inicio if inicio.day == 1 else _mes_siguiente(inicio)
+    # Primer día que queda fuera del último mes completo
+    limite = (fin + timedelta(days=1)).replace(day=1)
+    if primer_mes >= limite:
+        return None, [(desde, hasta)]
+    dias = []
+    if inicio < primer_mes:
+        dias.append((desde, (primer_mes - timedelta(days=1)).isoformat()))
+    if limite <= fin:
+        dias.append((limite.isoformat(), hasta))
+    ultimo_mes = (limite - timedelta(days=1)).replace(day=1)
+    return (primer_mes.isoformat()[:7], ultimo_mes.isoformat()[:7]), dias
+
+
+def histogramas_por_enfermedad(servicio: ServicioBD, desde: Fecha, hasta: Fecha,
+                               dimension: str) -> Dict[str, Histograma]:
+    """Histograma de cada enfermedad ('' para pacientes sin enfermedad anotada).
+
+    Los meses completos salen del nivel por enfermedad y solo los días de los
+    meses incompletos de los extremos se leen del nivel diario.
+    """
+    if dimension not in INTERVALOS:
+        raise ValueError(f'Dimensión sin histograma: {dimension}')
+    meses, dias = _tramos(str(desde), str(hasta))
+    filas = []
+    if meses:
+        filas += servicio.consultar_cacheado(CONSULTA_MESES, (dimension, *meses))
+    for rango in dias:
+        filas += servicio.consultar_cacheado(CONSULTA_DIAS, (dimension, *rango))
+
+    resultado: Dict[str, Histograma] = {}
+    for enfermedad, valor, registros in filas:
+        if enfermedad not in resultado:
+            resultado[enfermedad] = Histograma.vacio(dimension)
+        resultado[enfermedad].sumar([valor], [registros])
+    return dict(sorted(resultado.items()))
+
+
+def histograma_clinica(servicio: ServicioBD, desde: Fecha, hasta: Fecha, dimension: str,
+                       enfermedad: Optional[str] = None) -> Histograma:
+    """Histograma de toda la clínica o de una enfermedad."""
+    total = Histograma.vacio(dimension)
+    for nombre, histograma in histogramas_por_enfermedad(servicio, desde, hasta, dimension).items():
+        if enfermedad is None or nombre == enfermedad:
+            total.combinar(histograma)
+    return total
+
+
+def histograma_paciente(servicio: ServicioBD, codigo_paciente: str, desde: Fecha, hasta: Fecha,
+                        dimension: str) -> Histograma:
+    """Histograma de un paciente."""
+    if dimension not in INTERVALOS:
+        raise ValueError(f'Dimensión sin histograma: {dimension}')
+    histograma = Histograma.vacio(dimension)
+    filas = servicio.consultar_cacheado(
+        CONSULTA_PACIENTE, (codigo_paciente, dimension, str(desde), str(hasta)))
+    if filas:
+        histograma.sumar(*zip(*filas))
+    return histograma
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Percentiles de intensidad o duración por enfermedad')
+    parser.add_argument('desde', help='AAAA-MM-DD')
+    parser.add_argument('hasta', help='AAAA-MM-DD')
+    parser.add_argument('--dimension', choices=tuple(INTERVALOS), default='intensidad')
+    parser.add_argument('--paciente', help='solo este paciente')
+    parser.add_argument('--db', default=RUTA_DB, help='ruta de la base de datos')
+    args = parser.parse_args()
+
+    servicio = obtener_servicio(args.db)
+    cuantiles = (10, 25, 50, 75, 90)
+    inicio = time.perf_counter()
+    if args.paciente:
+        grupos = {args.paciente: histograma_paciente(servicio, args.paciente, args.desde,
+                                                     args.hasta, args.dimension)}
+    else:
+        grupos = histogramas_por_enfermedad(servicio, args.desde, args.hasta, args.dimension)
+        grupos['Toda la clínica'] = histograma_clinica(servicio, args.desde, args.hasta,
+                                                       args.dimension)
+    segundos = time.perf_counter() - inicio
+
+    print(f"{'grupo':30} {'registros':>9} {'media':>6} " + ' '.join(f'{f"p{q}":>6}' for q in cuantiles))
+    for nombre, histograma in grupos.items():
+        valores = ' '.join(f'{v:6.1f}' for v in histograma.percentiles(cuantiles))
+        print(f'{nombre or "Sin dato":30} {histograma.total():>9} {histograma.media():6.2f} {valores}')
+    print(f'\n{segundos * 1000:.1f} ms')
@@ -0,0 +1,121 @@
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from tkinter import messagebox
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from servicio_bd import ServicioBD, obtener_servicio
+
+
+# Cada cuánto revisa el hilo de Tk si hay resultados que entregar
+INTERVALO_MS = 30
+
+
+@dataclass(eq=False)
+class Tarea:
+    clave: Hashable
+    al_terminar: Callable[[Any], None]
+    al_fallar: Callable[[BaseException], None]
+    cancelada: threading.Event = field(default_factory=threading.Event)
+    futuro: Optional[Future] = None
+    hilo: Optional[int] = None
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class EjecutorConsultas:
+    """Ejecuta consultas fuera del hilo de Tk y entrega el resultado con after().
+
+    Cada consulta se envía con una clave (por ejemplo 'circular'); enviar
+    otra con la misma clave cancela la anterior. Una consulta cancelada que
+    ya está en SQLite se interrumpe con Connection.interrupt() y su
+    resultado, si llega, se descarta.
+    """
+    def __init__(self, ventana, servicio: Optional[ServicioBD] = None, hilos: int = 2):
+        self.ventana = ventana
+        self.servicio = servicio or obtener_servicio()
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='consultas')
+        self._resultados: 'queue.Queue' = queue.Queue()
+        self._vigentes: Dict[Hashable, Tarea] = {}
+        self._revisando = False
+        self.ventana.bind('<Destroy>', self._al_destruir, add='+')
+
+    def enviar(self, clave: Hashable, funcion: Callable, *args,
+               al_terminar: Callable[[Any], None],
+               al_fallar: Optional[Callable[[BaseException], None]] = None) -> Tarea:
+        """Ejecuta funcion(*args) en segundo plano sustituyendo a la consulta previa."""
+        self.cancelar(clave)
+        tarea = Tarea(clave, al_terminar, al_fallar or self._mostrar_error)
+        self._vigentes[clave] = tarea
+        tarea.futuro = self._pool.submit(self._correr, tarea, funcion, args)
+        if not self._revisando:
+            self._revisando = True
+            self.ventana.after(INTERVALO_MS, self._entregar)
+        return tarea
+
+    def cancelar(self, clave: Hashable):
+        """Cancela la consulta en curso o en espera para la clave."""
+        tarea = self._vigentes.pop(clave, None)
+        if tarea is None:
+            return
+        tarea.cancelada.set()
+        tarea.futuro.cancel()
+        with tarea.lock:
+            if tarea.hilo is not None:
+                self.servicio.interrumpir(tarea.hilo)
+
+    def cancelar_todas(self):
+        """Cancela todas las consultas pendientes."""
+        for clave in list(self._vigentes):
+            self.cancelar(clave)
+
+    def ocupado(self) -> bool:
+        """Indica si queda alguna consulta sin entregar."""
+        return bool(self._vigentes)
+
+    def cerrar(self):
+        """Cancela lo pendiente y libera los hilos sin esperar."""
+        self.cancelar_todas()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _correr(self, tarea: Tarea, funcion: Callable, args: tuple):
+        """Cuerpo del hilo de fondo: ejecuta y deja el resultado en la cola."""
+        with tarea.lock:
+            if tarea.cancelada.is_set():
+                return
+            tarea.hilo = threading.get_ident()
+        try:
+            self._resultados.put((tarea, funcion(*args), None))
+        except BaseException as e:
+            self._resultados.put((tarea, None, e))
+        finally:
+            with tarea.lock:
+                tarea.hilo = None
+
+    def _entregar(self):
+        """Pasa al hilo de Tk los resultados de las consultas aún vigentes."""
+        try:
+            while True:
+                try:
+                    tarea, resultado, error = self._resultados.get_nowait()
+                except queue.Empty:
+                    break
+                if tarea.cancelada.is_set() or self._vigentes.get(tarea.clave) is not tarea:
+                    continue
+                del self._vigentes[tarea.clave]
+                if error is None:
+                    tarea.al_terminar(resultado)
+                else:
+                    tarea.al_fallar(error)
+        finally:
+            if self._vigentes:
+                self.ventana.after(INTERVALO_MS, self._entregar)
+            else:
+                self._revisando = False
+
+    def _mostrar_error(self, error: BaseException):
+        messagebox.showerror("Error", f"Error en la consulta: {str(error)}", parent=self.ventana)
+
+    def _al_destruir(self, event):
+        if event.widget is self.ventana:
+            self.cerrar()
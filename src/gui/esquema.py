@@ -0,0 +1,541 @@
+import sqlite3
+from contextlib import contextmanager
+from typing import List, Optional, Sequence, Tuple
+
+
+# Índices compuestos que sostienen el filtrado por paciente y rango de fechas
+INDICES = (
+    """CREATE INDEX IF NOT EXISTS idx_dimensiones_pensamiento_fecha
+       ON dimensiones(pensamiento_id, fecha)""",
+    """CREATE INDEX IF NOT EXISTS idx_pensamientos_paciente_codigo
+       ON pensamientos(paciente_id, codigo)""",
+)
+
+# Cada pensamiento debe pertenecer a un paciente existente cuyo código
+# coincida con el prefijo del código del pensamiento (P001-PS003 -> P001)
+VALIDAR_PACIENTE = """
+    SELECT CASE
+        WHEN NEW.paciente_id IS NULL
+            THEN RAISE(ABORT, 'pensamientos.paciente_id es obligatorio')
+        WHEN NOT EXISTS (SELECT 1 FROM pacientes
+                         WHERE id = NEW.paciente_id
+                         AND codigo = substr(NEW.codigo, 1, 4))
+            THEN RAISE(ABORT, 'pensamientos.paciente_id no corresponde al código')
+    END;
+"""
+
+DISPARADORES_PACIENTE = (
+    'DROP TRIGGER IF EXISTS trg_pensamientos_paciente',
+    f"""CREATE TRIGGER IF NOT EXISTS trg_pensamientos_paciente_insert
+        BEFORE INSERT ON pensamientos
+        BEGIN {VALIDAR_PACIENTE} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_pensamientos_paciente_update
+        BEFORE UPDATE OF paciente_id, codigo ON pensamientos
+        BEGIN {VALIDAR_PACIENTE} END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_pacientes_delete
+        BEFORE DELETE ON pacientes
+        WHEN EXISTS (SELECT 1 FROM pensamientos WHERE paciente_id = OLD.id)
+        BEGIN
+            SELECT RAISE(ABORT, 'El paciente tiene pensamientos registrados');
+        END""",
+)
+
+TAMANO_LOTE_RELLENO = 500
+
+# Resumen diario por pensamiento; las ventanas de estadísticas leen de aquí
+# en lugar de agregar cada registro de dimensiones en cada redibujado
+TABLA_RESUMEN_DIARIO = """
+    CREATE TABLE IF NOT EXISTS dimensiones_diarias (
+        pensamiento_id INTEGER NOT NULL,
+        fecha DATE NOT NULL,
+        registros INTEGER NOT NULL,
+        cantidad INTEGER NOT NULL,
+        duracion INTEGER NOT NULL,
+        suma_intensidad INTEGER NOT NULL,
+        registros_intensidad INTEGER NOT NULL,
+        max_cantidad INTEGER NOT NULL,
+        max_duracion INTEGER NOT NULL,
+        PRIMARY KEY (pensamiento_id, fecha)
+    ) WITHOUT ROWID
+"""
+
+AGREGADO_DIARIO = """
+    SELECT pensamiento_id, fecha, COUNT(*),
+           IFNULL(SUM(cantidad), 0), IFNULL(SUM(duracion), 0),
+           IFNULL(SUM(intensidad), 0), COUNT(intensidad),
+           IFNULL(MAX(cantidad), 0), IFNULL(MAX(duracion), 0)
+    FROM dimensiones
+"""
+
+
+def _recalcular_dia(fila: str) -> str:
+    """SQL de disparador que recalcula el día de OLD o NEW desde dimensiones."""
+    return f"""
+        DELETE FROM dimensiones_diarias
+        WHERE pensamiento_id = {fila}.pensamiento_id AND fecha = {fila}.fecha;
+        INSERT INTO dimensiones_diarias
+        {AGREGADO_DIARIO}
+        WHERE pensamiento_id = {fila}.pensamiento_id AND fecha = {fila}.fecha
+        GROUP BY pensamiento_id, fecha;
+    """
+
+
+DISPARADORES_RESUMEN_DIARIO = (
+    # Una inserción suma sus valores al día sin releer dimensiones
+    """CREATE TRIGGER IF NOT EXISTS trg_dimensiones_diarias_insert
+        AFTER INSERT ON dimensiones
+        WHEN NEW.pensamiento_id IS NOT NULL AND NEW.fecha IS NOT NULL
+        BEGIN
+            INSERT INTO dimensiones_diarias VALUES (
+                NEW.pensamiento_id, NEW.fecha, 1,
+                IFNULL(NEW.cantidad, 0), IFNULL(NEW.duracion, 0),
+                IFNULL(NEW.intensidad, 0), NEW.intensidad IS NOT NULL,
+                IFNULL(NEW.cantidad, 0), IFNULL(NEW.duracion, 0))
+            ON CONFLICT (pensamiento_id, fecha) DO UPDATE SET
+                registros = registros + 1,
+                cantidad = cantidad + excluded.cantidad,
+                duracion = duracion + excluded.duracion,
+                suma_intensidad = suma_intensidad + excluded.suma_intensidad,
+                registros_intensidad = registros_intensidad + excluded.registros_intensidad,
+                max_cantidad = MAX(max_cantidad, excluded.max_cantidad),
+                max_duracion = MAX(max_duracion, excluded.max_duracion);
+        END""",
+    # Modificar o borrar puede cambiar los máximos: se recalcula el día
+    # afectado usando idx_dimensiones_pensamiento_fecha
+    f"""CREATE TRIGGER IF NOT EXISTS trg_dimensiones_diarias_update
+        AFTER UPDATE OF pensamiento_id, fecha, cantidad, duracion, intensidad ON dimensiones
+        BEGIN {_recalcular_dia('OLD')} {_recalcular_dia('NEW')} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_dimensiones_diarias_delete
+        AFTER DELETE ON dimensiones
+        BEGIN {_recalcular_dia('OLD')} END""",
+)
+
+# Totales por paciente y día, y resumen por paciente para las listas de
+# selección; se mantienen desde dimensiones_diarias y pensamientos
+TABLA_PACIENTES_DIARIOS = """
+    CREATE TABLE IF NOT EXISTS pacientes_diarios (
+        paciente_id INTEGER NOT NULL,
+        fecha DATE NOT NULL,
+        registros INTEGER NOT NULL,
+        cantidad INTEGER NOT NULL,
+        PRIMARY KEY (paciente_id, fecha)
+    ) WITHOUT ROWID
+"""
+
+TABLA_RESUMEN_PACIENTES = """
+    CREATE TABLE IF NOT EXISTS pacientes_resumen (
+        paciente_id INTEGER PRIMARY KEY,
+        pensamientos INTEGER NOT NULL DEFAULT 0,
+        registros INTEGER NOT NULL DEFAULT 0,
+        cantidad INTEGER NOT NULL DEFAULT 0,
+        ultimo_registro DATE
+    )
+"""
+
+AGREGADO_PACIENTE = """
+    SELECT pa.id,
+           (SELECT COUNT(*) FROM pensamientos WHERE paciente_id = pa.id),
+           IFNULL((SELECT SUM(registros) FROM pacientes_diarios WHERE paciente_id = pa.id), 0),
+           IFNULL((SELECT SUM(cantidad) FROM pacientes_diarios WHERE paciente_id = pa.id), 0),
+           (SELECT MAX(fecha) FROM pacientes_diarios WHERE paciente_id = pa.id)
+    FROM pacientes pa
+"""
+
+
+def _paciente_de(fila: str) -> str:
+    return f'(SELECT paciente_id FROM pensamientos WHERE id = {fila}.pensamiento_id)'
+
+
+def _recalcular_paciente(paciente: str) -> str:
+    """SQL de disparador que recalcula los totales de un paciente desde dimensiones_diarias."""
+    return f"""
+        DELETE FROM pacientes_diarios WHERE paciente_id = {paciente};
+        INSERT INTO pacientes_diarios
+        SELECT p.paciente_id, r.fecha, SUM(r.registros), SUM(r.cantidad)
+        FROM pensamientos p
+        JOIN dimensiones_diarias r ON r.pensamiento_id = p.id
+        WHERE p.paciente_id = {paciente}
+        GROUP BY p.paciente_id, r.fecha;
+        DELETE FROM pacientes_resumen WHERE paciente_id = {paciente};
+        INSERT INTO pacientes_resumen {AGREGADO_PACIENTE} WHERE pa.id = {paciente};
+    """
+
+
+def _sumar_dia_paciente(fila: str) -> str:
+    return f"""
+        INSERT INTO pacientes_diarios
+        SELECT paciente_id, {fila}.fecha, {fila}.registros, {fila}.cantidad
+        FROM pensamientos
+        WHERE id = {fila}.pensamiento_id AND paciente_id IS NOT NULL
+        ON CONFLICT (paciente_id, fecha) DO UPDATE SET
+            registros = registros + excluded.registros,
+            cantidad = cantidad + excluded.cantidad;
+        UPDATE pacientes_resumen SET
+            registros = registros + {fila}.registros,
+            cantidad = cantidad + {fila}.cantidad,
+            ultimo_registro = MAX(IFNULL(ultimo_registro, {fila}.fecha), {fila}.fecha)
+        WHERE paciente_id = {_paciente_de(fila)};
+    """
+
+
+def _restar_dia_paciente(fila: str) -> str:
+    return f"""
+        UPDATE pacientes_diarios SET
+            registros = registros - {fila}.registros,
+            cantidad = cantidad - {fila}.cantidad
+        WHERE paciente_id = {_paciente_de(fila)} AND fecha = {fila}.fecha;
+        DELETE FROM pacientes_diarios
+        WHERE paciente_id = {_paciente_de(fila)} AND fecha = {fila}.fecha AND registros <= 0;
+        UPDATE pacientes_resumen SET
+            registros = registros - {fila}.registros,
+            cantidad = cantidad - {fila}.cantidad,
+            ultimo_registro = (SELECT MAX(fecha) FROM pacientes_diarios
+                               WHERE paciente_id = pacientes_resumen.paciente_id)
+        WHERE paciente_id = {_paciente_de(fila)};
+    """
+
+
+DISPARADORES_RESUMEN_PACIENTES = (
+    """CREATE TRIGGER IF NOT EXISTS trg_pacientes_resumen_paciente_insert
+        AFTER INSERT ON pacientes
+        BEGIN
+            INSERT OR IGNORE INTO pacientes_resumen (paciente_id) VALUES (NEW.id);
+        END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_pacientes_resumen_paciente_delete
+        AFTER DELETE ON pacientes
+        BEGIN
+            DELETE FROM pacientes_resumen WHERE paciente_id = OLD.id;
+            DELETE FROM pacientes_diarios WHERE paciente_id = OLD.id;
+        END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_pacientes_resumen_pensamiento_insert
+        AFTER INSERT ON pensamientos
+        BEGIN
+            UPDATE pacientes_resumen SET pensamientos = pensamientos + 1
+            WHERE paciente_id = NEW.paciente_id;
+        END""",
+    # Mover o borrar un pensamiento cambia los totales diarios del paciente
+    f"""CREATE TRIGGER IF NOT EXISTS trg_pacientes_resumen_pensamiento_update
+        AFTER UPDATE OF paciente_id ON pensamientos
+        WHEN OLD.paciente_id IS NOT NEW.paciente_id
+        BEGIN {_recalcular_paciente('OLD.paciente_id')} {_recalcular_paciente('NEW.paciente_id')} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_pacientes_resumen_pensamiento_delete
+        AFTER DELETE ON pensamientos
+        BEGIN {_recalcular_paciente('OLD.paciente_id')} END""",
+    # Los totales son sumas: cada cambio del resumen diario se resta y se suma
+    f"""CREATE TRIGGER IF NOT EXISTS trg_pacientes_resumen_dia_insert
+        AFTER INSERT ON dimensiones_diarias
+        BEGIN {_sumar_dia_paciente('NEW')} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_pacientes_resumen_dia_update
+        AFTER UPDATE ON dimensiones_diarias
+        BEGIN {_restar_dia_paciente('OLD')} {_sumar_dia_paciente('NEW')} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_pacientes_resumen_dia_delete
+        AFTER DELETE ON dimensiones_diarias
+        BEGIN {_restar_dia_paciente('OLD')} END""",
+)
+
+# Histogramas de intensidad y duración: por paciente y día, y por
+# enfermedad y mes. Cada fila es un intervalo (valor = límite inferior) con
+# su número de registros; cualquier periodo se obtiene sumando intervalos
+ANCHO_DURACION = 5              # minutos por intervalo; la intensidad va de uno en uno
+
+TABLA_HISTOGRAMAS_DIARIOS = """
+    CREATE TABLE IF NOT EXISTS histogramas_diarios (
+        paciente_id INTEGER NOT NULL,
+        dimension TEXT NOT NULL,
+        fecha DATE NOT NULL,
+        valor INTEGER NOT NULL,
+        registros INTEGER NOT NULL,
+        PRIMARY KEY (paciente_id, dimension, fecha, valor)
+    ) WITHOUT ROWID
+"""
+
+TABLA_HISTOGRAMAS_COHORTE = """
+    CREATE TABLE IF NOT EXISTS histogramas_cohorte (
+        enfermedad TEXT NOT NULL,
+        dimension TEXT NOT NULL,
+        mes TEXT NOT NULL,
+        valor INTEGER NOT NULL,
+        registros INTEGER NOT NULL,
+        PRIMARY KEY (dimension, mes, enfermedad, valor)
+    ) WITHOUT ROWID
+"""
+
+INDICES_HISTOGRAMAS = (
+    # Días sueltos de toda la clínica al principio y al final de un periodo;
+    # con registros (y la clave primaria) la consulta no toca la tabla
+    """CREATE INDEX IF NOT EXISTS idx_histogramas_diarios_fecha
+       ON histogramas_diarios(dimension, fecha, registros)""",
+)
+
+# Expresión del intervalo de cada dimensión a partir del valor registrado
+INTERVALOS_HISTOGRAMA = {
+    'intensidad': '{fila}.intensidad',
+    'duracion': f'({{fila}}.duracion / {ANCHO_DURACION}) * {ANCHO_DURACION}',
+}
+
+
+def _agregado_histograma(filtro: str) -> str:
+    """SELECT (paciente_id, dimension, fecha, valor, registros) desde dimensiones."""
+    return '\n        UNION ALL\n'.join(f"""
+        SELECT p.paciente_id, '{dimension}', d.fecha, {intervalo.format(fila='d')}, COUNT(*)
+        FROM dimensiones d
+        JOIN pensamientos p ON d.pensamiento_id = p.id
+        WHERE d.{dimension} IS NOT NULL AND d.fecha IS NOT NULL
+        AND p.paciente_id IS NOT NULL AND {filtro}
+        GROUP BY p.paciente_id, d.fecha, {intervalo.format(fila='d')}"""
+        for dimension, intervalo in INTERVALOS_HISTOGRAMA.items())
+
+
+def _sumar_histograma(fila: str) -> str:
+    return ''.join(f"""
+        INSERT INTO histogramas_diarios
+        SELECT paciente_id, '{dimension}', {fila}.fecha, {intervalo.format(fila=fila)}, 1
+        FROM pensamientos
+        WHERE id = {fila}.pensamiento_id AND paciente_id IS NOT NULL
+        AND {fila}.fecha IS NOT NULL AND {fila}.{dimension} IS NOT NULL
+        ON CONFLICT (paciente_id, dimension, fecha, valor) DO UPDATE SET
+            registros = registros + 1;"""
+        for dimension, intervalo in INTERVALOS_HISTOGRAMA.items())
+
+
+def _restar_histograma(fila: str) -> str:
+    clave = lambda dimension, intervalo: f"""
+        paciente_id = {_paciente_de(fila)} AND dimension = '{dimension}'
+        AND fecha = {fila}.fecha AND valor = {intervalo.format(fila=fila)}"""
+    return ''.join(f"""
+        UPDATE histogramas_diarios SET registros = registros - 1
+        WHERE {clave(dimension, intervalo)};
+        DELETE FROM histogramas_diarios
+        WHERE {clave(dimension, intervalo)} AND registros <= 0;"""
+        for dimension, intervalo in INTERVALOS_HISTOGRAMA.items())
+
+
+def _recalcular_histograma_paciente(paciente: str) -> str:
+    return f"""
+        DELETE FROM histogramas_diarios WHERE paciente_id = {paciente};
+        INSERT INTO histogramas_diarios {_agregado_histograma(f'p.paciente_id = {paciente}')};
+    """
+
+
+def _sumar_cohorte(fila: str, registros: str, enfermedad: Optional[str] = None) -> str:
+    """Suma registros al intervalo de la enfermedad y mes de una fila de histogramas_diarios."""
+    enfermedad = enfermedad or f"(SELECT IFNULL(enfermedad, '') FROM pacientes WHERE id = {fila}.paciente_id)"
+    return f"""
+        INSERT INTO histogramas_cohorte
+        SELECT {enfermedad}, {fila}.dimension, substr({fila}.fecha, 1, 7), {fila}.valor, {registros}
+        WHERE {enfermedad} IS NOT NULL
+        ON CONFLICT (dimension, mes, enfermedad, valor) DO UPDATE SET
+            registros = registros + excluded.registros;
+        DELETE FROM histogramas_cohorte
+        WHERE dimension = {fila}.dimension AND mes = substr({fila}.fecha, 1, 7)
+        AND enfermedad = {enfermedad} AND valor = {fila}.valor AND registros <= 0;
+    """
+
+
+def _mover_cohorte(paciente: str, enfermedad: str, signo: str) -> str:
+    """Suma (o resta) a una enfermedad todos los intervalos de un paciente."""
+    return f"""
+        INSERT INTO histogramas_cohorte
+        SELECT {enfermedad}, dimension, substr(fecha, 1, 7) AS mes, valor, {signo}SUM(registros)
+        FROM histogramas_diarios
+        WHERE paciente_id = {paciente}
+        GROUP BY dimension, mes, valor
+        ON CONFLICT (dimension, mes, enfermedad, valor) DO UPDATE SET
+            registros = registros + excluded.registros;
+        DELETE FROM histogramas_cohorte
+        WHERE enfermedad = {enfermedad} AND registros <= 0;
+    """
+
+
+DISPARADORES_HISTOGRAMAS = (
+    f"""CREATE TRIGGER IF NOT EXISTS trg_histogramas_insert
+        AFTER INSERT ON dimensiones
+        BEGIN {_sumar_histograma('NEW')} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_histogramas_update
+        AFTER UPDATE OF pensamiento_id, fecha, duracion, intensidad ON dimensiones
+        BEGIN {_restar_histograma('OLD')} {_sumar_histograma('NEW')} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_histogramas_delete
+        AFTER DELETE ON dimensiones
+        BEGIN {_restar_histograma('OLD')} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_histogramas_pensamiento_update
+        AFTER UPDATE OF paciente_id ON pensamientos
+        WHEN OLD.paciente_id IS NOT NEW.paciente_id
+        BEGIN
+            {_recalcular_histograma_paciente('OLD.paciente_id')}
+            {_recalcular_histograma_paciente('NEW.paciente_id')}
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_histogramas_pensamiento_delete
+        AFTER DELETE ON pensamientos
+        BEGIN {_recalcular_histograma_paciente('OLD.paciente_id')} END""",
+    # El nivel por enfermedad sigue los cambios del nivel diario
+    f"""CREATE TRIGGER IF NOT EXISTS trg_histogramas_cohorte_insert
+        AFTER INSERT ON histogramas_diarios
+        BEGIN {_sumar_cohorte('NEW', 'NEW.registros')} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_histogramas_cohorte_update
+        AFTER UPDATE OF registros ON histogramas_diarios
+        BEGIN {_sumar_cohorte('NEW', 'NEW.registros - OLD.registros')} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_histogramas_cohorte_delete
+        AFTER DELETE ON histogramas_diarios
+        BEGIN {_sumar_cohorte('OLD', '-OLD.registros')} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_histogramas_cohorte_enfermedad
+        AFTER UPDATE OF enfermedad ON pacientes
+        WHEN IFNULL(OLD.enfermedad, '') <> IFNULL(NEW.enfermedad, '')
+        BEGIN
+            {_mover_cohorte('OLD.id', "IFNULL(OLD.enfermedad, '')", '-')}
+            {_mover_cohorte('NEW.id', "IFNULL(NEW.enfermedad, '')", '')}
+        END""",
+)
+
+@contextmanager
+def transaccion(conn: sqlite3.Connection, inmediata: bool = False):
+    """Agrupa las sentencias del bloque en una transacción explícita."""
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute('BEGIN IMMEDIATE' if inmediata else 'BEGIN')
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def rellenar_paciente_id(conn: sqlite3.Connection,
+                         tamano_lote: int = TAMANO_LOTE_RELLENO) -> Tuple[int, List[str]]:
+    """Deduce paciente_id del prefijo del código en lotes confirmados por separado."""
+    actualizados = 0
+    huerfanos = []
+    ultimo_id = 0
+    while True:
+        lote = conn.execute("""
+            SELECT p.id, p.codigo, pa.id
+            FROM pensamientos p
+            LEFT JOIN pacientes pa ON pa.codigo = substr(p.codigo, 1, 4)
+            WHERE p.paciente_id IS NULL AND p.id > ?
+            ORDER BY p.id
+            LIMIT ?
+        """, (ultimo_id, tamano_lote)).fetchall()
+        if not lote:
+            break
+        ultimo_id = lote[-1][0]
+        cambios = [(paciente_id, pensamiento_id)
+                   for pensamiento_id, _, paciente_id in lote if paciente_id is not None]
+        huerfanos.extend(codigo for _, codigo, paciente_id in lote if paciente_id is None)
+        with transaccion(conn):
+            conn.executemany('UPDATE pensamientos SET paciente_id = ? WHERE id = ?', cambios)
+        actualizados += len(cambios)
+    return actualizados, huerfanos
+
+
+def reconstruir_resumen_diario(conn: sqlite3.Connection) -> int:
+    """Recalcula dimensiones_diarias completa a partir de dimensiones."""
+    with transaccion(conn):
+        conn.execute('DELETE FROM dimensiones_diarias')
+        return conn.execute(f"""
+            INSERT INTO dimensiones_diarias
+            {AGREGADO_DIARIO}
+            WHERE pensamiento_id IS NOT NULL AND fecha IS NOT NULL
+            GROUP BY pensamiento_id, fecha
+        """).rowcount
+
+
+def reconstruir_resumen_pacientes(conn: sqlite3.Connection) -> int:
+    """Recalcula pacientes_diarios y pacientes_resumen a partir de dimensiones_diarias."""
+    with transaccion(conn):
+        conn.execute('DELETE FROM pacientes_diarios')
+        conn.execute('DELETE FROM pacientes_resumen')
+        conn.execute("""
+            INSERT INTO pacientes_diarios
+            SELECT p.paciente_id, r.fecha, SUM(r.registros), SUM(r.cantidad)
+            FROM dimensiones_diarias r
+            JOIN pensamientos p ON r.pensamiento_id = p.id
+            WHERE p.paciente_id IS NOT NULL
+            GROUP BY p.paciente_id, r.fecha
+        """)
+        return conn.execute(f'INSERT INTO pacientes_resumen {AGREGADO_PACIENTE}').rowcount
+
+
+def reconstruir_histogramas(conn: sqlite3.Connection) -> int:
+    """Recalcula histogramas_diarios y histogramas_cohorte a partir de dimensiones."""
+    with transaccion(conn):
+        conn.execute('DELETE FROM histogramas_cohorte')
+        conn.execute('DELETE FROM histogramas_diarios')
+        filas = conn.execute(
+            f'INSERT INTO histogramas_diarios {_agregado_histograma("1")}').rowcount
+        # Si los disparadores ya existen han ido rellenando el nivel por enfermedad
+        conn.execute('DELETE FROM histogramas_cohorte')
+        conn.execute("""
+            INSERT INTO histogramas_cohorte
+            SELECT IFNULL(pa.enfermedad, ''), h.dimension, substr(h.fecha, 1, 7) AS mes,
+                   h.valor, SUM(h.registros)
+            FROM histogramas_diarios h
+            JOIN pacientes pa ON pa.id = h.paciente_id
+            GROUP BY 1, h.dimension, mes, h.valor
+        """)
+        return filas
+
+
+def preparar_esquema(conn: sqlite3.Connection):
+    """Aplica de forma idempotente los índices y disparadores de consulta."""
+    rellenar_paciente_id(conn)
+    resumen_existente = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'dimensiones_diarias'"
+    ).fetchone()
+    pacientes_existente = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'pacientes_resumen'"
+    ).fetchone()
+    with transaccion(conn):
+        for sentencia in (DISPARADORES_PACIENTE + INDICES + (TABLA_RESUMEN_DIARIO,)
+                          + DISPARADORES_RESUMEN_DIARIO):
+            conn.execute(sentencia)
+    if not resumen_existente:
+        reconstruir_resumen_diario(conn)
+    # Se crean después de rellenar dimensiones_diarias para no disparar fila a fila
+    with transaccion(conn):
+        for sentencia in ((TABLA_PACIENTES_DIARIOS, TABLA_RESUMEN_PACIENTES)
+                          + DISPARADORES_RESUMEN_PACIENTES):
+            conn.execute(sentencia)
+    if not resumen_existente or not pacientes_existente:
+        reconstruir_resumen_pacientes(conn)
+    histogramas_existente = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'histogramas_diarios'"
+    ).fetchone()
+    with transaccion(conn):
+        for sentencia in (TABLA_HISTOGRAMAS_DIARIOS, TABLA_HISTOGRAMAS_COHORTE) + INDICES_HISTOGRAMAS:
+            conn.execute(sentencia)
+    if not histogramas_existente:
+        reconstruir_histogramas(conn)
+    with transaccion(conn):
+        for sentencia in DISPARADORES_HISTOGRAMAS:
+            conn.execute(sentencia)
+    conn.execute('PRAGMA optimize')
+
+
+def plan_consulta(conn: sqlite3.Connection, sql: str,
+                  parametros: Sequence = ()) -> List[str]:
+    """Devuelve el detalle de EXPLAIN QUERY PLAN para una consulta."""
+    return [fila[3] for fila in conn.execute(f'EXPLAIN QUERY PLAN {sql}', parametros)]
+
+
+if __name__ == '__main__':
+    import argparse
+    from servicio_bd import obtener_servicio
+
+    parser = argparse.ArgumentParser(
+        description='Mantenimiento del esquema de la clínica (los planes de consulta '
+                    'se comprueban con verificar_planes.py)')
+    parser.add_argument('accion', choices=['rellenar', 'reconstruir'],
+                        help='rellenar paciente_id o reconstruir los resúmenes y los histogramas')
+    args = parser.parse_args()
+
+    with obtener_servicio().conexion() as conn:
+        if args.accion == 'rellenar':
+            actualizados, huerfanos = rellenar_paciente_id(conn)
+            print(f'Pensamientos actualizados: {actualizados}')
+            for codigo in huerfanos:
+                print(f'Sin paciente para el código {codigo}')
+            raise SystemExit(1 if huerfanos else 0)
+        print(f'Días resumidos: {reconstruir_resumen_diario(conn)}')
+        print(f'Pacientes resumidos: {reconstruir_resumen_pacientes(conn)}')
+        print(f'Intervalos de histograma: {reconstruir_histogramas(conn)}')
@@ -7,26 +7,28 @@ import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
 import numpy as np
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List
 import pandas as pd
+from servicio_bd import obtener_servicio
+from lista_pacientes import etiquetas_pacientes
+from motor_estadisticas import SeriesAgrupadas, series_periodo
 
 class VentanaEstadisticas:
     def __init__(self):
         self.ventana = tk.Tk()
         self.ventana.title("Estadísticas de Pensamientos")
         self.ventana.geometry("1280x800")
+        self.db = obtener_servicio()
         
         # Variables
         self.paciente_seleccionado = tk.StringVar()
         self.dimension_actual = tk.StringVar(value="veces")
         self.periodo_seleccionado = tk.StringVar(value="personalizado")
+        self.resolucion = tk.StringVar(value="dia")
         self.pensamiento_seleccionado = None
+        self.frame_derecho = None
         self.colores_base = plt.cm.Set3(np.linspace(0, 1, 12))
         
-        # Cache para datos
-        self._cache_datos = {}
-        self._ultimo_refresco = None
-        
         self.crear_widgets()
         self.cargar_pacientes()
         
@@ -118,6 +120,22 @@ class VentanaEstadisticas:
                           variable=self.dimension_actual,
                           command=self.actualizar_graficos).pack(side=tk.LEFT, padx=5)
         
+        # Selector de agrupación del gráfico de frecuencia
+        frame_resolucion = ttk.LabelFrame(frame_inf, text="Agrupar por", padding=5)
+        frame_resolucion.pack(side=tk.LEFT, padx=20)
+        
+        resoluciones = [
+            ("Día", "dia"),
+            ("Semana", "semana"),
+            ("Mes", "mes"),
+            ("Trimestre", "trimestre")
+        ]
+        
+        for texto, valor in resoluciones:
+            ttk.Radiobutton(frame_resolucion, text=texto, value=valor,
+                          variable=self.resolucion,
+                          command=self.crear_grafico_frecuencia).pack(side=tk.LEFT, padx=5)
+        
         # Botones de control
         frame_botones = ttk.Frame(frame_inf)
         frame_botones.pack(side=tk.LEFT, padx=20)
@@ -168,95 +186,76 @@ class VentanaEstadisticas:
 
     def cargar_pacientes(self):
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            cursor.execute("SELECT codigo, nombre FROM pacientes ORDER BY codigo")
-            pacientes = cursor.fetchall()
-            self.combo_pacientes['values'] = [f"{p[0]} - {p[1]}" for p in pacientes]
-            conn.close()
+            self.combo_pacientes['values'] = etiquetas_pacientes(self.db)
         except sqlite3.Error as e:
             messagebox.showerror("Error", f"Error al cargar pacientes: {str(e)}")
 
+    def leer_registros(self, query: str, params: List) -> List[Dict]:
+        """Lee la consulta con pandas reutilizando el resultado mientras la base no cambie"""
+        def calcular():
+            with self.db.conexion() as conn:
+                return pd.read_sql_query(query, conn, params=params).to_dict('records')
+        return self.db.cache.obtener(query, params, calcular, 'records')
+
     def obtener_datos_dimensiones(self) -> Dict:
-        """Obtiene los datos de dimensiones con caché"""
+        """Obtiene los datos de dimensiones"""
         if not self.paciente_seleccionado.get():
             return {}
             
-        # Verificar caché
-        cache_key = (
-            self.paciente_seleccionado.get(),
-            self.fecha_inicio.get_date(),
-            self.fecha_fin.get_date()
-        )
-        
-        if cache_key in self._cache_datos and self._ultimo_refresco and \
-           (datetime.now() - self._ultimo_refresco).seconds < 300:  # 5 minutos
-            return self._cache_datos[cache_key]
-            
-        datos = self._obtener_datos_dimensiones_db()
-        self._cache_datos[cache_key] = datos
-        self._ultimo_refresco = datetime.now()
-        
-        return datos
-
-    def _obtener_datos_dimensiones_db(self) -> Dict:
-        """Obtiene los datos de dimensiones desde la base de datos"""
         codigo_paciente = self.paciente_seleccionado.get().split(' - ')[0]
         fecha_inicio = self.fecha_inicio.get_date().strftime('%Y-%m-%d')
         fecha_fin = self.fecha_fin.get_date().strftime('%Y-%m-%d')
         
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
             query = """
                 SELECT 
                     p.codigo, 
                     p.pensamiento,
-                    COUNT(d.id) as total_registros,
-                    SUM(d.cantidad) as total_cantidad,
-                    SUM(d.duracion) as total_duracion,
-                    AVG(d.intensidad) as promedio_intensidad,
-                    MAX(d.cantidad) as max_cantidad,
-                    MAX(d.duracion) as max_duracion,
-                    COUNT(DISTINCT d.fecha) as dias_registrados
+                    IFNULL(SUM(r.registros), 0) as total_registros,
+                    SUM(r.cantidad) as total_cantidad,
+                    SUM(r.duracion) as total_duracion,
+                    SUM(r.suma_intensidad) * 1.0 / NULLIF(SUM(r.registros_intensidad), 0) as promedio_intensidad,
+                    MAX(r.max_cantidad) as max_cantidad,
+                    MAX(r.max_duracion) as max_duracion,
+                    COUNT(r.fecha) as dias_registrados
                 FROM pensamientos p
-                LEFT JOIN dimensiones d ON d.pensamiento_id = p.id
-                    AND d.fecha BETWEEN ? AND ?
-                WHERE p.codigo LIKE ?
+                LEFT JOIN dimensiones_diarias r ON r.pensamiento_id = p.id
+                    AND r.fecha BETWEEN ? AND ?
+                WHERE p.paciente_id = (SELECT id FROM pacientes WHERE codigo = ?)
                 GROUP BY p.codigo, p.pensamiento
                 ORDER BY total_cantidad DESC
             """
             
-            df = pd.read_sql_query(query, conn, params=[fecha_inicio, fecha_fin, f'{codigo_paciente}%'])
-            conn.close()
-            
-            return df.to_dict('records')
+            return self.leer_registros(query, [fecha_inicio, fecha_fin, codigo_paciente])
             
         except (sqlite3.Error, pd.io.sql.DatabaseError) as e:
             messagebox.showerror("Error", f"Error al obtener datos: {str(e)}")
             return {}
 
-    def obtener_datos_diarios(self, codigo_pensamiento: str) -> List:
+    def obtener_series(self) -> SeriesAgrupadas:
+        """Series de todos los pensamientos del paciente agrupadas según la resolución elegida"""
+        codigo_paciente = self.paciente_seleccionado.get().split(' - ')[0]
         fecha_inicio = self.fecha_inicio.get_date().strftime('%Y-%m-%d')
         fecha_fin = self.fecha_fin.get_date().strftime('%Y-%m-%d')
-        
+        return series_periodo(self.db, codigo_paciente, fecha_inicio, fecha_fin,
+                              self.resolucion.get())
+
+    def obtener_datos_periodo(self, codigo_pensamiento: str) -> Dict:
+        """Columnas de la serie del pensamiento, con los periodos sin registros a 0"""
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            query = """
-                SELECT d.fecha, d.cantidad, d.duracion, d.intensidad
-                FROM dimensiones d
-                JOIN pensamientos p ON d.pensamiento_id = p.id
-                WHERE p.codigo = ? 
-                AND d.fecha BETWEEN ? AND ?
-                ORDER BY d.fecha
-            """
-            
-            df = pd.read_sql_query(query, conn, params=[codigo_pensamiento, fecha_inicio, fecha_fin])
-            conn.close()
-            return df.to_dict('records')
-            
-        except (sqlite3.Error, pd.io.sql.DatabaseError) as e:
-            messagebox.showerror("Error", f"Error al obtener datos diarios: {str(e)}")
-            return []
+            serie = self.obtener_series().serie(codigo_pensamiento)
+        except sqlite3.Error as e:
+            messagebox.showerror("Error", f"Error al obtener datos por periodo: {str(e)}")
+            return {}
+        if not serie.registros.any():
+            return {}
+        return {
+            'fecha': serie.fechas,
+            'registros': serie.registros,
+            'cantidad': serie.cantidad,
+            'duracion': serie.duracion,
+            'intensidad': serie.intensidad,
+        }
 
     def actualizar_graficos(self, event=None):
         """Actualiza todos los elementos visuales"""
@@ -266,6 +265,7 @@ class VentanaEstadisticas:
         # Limpiar frame de gráficos
         for widget in self.frame_graficos.winfo_children():
             widget.destroy()
+        self.frame_derecho = None
             
         datos = self.obtener_datos_dimensiones()
         if not datos:
@@ -320,11 +320,6 @@ class VentanaEstadisticas:
             etiquetas = df['codigo']
             colores = [self.colores_base[i % len(self.colores_base)] for i in range(len(df))]
         else:  # intensidad
-            valores = df['promedio_intensidad']
-            etiquetas = df['codigo']
-            colores = ['lightgreen' if v <= 3 else 'yellow' if v <= 7 else 'red' 
-                      for v indef crear_grafico_circular(self, datos: List[Dict]):
-        # ... (continuación del método anterior)
             valores = df['promedio_intensidad']
             etiquetas = df['codigo']
             colores = ['lightgreen' if v <= 3 else 'yellow' if v <= 7 else 'red' 
@@ -375,12 +370,15 @@ class VentanaEstadisticas:
         if not self.pensamiento_seleccionado:
             return
             
-        datos_diarios = self.obtener_datos_diarios(self.pensamiento_seleccionado)
-        if not datos_diarios:
+        datos_periodo = self.obtener_datos_periodo(self.pensamiento_seleccionado)
+        if self.frame_derecho is not None:
+            self.frame_derecho.destroy()
+            self.frame_derecho = None
+        if not datos_periodo:
             return
             
         # Frame para el gráfico y descripción
-        frame_derecho = ttk.Frame(self.frame_graficos)
+        frame_derecho = self.frame_derecho = ttk.Frame(self.frame_graficos)
         frame_derecho.grid(row=0, column=1, sticky="nsew", padx=5, pady=5)
         
         # Crear figura para el gráfico de frecuencia
@@ -388,7 +386,7 @@ class VentanaEstadisticas:
         ax = fig.add_subplot(111)
         
         # Preparar datos usando pandas
-        df = pd.DataFrame(datos_diarios)
+        df = pd.DataFrame(datos_periodo)
         dimension = self.dimension_actual.get()
         
         if dimension == "veces":
@@ -409,7 +407,8 @@ class VentanaEstadisticas:
         ax.set_ylim(0, ymax * 1.1)  # Añadir 10% de margen superior
         
         # Configurar ejes
-        ax.set_xlabel("Fecha")
+        ax.set_xlabel({"dia": "Fecha", "semana": "Semana (desde el lunes)",
+                       "mes": "Mes", "trimestre": "Trimestre"}[self.resolucion.get()])
         ax.set_ylabel(titulo)
         
         # Rotar etiquetas del eje X
@@ -428,12 +427,8 @@ class VentanaEstadisticas:
         
         # Obtener y mostrar la descripción del pensamiento y estadísticas
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            cursor.execute("SELECT pensamiento FROM pensamientos WHERE codigo = ?", 
-                         (self.pensamiento_seleccionado,))
-            pensamiento = cursor.fetchone()[0]
-            conn.close()
+            pensamiento = self.db.consultar_uno("SELECT pensamiento FROM pensamientos WHERE codigo = ?", 
+                         (self.pensamiento_seleccionado,))[0]
             
             # Frame para la descripción y estadísticas
             frame_info = ttk.Frame(frame_derecho)
@@ -463,8 +458,8 @@ class VentanaEstadisticas:
             
             # Calcular estadísticas
             stats = {
-                "Total registros": len(df),
-                "Promedio diario": round(valores.mean(), 2),
+                "Total registros": int(df['registros'].sum()),
+                "Promedio por periodo": round(valores.mean(), 2),
                 "Máximo": valores.max(),
                 "Mínimo": valores.min(),
                 "Último registro": valores.iloc[-1] if len(valores) > 0 else 0
@@ -4,14 +4,19 @@ import sqlite3
 from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import numpy as np
-from collections import defaultdict
+from servicio_bd import obtener_servicio
+from lista_pacientes import etiquetas_pacientes
+from motor_estadisticas import resumen_periodo, serie_diaria
+
+# Botón de dimensión de la ventana y su nombre en el motor de estadísticas
+DIMENSIONES = {'veces': 'cantidad', 'minutos': 'duracion', 'intensidad': 'intensidad'}
 
 class VentanaEstadisticas:
     def __init__(self, parent):
         self.ventana = tk.Toplevel(parent)
         self.ventana.title("Estadísticas de Pensamientos")
         self.ventana.geometry("1200x800")
+        self.db = obtener_servicio()
         
         self.main_frame = ttk.Frame(self.ventana, padding="10")
         self.main_frame.pack(fill=tk.BOTH, expand=True)
@@ -71,20 +76,11 @@ class VentanaEstadisticas:
 
     def cargar_pacientes(self):
         try:
-            conn = sqlite3.connect('../../db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            cursor.execute("SELECT codigo, nombre FROM pacientes ORDER BY codigo")
-            pacientes = cursor.fetchall()
-            self.combo_pacientes['values'] = [f"{p[0]} - {p[1]}" for p in pacientes]
-            conn.close()
+            self.combo_pacientes['values'] = etiquetas_pacientes(self.db)
         except sqlite3.Error as e:
             messagebox.showerror("Error", f"Error al cargar pacientes: {str(e)}")
 
-    def obtener_datos_periodo(self):
-        if not self.paciente_seleccionado.get():
-            return None
-            
-        codigo_paciente = self.paciente_seleccionado.get().split(' - ')[0]
+    def rango_periodo(self):
         fecha_actual = datetime.now().date()
         
         if self.periodo_actual.get() == "día":
@@ -93,23 +89,17 @@ class VentanaEstadisticas:
             fecha_inicio = fecha_actual - timedelta(days=6)
         else:  # mes
             fecha_inicio = fecha_actual - timedelta(days=29)
+        return fecha_inicio, fecha_actual
+
+    def obtener_datos_periodo(self):
+        if not self.paciente_seleccionado.get():
+            return None
             
-        try:
-            conn = sqlite3.connect('../../db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT p.codigo, p.pensamiento, d.fecha, d.cantidad, d.duracion, d.intensidad
-                FROM dimensiones d
-                JOIN pensamientos p ON d.pensamiento_id = p.id
-                WHERE p.codigo LIKE ? AND d.fecha BETWEEN ? AND ?
-                ORDER BY d.fecha
-            """, (f'{codigo_paciente}%', fecha_inicio, fecha_actual))
-            
-            datos = cursor.fetchall()
-            conn.close()
+        codigo_paciente = self.paciente_seleccionado.get().split(' - ')[0]
+        fecha_inicio, fecha_actual = self.rango_periodo()
             
-            return datos
+        try:
+            return resumen_periodo(self.db, codigo_paciente, fecha_inicio, fecha_actual)
         except sqlite3.Error as e:
             messagebox.showerror("Error", f"Error al obtener datos: {str(e)}")
             return None
@@ -140,8 +130,8 @@ class VentanaEstadisticas:
             ttk.Button(ventana, text="Cerrar", command=ventana.destroy).pack(pady=10)
 
     def actualizar_grafico_circular(self):
-        datos = self.obtener_datos_periodo()
-        if not datos:
+        resumen = self.obtener_datos_periodo()
+        if not resumen:
             return
             
         # Limpiar panel
@@ -149,22 +139,18 @@ class VentanaEstadisticas:
             if isinstance(widget, FigureCanvasTkAgg):
                 widget.get_tk_widget().destroy()
         
-        # Procesar datos
-        dimension_idx = {'veces': 3, 'minutos': 4, 'intensidad': 5}[self.dimension_actual.get()]
-        totales_pensamiento = defaultdict(float)
+        # Suma de veces y minutos, media de intensidad por pensamiento
+        valores = resumen.valores(DIMENSIONES[self.dimension_actual.get()])
+        con_valor = valores > 0
+        self.datos_pensamientos.update(zip(resumen.codigos, resumen.pensamientos))
         
-        for dato in datos:
-            if dato[dimension_idx] is not None:  # Considerar valores nulos
-                totales_pensamiento[dato[0]] += dato[dimension_idx]
-                self.datos_pensamientos[dato[0]] = dato[1]  # Guardar descripción
-        
-        if not totales_pensamiento:
+        if not con_valor.any():
             return
             
         # Crear gráfico
         fig, ax = plt.subplots(figsize=(6, 6))
-        valores = list(totales_pensamiento.values())
-        etiquetas = list(totales_pensamiento.keys())
+        valores = list(valores[con_valor])
+        etiquetas = list(resumen.codigos[con_valor])
         
         if self.dimension_actual.get() == 'intensidad':
             colores = ['#90EE90' if v <= 3 else '#FFD700' if v <= 7 else '#FF6B6B' 
@@ -194,8 +180,7 @@ class VentanaEstadisticas:
         if self.periodo_actual.get() == "día":
             return
             
-        datos = self.obtener_datos_periodo()
-        if not datos or not self.pensamiento_seleccionado:
+        if not self.paciente_seleccionado.get() or not self.pensamiento_seleccionado:
             return
             
         # Limpiar panel
@@ -203,35 +188,23 @@ class VentanaEstadisticas:
             if isinstance(widget, FigureCanvasTkAgg):
                 widget.get_tk_widget().destroy()
         
-        # Filtrar datos del pensamiento seleccionado
-        datos_pensamiento = [d for d in datos if d[0] == self.pensamiento_seleccionado]
+        fecha_inicio, fecha_actual = self.rango_periodo()
+        try:
+            serie = serie_diaria(self.db, self.pensamiento_seleccionado, fecha_inicio, fecha_actual)
+        except sqlite3.Error as e:
+            messagebox.showerror("Error", f"Error al obtener datos: {str(e)}")
+            return
         
-        if not datos_pensamiento:
+        if not len(serie):
             return
             
-        # Procesar datos por fecha
-        dimension_idx = {'veces': 3, 'minutos': 4, 'intensidad': 5}[self.dimension_actual.get()]
-        valores_por_fecha = defaultdict(float)
-        
-        fecha_inicio = datetime.strptime(datos_pensamiento[0][2], '%Y-%m-%d').date()
-        fecha_fin = datetime.strptime(datos_pensamiento[-1][2], '%Y-%m-%d').date()
-        
-        # Llenar fechas faltantes con ceros
-        fecha_actual = fecha_inicio
-        while fecha_actual <= fecha_fin:
-            valores_por_fecha[fecha_actual] = 0
-            fecha_actual += timedelta(days=1)
-        
-        # Sumar valores por fecha
-        for dato in datos_pensamiento:
-            if dato[dimension_idx] is not None:
-                fecha = datetime.strptime(dato[2], '%Y-%m-%d').date()
-                valores_por_fecha[fecha] += dato[dimension_idx]
+        # Del primer al último día con registros, con ceros en los días vacíos
+        serie = serie.rellenar(serie.fechas[0], serie.fechas[-1])
         
         # Crear gráfico
         fig, ax = plt.subplots(figsize=(8, 4))
-        fechas = list(valores_por_fecha.keys())
-        valores = list(valores_por_fecha.values())
+        fechas = serie.fechas.astype(object)
+        valores = serie.valores(DIMENSIONES[self.dimension_actual.get()])
         
         ax.plot(fechas, valores, marker='o')
         ax.set_xlabel('Fecha')
@@ -8,12 +8,18 @@ from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
 import numpy as np
 from typing import Dict, Tuple
+from servicio_bd import obtener_servicio
+from lista_pacientes import etiquetas_pacientes
+from motor_estadisticas import resumen_periodo, serie_diaria
+from ejecutor_consultas import EjecutorConsultas
 
 class EstadisticasPensamientos:
-    def __init__(self):
+    def __init__(self, instantanea: bool = False):
         self.ventana = tk.Tk()
         self.ventana.title("Estadísticas de Pensamientos")
         self.ventana.geometry("1200x800")
+        # Con instantanea=True se lee de una copia en memoria de la base
+        self.db = obtener_servicio(instantanea=instantanea)
         
         # Variables
         self.paciente_seleccionado = tk.StringVar()
@@ -21,6 +27,9 @@ class EstadisticasPensamientos:
         self.pensamiento_seleccionado = None
         self.perspectiva_3d = tk.BooleanVar(value=True)
         
+        # Las consultas se ejecutan en segundo plano para no bloquear la ventana
+        self.consultas = EjecutorConsultas(self.ventana, self.db)
+        
         # Crear widgets
         self.crear_widgets()
         self.cargar_pacientes()
@@ -89,90 +98,23 @@ class EstadisticasPensamientos:
         
     def cargar_pacientes(self):
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            cursor.execute("SELECT codigo, nombre FROM pacientes ORDER BY codigo")
-            pacientes = cursor.fetchall()
-            self.combo_pacientes['values'] = [f"{p[0]} - {p[1]}" for p in pacientes]
-            conn.close()
+            self.combo_pacientes['values'] = etiquetas_pacientes(self.db)
         except sqlite3.Error as e:
             messagebox.showerror("Error", f"Error al cargar pacientes: {str(e)}")
             
-    def obtener_datos_dimensiones(self) -> Dict:
-        if not self.paciente_seleccionado.get():p
-            return {}
-            
-        codigo_paciente = self.paciente_seleccionado.get().split(' - ')[0]
-        fecha_inicio = self.fecha_inicio.get_date()
-        fecha_fin = self.fecha_fin.get_date()
-        
-        try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT p.codigo, p.pensamiento, 
-                       SUM(d.cantidad) as total_cantidad,
-                       SUM(d.duracion) as total_duracion,
-                       AVG(d.intensidad) as promedio_intensidad
-                FROM dimensiones d
-                JOIN pensamientos p ON d.pensamiento_id = p.id
-                WHERE p.codigo LIKE ? 
-                AND d.fecha BETWEEN ? AND ?
-                GROUP BY p.codigo, p.pensamiento
-            """, (f'{codigo_paciente}%', fecha_inicio.strftime('%Y-%m-%d'), 
-                  fecha_fin.strftime('%Y-%m-%d')))
+    def rango_fechas(self) -> Tuple[str, str]:
+        return (self.fecha_inicio.get_date().strftime('%Y-%m-%d'),
+                self.fecha_fin.get_date().strftime('%Y-%m-%d'))
             
-            resultados = {}
-            for row in cursor.fetchall():
-                resultados[row[0]] = {
-                    'pensamiento': row[1],
-                    'cantidad': row[2] or 0,
-                    'duracion': row[3] or 0,
-                    'intensidad': row[4] or 0
-                }
-                
-            conn.close()
-            return resultados
-        except sqlite3.Error as e:
-            messagebox.showerror("Error", f"Error al obtener datos: {str(e)}")
-            return {}
+    def obtener_datos_dimensiones(self, codigo_paciente: str, fecha_inicio: str,
+                                  fecha_fin: str) -> Dict:
+        # Se ejecuta en un hilo de fondo: no debe tocar widgets
+        return resumen_periodo(self.db, codigo_paciente, fecha_inicio, fecha_fin).como_dict()
             
-    def obtener_datos_diarios(self, codigo_pensamiento: str) -> Dict:
-        fecha_inicio = self.fecha_inicio.get_date()
-        fecha_fin = self.fecha_fin.get_date()
-        
-        try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT d.fecha, 
-                       SUM(d.cantidad) as total_cantidad,
-                       SUM(d.duracion) as total_duracion,
-                       AVG(d.intensidad) as promedio_intensidad
-                FROM dimensiones d
-                JOIN pensamientos p ON d.pensamiento_id = p.id
-                WHERE p.codigo = ? 
-                AND d.fecha BETWEEN ? AND ?
-                GROUP BY d.fecha
-                ORDER BY d.fecha
-            """, (codigo_pensamiento, fecha_inicio.strftime('%Y-%m-%d'), 
-                  fecha_fin.strftime('%Y-%m-%d')))
-            
-            resultados = {}
-            for row in cursor.fetchall():
-                resultados[row[0]] = {
-                    'cantidad': row[1] or 0,
-                    'duracion': row[2] or 0,
-                    'intensidad': row[3] or 0
-                }
-                
-            conn.close()
-            return resultados
-        except sqlite3.Error as e:
-            messagebox.showerror("Error", f"Error al obtener datos diarios: {str(e)}")
-            return {}
+    def obtener_datos_diarios(self, codigo_pensamiento: str, fecha_inicio: str,
+                              fecha_fin: str) -> Dict:
+        # Se ejecuta en un hilo de fondo: no debe tocar widgets
+        return serie_diaria(self.db, codigo_pensamiento, fecha_inicio, fecha_fin).como_dict()
     
     def actualizar_graficos(self, event=None):
         # Limpiar frame de gráficos
@@ -180,17 +122,28 @@ class EstadisticasPensamientos:
             widget.destroy()
             
         if not self.paciente_seleccionado.get():
+            self.consultas.cancelar_todas()
             return
             
-        # Crear y mostrar gráfico circular
-        self.crear_grafico_circular()
+        # Crear y mostrar gráfico circular cuando lleguen los datos
+        codigo_paciente = self.paciente_seleccionado.get().split(' - ')[0]
+        self.consultas.enviar(
+            'circular', self.obtener_datos_dimensiones, codigo_paciente, *self.rango_fechas(),
+            al_terminar=self.crear_grafico_circular,
+            al_fallar=lambda e: messagebox.showerror("Error", f"Error al obtener datos: {str(e)}"))
         
         # Mostrar gráfico de línea si hay pensamiento seleccionado
         if self.pensamiento_seleccionado:
-            self.crear_grafico_linea()
+            self.solicitar_grafico_linea()
             
-    def crear_grafico_circular(self):
-        datos = self.obtener_datos_dimensiones()
+    def solicitar_grafico_linea(self):
+        self.consultas.enviar(
+            'linea', self.obtener_datos_diarios, self.pensamiento_seleccionado,
+            *self.rango_fechas(),
+            al_terminar=self.crear_grafico_linea,
+            al_fallar=lambda e: messagebox.showerror("Error", f"Error al obtener datos diarios: {str(e)}"))
+            
+    def crear_grafico_circular(self, datos: Dict):
         if not datos:
             return
             
@@ -302,23 +255,19 @@ class EstadisticasPensamientos:
                             if angulos[i] <= angulo <= angulos[i+1]:
                                 self.mostrar_pensamiento(datos[etiquetas[i]]['pensamiento'])
                                 self.pensamiento_seleccionado = etiquetas[i]
-                                self.crear_grafico_linea()
+                                self.solicitar_grafico_linea()
                                 break
                 else:
                     for i, wedge in enumerate(wedges):
                         if wedge.contains_point([event.x, event.y]):
                             self.mostrar_pensamiento(datos[etiquetas[i]]['pensamiento'])
                             self.pensamiento_seleccionado = etiquetas[i]
-                            self.crear_grafico_linea()
+                            self.solicitar_grafico_linea()
                             break
                             
         canvas.mpl_connect('button_press_event', on_click)
         
-    def crear_grafico_linea(self):
-        if not self.pensamiento_seleccionado:
-            return
-            
-        datos = self.obtener_datos_diarios(self.pensamiento_seleccionado)
+    def crear_grafico_linea(self, datos: Dict):
         if not datos:
             return
             
@@ -379,5 +328,10 @@ class EstadisticasPensamientos:
         self.ventana.mainloop()
 
 if __name__ == "__main__":
-    app = EstadisticasPensamientos()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Estadísticas de pensamientos")
+    parser.add_argument('--instantanea', action='store_true',
+                        help='trabajar sobre una copia en memoria de la base')
+    app = EstadisticasPensamientos(parser.parse_args().instantanea)
     app.ejecutar()
\ No newline at end of file
@@ -5,20 +5,26 @@ from datetime import datetime
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
-import numpy as np
-import os
+from servicio_bd import obtener_servicio
+from lista_pacientes import etiquetas_pacientes
+from motor_estadisticas import resumen_periodo
+from ejecutor_consultas import EjecutorConsultas
 
 class VentanaEstadisticas:
     def __init__(self):
         self.ventana = tk.Tk()
         self.ventana.title("Estadísticas de Pensamientos - Vista Diaria")
         self.ventana.geometry("800x600")
+        self.db = obtener_servicio()
         
         # Variables
         self.paciente_seleccionado = tk.StringVar()
         self.dimension_actual = tk.StringVar(value="veces")
         self.fecha_actual = datetime.now()
         
+        # Las consultas se ejecutan en segundo plano para no bloquear la ventana
+        self.consultas = EjecutorConsultas(self.ventana, self.db)
+        
         self.crear_widgets()
         self.cargar_pacientes()
         
@@ -55,59 +61,31 @@ class VentanaEstadisticas:
         
     def cargar_pacientes(self):
         try:
-            conn = sqlite3.connect(os.path.join('..', '..', 'data', 'db_psicologia_clinic.db'))
-            cursor = conn.cursor()
-            cursor.execute("SELECT codigo, nombre FROM pacientes ORDER BY codigo")
-            pacientes = cursor.fetchall()
-            self.combo_pacientes['values'] = [f"{p[0]} - {p[1]}" for p in pacientes]
-            conn.close()
+            self.combo_pacientes['values'] = etiquetas_pacientes(self.db)
         except sqlite3.Error as e:
             messagebox.showerror("Error", f"Error al cargar pacientes: {str(e)}")
             
-    def obtener_datos_dia(self):
-        if not self.paciente_seleccionado.get():
-            return {}
-            
-        codigo_paciente = self.paciente_seleccionado.get().split(' - ')[0]
-        fecha = self.fecha_actual.strftime('%Y-%m-%d')
-        
-        try:
-            conn = sqlite3.connect(os.path.join('..', '..', 'data', 'db_psicologia_clinic.db'))
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT p.codigo, p.pensamiento, 
-                       SUM(d.cantidad) as total_cantidad,
-                       SUM(d.duracion) as total_duracion,
-                       AVG(d.intensidad) as promedio_intensidad
-                FROM dimensiones d
-                JOIN pensamientos p ON d.pensamiento_id = p.id
-                WHERE p.codigo LIKE ? AND d.fecha = ?
-                GROUP BY p.codigo, p.pensamiento
-                HAVING total_cantidad > 0
-            """, (f'{codigo_paciente}%', fecha))
-            
-            resultados = {}
-            for row in cursor.fetchall():
-                resultados[row[0]] = {
-                    'pensamiento': row[1],
-                    'cantidad': row[2] or 0,
-                    'duracion': row[3] or 0,
-                    'intensidad': row[4] or 0
-                }
-                
-            conn.close()
-            return resultados
-        except sqlite3.Error as e:
-            messagebox.showerror("Error", f"Error al obtener datos: {str(e)}")
-            return {}
+    def obtener_datos_dia(self, codigo_paciente, fecha):
+        # Se ejecuta en un hilo de fondo: no debe tocar widgets
+        resumen = resumen_periodo(self.db, codigo_paciente, fecha, fecha)
+        return resumen.seleccionar(resumen.cantidad > 0).como_dict()
             
     def actualizar_grafico(self, event=None):
         # Limpiar frame de gráfico
         for widget in self.frame_grafico.winfo_children():
             widget.destroy()
             
-        datos = self.obtener_datos_dia()
+        if not self.paciente_seleccionado.get():
+            self.consultas.cancelar_todas()
+            return
+            
+        codigo_paciente = self.paciente_seleccionado.get().split(' - ')[0]
+        self.consultas.enviar(
+            'dia', self.obtener_datos_dia, codigo_paciente, self.fecha_actual.strftime('%Y-%m-%d'),
+            al_terminar=self.crear_grafico,
+            al_fallar=lambda e: messagebox.showerror("Error", f"Error al obtener datos: {str(e)}"))
+            
+    def crear_grafico(self, datos):
         if not datos:
             return
             
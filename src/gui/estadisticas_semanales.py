@@ -5,14 +5,17 @@ from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
-import numpy as np
-import os
+from servicio_bd import obtener_servicio
+from lista_pacientes import etiquetas_pacientes
+from motor_estadisticas import resumen_periodo, serie_diaria
+from ejecutor_consultas import EjecutorConsultas
 
 class VentanaEstadisticas:
     def __init__(self):
         self.ventana = tk.Tk()
         self.ventana.title("Estadísticas de Pensamientos - Vista Semanal")
         self.ventana.geometry("1200x700")
+        self.db = obtener_servicio()
         
         # Variables
         self.paciente_seleccionado = tk.StringVar()
@@ -25,6 +28,9 @@ class VentanaEstadisticas:
         dias_al_lunes = hoy.weekday()
         self.fecha_inicio = hoy - timedelta(days=dias_al_lunes)
         
+        # Las consultas se ejecutan en segundo plano para no bloquear la ventana
+        self.consultas = EjecutorConsultas(self.ventana, self.db)
+        
         self.crear_widgets()
         self.cargar_pacientes()
         
@@ -66,100 +72,19 @@ class VentanaEstadisticas:
         
     def cargar_pacientes(self):
         try:
-            conn = sqlite3.connect(os.path.join('..', '..', 'data', 'db_psicologia_clinic.db'))
-            cursor = conn.cursor()
-            cursor.execute("SELECT codigo, nombre FROM pacientes ORDER BY codigo")
-            pacientes = cursor.fetchall()
-            self.combo_pacientes['values'] = [f"{p[0]} - {p[1]}" for p in pacientes]
-            conn.close()
+            self.combo_pacientes['values'] = etiquetas_pacientes(self.db)
         except sqlite3.Error as e:
             messagebox.showerror("Error", f"Error al cargar pacientes: {str(e)}")
             
-    def obtener_datos_semana(self):
-        if not self.paciente_seleccionado.get():
-            return {}
-            
-        codigo_paciente = self.paciente_seleccionado.get().split(' - ')[0]
-        
-        try:
-            conn = sqlite3.connect(os.path.join('..', '..', 'data', 'db_psicologia_clinic.db'))
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT p.codigo, p.pensamiento, 
-                       SUM(d.cantidad) as total_cantidad,
-                       SUM(d.duracion) as total_duracion,
-                       AVG(d.intensidad) as promedio_intensidad
-                FROM dimensiones d
-                JOIN pensamientos p ON d.pensamiento_id = p.id
-                WHERE p.codigo LIKE ? 
-                AND d.fecha BETWEEN ? AND ?
-                GROUP BY p.codigo, p.pensamiento
-                HAVING total_cantidad > 0
-            """, (f'{codigo_paciente}%', 
-                  self.fecha_inicio.strftime('%Y-%m-%d'),
-                  self.fecha_fin.strftime('%Y-%m-%d')))
-            
-            resultados = {}
-            for row in cursor.fetchall():
-                resultados[row[0]] = {
-                    'pensamiento': row[1],
-                    'cantidad': row[2] or 0,
-                    'duracion': row[3] or 0,
-                    'intensidad': row[4] or 0
-                }
-                
-            conn.close()
-            return resultados
-        except sqlite3.Error as e:
-            messagebox.showerror("Error", f"Error al obtener datos: {str(e)}")
-            return {}
+    def obtener_datos_semana(self, codigo_paciente):
+        # Se ejecuta en un hilo de fondo: no debe tocar widgets
+        resumen = resumen_periodo(self.db, codigo_paciente, self.fecha_inicio, self.fecha_fin)
+        return resumen.seleccionar(resumen.cantidad > 0).como_dict()
             
     def obtener_datos_diarios(self, codigo_pensamiento):
-        try:
-            conn = sqlite3.connect(os.path.join('..', '..', 'data', 'db_psicologia_clinic.db'))
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT d.fecha, 
-                       SUM(d.cantidad) as total_cantidad,
-                       SUM(d.duracion) as total_duracion,
-                       AVG(d.intensidad) as promedio_intensidad
-                FROM dimensiones d
-                JOIN pensamientos p ON d.pensamiento_id = p.id
-                WHERE p.codigo = ? 
-                AND d.fecha BETWEEN ? AND ?
-                GROUP BY d.fecha
-                ORDER BY d.fecha
-            """, (codigo_pensamiento,
-                  self.fecha_inicio.strftime('%Y-%m-%d'),
-                  self.fecha_fin.strftime('%Y-%m-%d')))
-            
-            resultados = {}
-            for row in cursor.fetchall():
-                resultados[row[0]] = {
-                    'cantidad': row[1] or 0,
-                    'duracion': row[2] or 0,
-                    'intensidad': row[3] or 0
-                }
-            
-            # Llenar días faltantes con ceros
-            fecha_actual = self.fecha_inicio
-            while fecha_actual <= self.fecha_fin:
-                fecha_str = fecha_actual.strftime('%Y-%m-%d')
-                if fecha_str not in resultados:
-                    resultados[fecha_str] = {
-                        'cantidad': 0,
-                        'duracion': 0,
-                        'intensidad': 0
-                    }
-                fecha_actual += timedelta(days=1)
-                
-            conn.close()
-            return dict(sorted(resultados.items()))
-        except sqlite3.Error as e:
-            messagebox.showerror("Error", f"Error al obtener datos diarios: {str(e)}")
-            return {}
+        # Se ejecuta en un hilo de fondo: no debe tocar widgets
+        return serie_diaria(self.db, codigo_pensamiento, self.fecha_inicio, self.fecha_fin,
+                            rellenar=True).como_dict()
             
     def actualizar_graficos(self, event=None):
         # Limpiar frame de gráficos
@@ -167,17 +92,27 @@ class VentanaEstadisticas:
             widget.destroy()
             
         if not self.paciente_seleccionado.get():
+            self.consultas.cancelar_todas()
             return
             
-        # Crear gráfico circular
-        self.crear_grafico_circular()
+        # Crear gráfico circular cuando lleguen los datos
+        codigo_paciente = self.paciente_seleccionado.get().split(' - ')[0]
+        self.consultas.enviar(
+            'circular', self.obtener_datos_semana, codigo_paciente,
+            al_terminar=self.crear_grafico_circular,
+            al_fallar=lambda e: messagebox.showerror("Error", f"Error al obtener datos: {str(e)}"))
         
         # Crear gráfico de línea si hay un pensamiento seleccionado
         if self.pensamiento_seleccionado:
-            self.crear_grafico_linea()
+            self.solicitar_grafico_linea()
+            
+    def solicitar_grafico_linea(self):
+        self.consultas.enviar(
+            'linea', self.obtener_datos_diarios, self.pensamiento_seleccionado,
+            al_terminar=self.crear_grafico_linea,
+            al_fallar=lambda e: messagebox.showerror("Error", f"Error al obtener datos diarios: {str(e)}"))
             
-    def crear_grafico_circular(self):
-        datos = self.obtener_datos_semana()
+    def crear_grafico_circular(self, datos):
         if not datos:
             return
             
@@ -244,16 +179,12 @@ class VentanaEstadisticas:
                     if wedge.contains_point([event.x, event.y]):
                         self.pensamiento_seleccionado = etiquetas[i]
                         self.mostrar_pensamiento(datos[etiquetas[i]]['pensamiento'])
-                        self.crear_grafico_linea()
+                        self.solicitar_grafico_linea()
                         break
                         
         canvas.mpl_connect('button_press_event', on_click)
         
-    def crear_grafico_linea(self):
-        if not self.pensamiento_seleccionado:
-            return
-            
-        datos = self.obtener_datos_diarios(self.pensamiento_seleccionado)
+    def crear_grafico_linea(self, datos):
         if not datos:
             return
             
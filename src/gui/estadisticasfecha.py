@@ -4,21 +4,37 @@ import sqlite3
 from datetime import datetime
 from tkcalendar import DateEntry
 import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
 import numpy as np
+from servicio_bd import obtener_servicio
+from graficos_vivos import ControladorGraficos
+from lista_pacientes import etiquetas_pacientes
+from motor_estadisticas import agregados_periodo, serie_diaria
+from ejecutor_consultas import EjecutorConsultas
+
+# Botón de dimensión de la ventana y su nombre en el motor de estadísticas
+DIMENSIONES = {'veces': 'cantidad', 'minutos': 'duracion', 'intensidad': 'intensidad'}
 
 class VentanaEstadisticas:
     def __init__(self,parent):
         self.ventana = tk.Toplevel(parent)
         self.ventana.title("Estadísticas de Pensamientos")
         self.ventana.geometry("1600x700")
+        self.db = obtener_servicio()
         
         # Variables
         self.paciente_seleccionado = tk.StringVar()
         self.dimension_actual = tk.StringVar(value="veces")
         self.pensamiento_seleccionado = None
         self.colores_base = plt.cm.Set3(np.linspace(0, 1, 12))
+        self.agregados = None
+        self.descripcion_mostrada = None
+        
+        # Las consultas se ejecutan en segundo plano para no bloquear la ventana
+        self.consultas = EjecutorConsultas(self.ventana, self.db)
+        
+        # Lo guardado desde otras ventanas se aplica sin volver a consultar
+        self.cancelar_cambios = self.db.cambios.suscribir(self.al_cambiar_dimensiones)
+        self.ventana.bind('<Destroy>', self.al_destruir, add='+')
         
         self.crear_widgets()
         self.cargar_pacientes()
@@ -71,6 +87,9 @@ class VentanaEstadisticas:
         self.frame_graficos = ttk.Frame(self.main_frame)
         self.frame_graficos.grid(row=1, column=0, columnspan=2, sticky="nsew")
         
+        # Figuras y lienzos se crean una vez; cada actualización solo cambia sus datos
+        self.graficos = ControladorGraficos(self.frame_graficos, al_elegir=self.elegir_pensamiento)
+        
         # Configurar el grid
         self.ventana.columnconfigure(0, weight=1)
         self.ventana.rowconfigure(0, weight=1)
@@ -79,230 +98,144 @@ class VentanaEstadisticas:
     
     def cargar_pacientes(self):
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            cursor.execute("SELECT codigo, nombre FROM pacientes ORDER BY codigo")
-            pacientes = cursor.fetchall()
-            self.combo_pacientes['values'] = [f"{p[0]} - {p[1]}" for p in pacientes]
-            conn.close()
+            self.combo_pacientes['values'] = etiquetas_pacientes(self.db)
         except sqlite3.Error as e:
             messagebox.showerror("Error", f"Error al cargar pacientes: {str(e)}")
     
-    def obtener_datos_dimensiones(self):
-        if not self.paciente_seleccionado.get():
-            return {}
-            
-        codigo_paciente = self.paciente_seleccionado.get().split(' - ')[0]
-        fecha_inicio = self.fecha_inicio.get_date().strftime('%Y-%m-%d')
-        fecha_fin = self.fecha_fin.get_date().strftime('%Y-%m-%d')
-        
-        try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT p.codigo, p.pensamiento, 
-                       SUM(d.cantidad) as total_cantidad,
-                       SUM(d.duracion) as total_duracion,
-                       AVG(d.intensidad) as promedio_intensidad,
-                       MAX(d.cantidad) as max_cantidad,
-                       MAX(d.duracion) as max_duracion
-                FROM dimensiones d
-                JOIN pensamientos p ON d.pensamiento_id = p.id
-                WHERE p.codigo LIKE ? 
-                AND d.fecha BETWEEN ? AND ?
-                GROUP BY p.codigo, p.pensamiento
-            """, (f'{codigo_paciente}%', fecha_inicio, fecha_fin))
-            
-            resultados = {}
-            for row in cursor.fetchall():
-                resultados[row[0]] = {
-                    'pensamiento': row[1],
-                    'cantidad': int(row[2]) if row[2] else 0,  # Ensure integer for cantidad
-                    'duracion': row[3] or 0,
-                    'intensidad': row[4] or 0,
-                    'max_cantidad': int(row[5]) if row[5] else 0,  # Ensure integer for max_cantidad
-                    'max_duracion': row[6] or 0
-                }
-                
-            conn.close()
-            return resultados
-        except sqlite3.Error as e:
-            messagebox.showerror("Error", f"Error al obtener datos: {str(e)}")
-            return {}
+    def rango_fechas(self):
+        return (self.fecha_inicio.get_date().strftime('%Y-%m-%d'),
+                self.fecha_fin.get_date().strftime('%Y-%m-%d'))
     
-    def obtener_datos_diarios(self, codigo_pensamiento):
-        fecha_inicio = self.fecha_inicio.get_date().strftime('%Y-%m-%d')
-        fecha_fin = self.fecha_fin.get_date().strftime('%Y-%m-%d')
-        
-        try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT d.fecha, 
-                       CAST(SUM(d.cantidad) AS INTEGER) as total_cantidad,
-                       SUM(d.duracion) as total_duracion,
-                       AVG(d.intensidad) as promedio_intensidad
-                FROM dimensiones d
-                JOIN pensamientos p ON d.pensamiento_id = p.id
-                WHERE p.codigo = ? 
-                AND d.fecha BETWEEN ? AND ?
-                GROUP BY d.fecha
-                ORDER BY d.fecha
-            """, (codigo_pensamiento, fecha_inicio, fecha_fin))
-            
-            datos_diarios = cursor.fetchall()
-            conn.close()
-            return datos_diarios
-        except sqlite3.Error as e:
-            messagebox.showerror("Error", f"Error al obtener datos diarios: {str(e)}")
-            return []
+    def obtener_datos_dimensiones(self, codigo_paciente, fecha_inicio, fecha_fin):
+        # Se ejecuta en un hilo de fondo: no debe tocar widgets
+        return agregados_periodo(self.db, codigo_paciente, fecha_inicio, fecha_fin)
+    
+    def obtener_datos_diarios(self, codigo_pensamiento, fecha_inicio, fecha_fin):
+        # Se ejecuta en un hilo de fondo: no debe tocar widgets
+        return serie_diaria(self.db, codigo_pensamiento, fecha_inicio, fecha_fin).como_filas()
     
     def actualizar_graficos(self, event=None):
-        for widget in self.frame_graficos.winfo_children():
-            widget.destroy()
-            
         if not self.paciente_seleccionado.get():
+            self.consultas.cancelar_todas()
+            self.graficos.limpiar()
             return
             
-        self.crear_grafico_circular()
+        codigo_paciente = self.paciente_seleccionado.get().split(' - ')[0]
+        self.consultas.enviar(
+            'circular', self.obtener_datos_dimensiones, codigo_paciente, *self.rango_fechas(),
+            al_terminar=self.crear_grafico_circular,
+            al_fallar=lambda e: messagebox.showerror("Error", f"Error al obtener datos: {str(e)}"))
         
         if self.pensamiento_seleccionado:
-            self.crear_grafico_frecuencia()
+            self.solicitar_grafico_frecuencia()
     
-    def crear_grafico_circular(self):
-        datos = self.obtener_datos_dimensiones()
-        if not datos:
+    def elegir_pensamiento(self, codigo):
+        self.pensamiento_seleccionado = codigo
+        if self.agregados is None or self.consultas.ocupado():
+            self.solicitar_grafico_frecuencia()
             return
-            
-        fig = Figure(figsize=(6, 4))
-        ax = fig.add_subplot(111)
-        
-        dimension = self.dimension_actual.get()
-        valores = []
-        etiquetas = []
-        colores = []
-        
-        for codigo, info in datos.items():
-            if dimension == "veces":
-                valor = info['cantidad']
-                colores.append(self.colores_base[len(colores) % len(self.colores_base)])
-            elif dimension == "minutos":
-                valor = info['duracion']
-                colores.append(self.colores_base[len(colores) % len(self.colores_base)])
-            else:  # intensidad
-                valor = info['intensidad']
-                if valor <= 3:
-                    colores.append('lightgreen')
-                elif valor <= 7:
-                    colores.append('yellow')
-                else:
-                    colores.append('red')
-                
-            if valor > 0:
-                valores.append(valor)
-                etiquetas.append(codigo)
-        
-        if not valores:
+        # La serie sale de los totales ya cargados, sin consultar
+        self.crear_grafico_frecuencia(self.agregados.serie(codigo).como_filas())
+    
+    def solicitar_grafico_frecuencia(self):
+        self.consultas.enviar(
+            'frecuencia', self.obtener_datos_diarios, self.pensamiento_seleccionado,
+            *self.rango_fechas(),
+            al_terminar=self.crear_grafico_frecuencia,
+            al_fallar=lambda e: messagebox.showerror("Error", f"Error al obtener datos diarios: {str(e)}"))
+    
+    def al_cambiar_dimensiones(self, cambios):
+        # Puede llamarse desde el hilo que guardó; tkinter pasa after() al hilo de Tk
+        self.ventana.after(0, self.aplicar_cambios, cambios)
+    
+    def al_destruir(self, event):
+        if event.widget is self.ventana:
+            self.cancelar_cambios()
+    
+    def aplicar_cambios(self, cambios):
+        if self.agregados is None:
+            return
+        if self.consultas.ocupado():
+            # La consulta en curso pudo leer antes del cambio
+            self.actualizar_graficos()
+            return
+        afectados = self.agregados.aplicar(cambios)
+        if self.agregados.requiere_recarga:
+            self.actualizar_graficos()
+            return
+        if not afectados:
             return
-            
-        wedges, texts, autotexts = ax.pie(valores, labels=etiquetas, colors=colores,
-                                         autopct='%1.1f%%' if dimension != "veces" else lambda pct: f'{int(pct*sum(valores)/100)}',
-                                         startangle=90)
         
-        plt.setp(autotexts, size=8)
-        plt.setp(texts, size=8)
+        # Cualquier cambio mueve el total y con él los ángulos de todos los
+        # sectores, así que el circular se redibuja entero desde los totales en
+        # memoria (reutilizando sus artistas); la serie solo si le afecta
+        self.dibujar_circular(self.agregados.resumen)
+        if self.pensamiento_seleccionado in afectados:
+            self.crear_grafico_frecuencia(
+                self.agregados.serie(self.pensamiento_seleccionado).como_filas())
+    
+    def crear_grafico_circular(self, agregados):
+        self.agregados = agregados
+        self.dibujar_circular(agregados.resumen)
+    
+    def dibujar_circular(self, resumen):
+        dimension = self.dimension_actual.get()
+        valores = resumen.valores(DIMENSIONES[dimension])
         
-        ax.legend(wedges, etiquetas,
-                 title="Pensamientos",
-                 loc="center left",
-                 bbox_to_anchor=(1, 0, 0.5, 1))
+        if dimension == "intensidad":
+            colores = np.select([valores <= 3, valores <= 7], ['lightgreen', 'yellow'], 'red')
+        else:
+            colores = self.colores_base[np.arange(len(valores)) % len(self.colores_base)]
         
-        canvas = FigureCanvasTkAgg(fig, master=self.frame_graficos)
-        canvas.draw()
-        canvas.get_tk_widget().grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
+        con_valor = valores > 0
+        valores = valores[con_valor]
+        etiquetas = list(resumen.codigos[con_valor])
+        colores = list(colores[con_valor])
         
-        def on_click(event):
-            if event.inaxes == ax:
-                for i, wedge in enumerate(wedges):
-                    if wedge.contains_point([event.x, event.y]):
-                        #self.mostrar_pensamiento(datos[etiquetas[i]]['pensamiento'])
-                        self.pensamiento_seleccionado = etiquetas[i]
-                        self.crear_grafico_frecuencia()
-                        break
-                        
-        canvas.mpl_connect('button_press_event', on_click)
+        total = valores.sum()
+        if dimension == "veces":
+            formato = lambda pct: f'{int(pct*total/100)}'
+        else:
+            formato = lambda pct: f'{pct:1.1f}%'
+        return self.graficos.actualizar_circular(valores, etiquetas, colores, formato)
     
-    def crear_grafico_frecuencia(self):
-        if not self.pensamiento_seleccionado:
-            return
-            
-        datos_diarios = self.obtener_datos_diarios(self.pensamiento_seleccionado)
+    def crear_grafico_frecuencia(self, datos_diarios):
         if not datos_diarios:
+            self.graficos.ocultar_serie()
             return
-            
-        frame_derecho = ttk.Frame(self.frame_graficos)
-        frame_derecho.grid(row=0, column=1, sticky="nsew", padx=5, pady=5)
         
-        fig = Figure(figsize=(6, 3))
-        ax = fig.add_subplot(111)
+        # La descripción solo se busca al cambiar de pensamiento
+        descripcion = None
+        if self.descripcion_mostrada != self.pensamiento_seleccionado:
+            descripcion = self.descripcion_pensamiento(self.pensamiento_seleccionado)
+            if descripcion is not None:
+                self.descripcion_mostrada = self.pensamiento_seleccionado
         
         fechas = [row[0] for row in datos_diarios]
         dimension = self.dimension_actual.get()
         
         if dimension == "veces":
             valores = [int(row[1]) for row in datos_diarios]  # Ensure integer values
-            titulo = "Cantidad de veces"
-            ymax = max(valores) if valores else 1
-            ax.yaxis.set_major_locator(plt.MaxNLocator(integer=True))  # Force integer ticks
+            self.graficos.actualizar_serie(fechas, valores, "Cantidad de veces",
+                                           enteros=True, descripcion=descripcion)
         elif dimension == "minutos":
             valores = [row[2] for row in datos_diarios]
-            titulo = "Duración (minutos)"
-            ymax = max(valores) if valores else 1
+            self.graficos.actualizar_serie(fechas, valores, "Duración (minutos)",
+                                           descripcion=descripcion)
         else:  # intensidad
             valores = [row[3] for row in datos_diarios]
-            titulo = "Intensidad"
-            ymax = 10
-        
-        ax.plot(fechas, valores, marker='o')
-        ax.set_ylim(0, ymax * 1.1)  # Add 10% padding to y-axis
-        
-        ax.set_xlabel("Fecha")
-        ax.set_ylabel(titulo)
-        
-        plt.setp(ax.get_xticklabels(), rotation=45)
-        
-        fig.tight_layout()
-        
-        canvas = FigureCanvasTkAgg(fig, master=frame_derecho)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
-        
+            self.graficos.actualizar_serie(fechas, valores, "Intensidad", ymax=10,
+                                           descripcion=descripcion)
+    
+    def descripcion_pensamiento(self, codigo):
+        if self.agregados is not None and codigo in self.agregados.textos:
+            return self.agregados.textos[codigo]
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            cursor.execute("SELECT pensamiento FROM pensamientos WHERE codigo = ?", 
-                         (self.pensamiento_seleccionado,))
-            pensamiento = cursor.fetchone()[0]
-            conn.close()
-            
-            frame_descripcion = ttk.LabelFrame(frame_derecho, text="Descripción del Pensamiento")
-            frame_descripcion.pack(fill=tk.BOTH, expand=True, pady=(10, 0))
-            
-            text_descripcion = tk.Text(frame_descripcion, wrap=tk.WORD, height=5, 
-                                     padx=10, pady=10)
-            text_descripcion.insert('1.0', pensamiento)
-            text_descripcion.config(state='disabled')
-            
-            scrollbar = ttk.Scrollbar(frame_descripcion, command=text_descripcion.yview)
-            text_descripcion.configure(yscrollcommand=scrollbar.set)
-            
-            text_descripcion.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-            scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-            
+            return self.db.consultar_uno("SELECT pensamiento FROM pensamientos WHERE codigo = ?",
+                                         (codigo,))[0]
         except sqlite3.Error as e:
             messagebox.showerror("Error", f"Error al obtener descripción: {str(e)}")
+            return None
     
     def mostrar_pensamiento(self, pensamiento):
         ventana = tk.Toplevel(self.ventana)
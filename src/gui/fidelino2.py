@@ -7,12 +7,16 @@ import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
 import numpy as np
+from servicio_bd import obtener_servicio
+from lista_pacientes import etiquetas_pacientes
+from motor_estadisticas import resumen_periodo, serie_diaria
 
 class VentanaEstadisticas:
     def __init__(self):
         self.ventana = tk.Tk()
         self.ventana.title("Estadísticas de Pensamientos")
         self.ventana.geometry("1280x800")
+        self.db = obtener_servicio()
         
         # Variables
         self.paciente_seleccionado = tk.StringVar()
@@ -79,12 +83,7 @@ class VentanaEstadisticas:
     
     def cargar_pacientes(self):
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            cursor.execute("SELECT codigo, nombre FROM pacientes ORDER BY codigo")
-            pacientes = cursor.fetchall()
-            self.combo_pacientes['values'] = [f"{p[0]} - {p[1]}" for p in pacientes]
-            conn.close()
+            self.combo_pacientes['values'] = etiquetas_pacientes(self.db)
         except sqlite3.Error as e:
             messagebox.showerror("Error", f"Error al cargar pacientes: {str(e)}")
     
@@ -97,36 +96,7 @@ class VentanaEstadisticas:
         fecha_fin = self.fecha_fin.get_date().strftime('%Y-%m-%d')
         
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT p.codigo, p.pensamiento, 
-                       SUM(d.cantidad) as total_cantidad,
-                       SUM(d.duracion) as total_duracion,
-                       AVG(d.intensidad) as promedio_intensidad,
-                       MAX(d.cantidad) as max_cantidad,
-                       MAX(d.duracion) as max_duracion
-                FROM dimensiones d
-                JOIN pensamientos p ON d.pensamiento_id = p.id
-                WHERE p.codigo LIKE ? 
-                AND d.fecha BETWEEN ? AND ?
-                GROUP BY p.codigo, p.pensamiento
-            """, (f'{codigo_paciente}%', fecha_inicio, fecha_fin))
-            
-            resultados = {}
-            for row in cursor.fetchall():
-                resultados[row[0]] = {
-                    'pensamiento': row[1],
-                    'cantidad': row[2] or 0,
-                    'duracion': row[3] or 0,
-                    'intensidad': row[4] or 0,
-                    'max_cantidad': row[5] or 0,
-                    'max_duracion': row[6] or 0
-                }
-                
-            conn.close()
-            return resultados
+            return resumen_periodo(self.db, codigo_paciente, fecha_inicio, fecha_fin).como_dict()
         except sqlite3.Error as e:
             messagebox.showerror("Error", f"Error al obtener datos: {str(e)}")
             return {}
@@ -136,21 +106,7 @@ class VentanaEstadisticas:
         fecha_fin = self.fecha_fin.get_date().strftime('%Y-%m-%d')
         
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT d.fecha, d.cantidad, d.duracion, d.intensidad
-                FROM dimensiones d
-                JOIN pensamientos p ON d.pensamiento_id = p.id
-                WHERE p.codigo = ? 
-                AND d.fecha BETWEEN ? AND ?
-                ORDER BY d.fecha
-            """, (codigo_pensamiento, fecha_inicio, fecha_fin))
-            
-            datos_diarios = cursor.fetchall()
-            conn.close()
-            return datos_diarios
+            return serie_diaria(self.db, codigo_pensamiento, fecha_inicio, fecha_fin).como_filas()
         except sqlite3.Error as e:
             messagebox.showerror("Error", f"Error al obtener datos diarios: {str(e)}")
             return []
@@ -296,12 +252,8 @@ class VentanaEstadisticas:
         
         # Obtener y mostrar la descripción del pensamiento
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            cursor.execute("SELECT pensamiento FROM pensamientos WHERE codigo = ?", 
-                         (self.pensamiento_seleccionado,))
-            pensamiento = cursor.fetchone()[0]
-            conn.close()
+            pensamiento = self.db.consultar_uno("SELECT pensamiento FROM pensamientos WHERE codigo = ?",
+                         (self.pensamiento_seleccionado,))[0]
             
             # Frame para la descripción
             frame_descripcion = ttk.LabelFrame(frame_derecho, text="Descripción del Pensamiento")
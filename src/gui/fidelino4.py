@@ -7,9 +7,12 @@ import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
 import numpy as np
-from typing import Dict, List, Optional
+from typing import Dict, List
 from dataclasses import dataclass
 from contextlib import contextmanager
+from servicio_bd import obtener_servicio
+from lista_pacientes import etiquetas_pacientes
+from motor_estadisticas import resumen_periodo, serie_diaria
 
 
 @dataclass
@@ -24,6 +27,7 @@ class DatosPensamiento:
         self.ventana = tk.Tk()
         self.ventana.title('Estadísticas de Pensamientos')
         self.ventana.geometry('1280x800')
+        self.db = obtener_servicio()
         self.paciente_seleccionado = tk.StringVar()
         self.dimension_actual = tk.StringVar(value='veces')
         self.pensamiento_seleccionado = None
@@ -69,14 +73,7 @@ class DatosPensamiento:
 
     def cargar_pacientes(self):
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            cursor.execute(
-                'SELECT codigo, nombre FROM pacientes ORDER BY codigo')
-            pacientes = cursor.fetchall()
-            self.combo_pacientes['values'] = [f'{p[0]} - {p[1]}' for p in
-                pacientes]
-            conn.close()
+            self.combo_pacientes['values'] = etiquetas_pacientes(self.db)
         except sqlite3.Error as e:
             messagebox.showerror('Error',
                 f'Error al cargar pacientes: {str(e)}')
@@ -88,31 +85,7 @@ class DatosPensamiento:
         fecha_inicio = self.fecha_inicio.get_date().strftime('%Y-%m-%d')
         fecha_fin = self.fecha_fin.get_date().strftime('%Y-%m-%d')
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                SELECT p.codigo, p.pensamiento, 
-                       SUM(d.cantidad) as total_cantidad,
-                       SUM(d.duracion) as total_duracion,
-                       AVG(d.intensidad) as promedio_intensidad,
-                       MAX(d.cantidad) as max_cantidad,
-                       MAX(d.duracion) as max_duracion
-                FROM dimensiones d
-                JOIN pensamientos p ON d.pensamiento_id = p.id
-                WHERE p.codigo LIKE ? 
-                AND d.fecha BETWEEN ? AND ?
-                GROUP BY p.codigo, p.pensamiento
-            """
-                , (f'{codigo_paciente}%', fecha_inicio, fecha_fin))
-            resultados = {}
-            for row in cursor.fetchall():
-                resultados[row[0]] = {'pensamiento': row[1], 'cantidad': 
-                    row[2] or 0, 'duracion': row[3] or 0, 'intensidad': row
-                    [4] or 0, 'max_cantidad': row[5] or 0, 'max_duracion': 
-                    row[6] or 0}
-            conn.close()
-            return resultados
+            return resumen_periodo(self.db, codigo_paciente, fecha_inicio, fecha_fin).como_dict()
         except sqlite3.Error as e:
             messagebox.showerror('Error', f'Error al obtener datos: {str(e)}')
             return {}
@@ -121,21 +94,7 @@ class DatosPensamiento:
         fecha_inicio = self.fecha_inicio.get_date().strftime('%Y-%m-%d')
         fecha_fin = self.fecha_fin.get_date().strftime('%Y-%m-%d')
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                SELECT d.fecha, d.cantidad, d.duracion, d.intensidad
-                FROM dimensiones d
-                JOIN pensamientos p ON d.pensamiento_id = p.id
-                WHERE p.codigo = ? 
-                AND d.fecha BETWEEN ? AND ?
-                ORDER BY d.fecha
-            """
-                , (codigo_pensamiento, fecha_inicio, fecha_fin))
-            datos_diarios = cursor.fetchall()
-            conn.close()
-            return datos_diarios
+            return serie_diaria(self.db, codigo_pensamiento, fecha_inicio, fecha_fin).como_filas()
         except sqlite3.Error as e:
             messagebox.showerror('Error',
                 f'Error al obtener datos diarios: {str(e)}')
@@ -239,13 +198,9 @@ class DatosPensamiento:
         canvas.draw()
         canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            cursor.execute(
+            pensamiento = self.db.consultar_uno(
                 'SELECT pensamiento FROM pensamientos WHERE codigo = ?', (
-                self.pensamiento_seleccionado,))
-            pensamiento = cursor.fetchone()[0]
-            conn.close()
+                self.pensamiento_seleccionado,))[0]
             frame_descripcion = ttk.LabelFrame(frame_derecho, text=
                 'Descripción del Pensamiento')
             frame_descripcion.pack(fill=tk.BOTH, expand=True, pady=(10, 0))
@@ -278,16 +233,12 @@ class GestorDB:
 
     def __init__(self, ruta_db: str):
         self.ruta_db = ruta_db
+        self.servicio = obtener_servicio(ruta_db)
 
     @contextmanager
     def conexion(self):
-        conn = None
-        try:
-            conn = sqlite3.connect(self.ruta_db)
+        with self.servicio.conexion() as conn:
             yield conn
-        finally:
-            if conn:
-                conn.close()
 
     def obtener_datos_paciente(self, codigo_paciente: str, fecha_inicio:
         str, fecha_fin: str) ->Dict[str, List[DatosPensamiento]]:
@@ -296,12 +247,13 @@ class GestorDB:
             cursor.execute(
                 """
                 SELECT p.codigo, p.pensamiento, d.cantidad, d.duracion, d.intensidad, d.fecha
-                FROM dimensiones d
-                JOIN pensamientos p ON d.pensamiento_id = p.id
-                WHERE p.codigo LIKE ? AND d.fecha BETWEEN ? AND ?
+                FROM pacientes pa
+                JOIN pensamientos p ON p.paciente_id = pa.id
+                JOIN dimensiones d ON d.pensamiento_id = p.id
+                WHERE pa.codigo = ? AND d.fecha BETWEEN ? AND ?
                 ORDER BY d.fecha
             """
-                , (f'{codigo_paciente}%', fecha_inicio, fecha_fin))
+                , (codigo_paciente, fecha_inicio, fecha_fin))
             datos = {}
             for row in cursor.fetchall():
                 codigo = row[0]
@@ -357,6 +309,7 @@ class VentanaEstadisticas:
         self.ventana = tk.Tk()
         self.ventana.title('Estadísticas de Pensamientos')
         self.ventana.geometry('1280x800')
+        self.db = obtener_servicio()
         self.paciente_seleccionado = tk.StringVar()
         self.dimension_actual = tk.StringVar(value='veces')
         self.pensamiento_seleccionado = None
@@ -471,14 +424,7 @@ class VentanaEstadisticas:
 
     def cargar_pacientes(self):
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            cursor.execute(
-                'SELECT codigo, nombre FROM pacientes ORDER BY codigo')
-            pacientes = cursor.fetchall()
-            self.combo_pacientes['values'] = [f'{p[0]} - {p[1]}' for p in
-                pacientes]
-            conn.close()
+            self.combo_pacientes['values'] = etiquetas_pacientes(self.db)
         except sqlite3.Error as e:
             messagebox.showerror('Error',
                 f'Error al cargar pacientes: {str(e)}')
@@ -490,31 +436,7 @@ class VentanaEstadisticas:
         fecha_inicio = self.fecha_inicio.get_date().strftime('%Y-%m-%d')
         fecha_fin = self.fecha_fin.get_date().strftime('%Y-%m-%d')
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                SELECT p.codigo, p.pensamiento, 
-                       SUM(d.cantidad) as total_cantidad,
-                       SUM(d.duracion) as total_duracion,
-                       AVG(d.intensidad) as promedio_intensidad,
-                       MAX(d.cantidad) as max_cantidad,
-                       MAX(d.duracion) as max_duracion
-                FROM dimensiones d
-                JOIN pensamientos p ON d.pensamiento_id = p.id
-                WHERE p.codigo LIKE ? 
-                AND d.fecha BETWEEN ? AND ?
-                GROUP BY p.codigo, p.pensamiento
-            """
-                , (f'{codigo_paciente}%', fecha_inicio, fecha_fin))
-            resultados = {}
-            for row in cursor.fetchall():
-                resultados[row[0]] = {'pensamiento': row[1], 'cantidad': 
-                    row[2] or 0, 'duracion': row[3] or 0, 'intensidad': row
-                    [4] or 0, 'max_cantidad': row[5] or 0, 'max_duracion': 
-                    row[6] or 0}
-            conn.close()
-            return resultados
+            return resumen_periodo(self.db, codigo_paciente, fecha_inicio, fecha_fin).como_dict()
         except sqlite3.Error as e:
             messagebox.showerror('Error', f'Error al obtener datos: {str(e)}')
             return {}
@@ -523,21 +445,7 @@ class VentanaEstadisticas:
         fecha_inicio = self.fecha_inicio.get_date().strftime('%Y-%m-%d')
         fecha_fin = self.fecha_fin.get_date().strftime('%Y-%m-%d')
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                SELECT d.fecha, d.cantidad, d.duracion, d.intensidad
-                FROM dimensiones d
-                JOIN pensamientos p ON d.pensamiento_id = p.id
-                WHERE p.codigo = ? 
-                AND d.fecha BETWEEN ? AND ?
-                ORDER BY d.fecha
-            """
-                , (codigo_pensamiento, fecha_inicio, fecha_fin))
-            datos_diarios = cursor.fetchall()
-            conn.close()
-            return datos_diarios
+            return serie_diaria(self.db, codigo_pensamiento, fecha_inicio, fecha_fin).como_filas()
         except sqlite3.Error as e:
             messagebox.showerror('Error',
                 f'Error al obtener datos diarios: {str(e)}')
@@ -641,13 +549,9 @@ class VentanaEstadisticas:
         canvas.draw()
         canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            cursor.execute(
+            pensamiento = self.db.consultar_uno(
                 'SELECT pensamiento FROM pensamientos WHERE codigo = ?', (
-                self.pensamiento_seleccionado,))
-            pensamiento = cursor.fetchone()[0]
-            conn.close()
+                self.pensamiento_seleccionado,))[0]
             frame_descripcion = ttk.LabelFrame(frame_derecho, text=
                 'Descripción del Pensamiento')
             frame_descripcion.pack(fill=tk.BOTH, expand=True, pady=(10, 0))
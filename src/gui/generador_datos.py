@@ -0,0 +1,202 @@
+import os
+import sqlite3
+import time
+from datetime import date
+from itertools import product
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from esquema import preparar_esquema
+from servicio_bd import RUTA_DB
+
+
+TABLAS = ('pacientes', 'pensamientos', 'dimensiones')
+
+# Filas insertadas por transacción durante la carga
+TAMANO_LOTE = 100_000
+
+NOMBRES = ('Ana', 'Luis', 'María', 'José', 'Carmen', 'Juan', 'Laura', 'Pedro',
+           'Lucía', 'Javier', 'Elena', 'Miguel', 'Sofía', 'David', 'Marta',
+           'Carlos', 'Paula', 'Andrés', 'Isabel', 'Fidel')
+APELLIDOS = ('García', 'Rodríguez', 'González', 'Fernández', 'López', 'Martínez',
+             'Sánchez', 'Pérez', 'Gómez', 'Martín', 'Jiménez', 'Ruiz', 'Hernández',
+             'Díaz', 'Moreno', 'Álvarez', 'Romero', 'Navarro', 'Torres', 'Castro')
+ENFERMEDADES = ('Ansiedad generalizada', 'Depresión', 'TOC', 'Fobia social',
+                'Trastorno de pánico', 'Estrés postraumático', 'Insomnio', None)
+PESOS_ENFERMEDADES = (0.25, 0.25, 0.12, 0.1, 0.1, 0.08, 0.05, 0.05)
+TEMAS = ('el trabajo', 'la salud', 'la familia', 'el dinero', 'los amigos',
+         'la pareja', 'el futuro', 'los estudios', 'la casa', 'el cuerpo')
+PLANTILLAS = ('Voy a fracasar con {}', 'Nadie me entiende en {}',
+              'Algo malo va a pasar con {}', 'No soy suficiente para {}',
+              'Tengo que controlar {}', 'Todo sale mal en {}',
+              'Me van a juzgar por {}', 'No puedo soportar {}')
+
+DIGITOS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def codigos_paciente(cantidad: int) -> List[str]:
+    """Códigos P + tres caracteres; pasado P999 se usan letras y dígitos."""
+    codigos = [f'P{n:03d}' for n in range(1, min(cantidad, 999) + 1)]
+    for a, b, c in product(DIGITOS, repeat=3):
+        if len(codigos) >= cantidad:
+            break
+        if not (a + b + c).isdigit():
+            codigos.append(f'P{a}{b}{c}')
+    if len(codigos) < cantidad:
+        raise ValueError(f'El formato de código admite como máximo {len(codigos)} pacientes')
+    return codigos
+
+
+def copiar_esquema(origen: str, conn: sqlite3.Connection):
+    """Crea las tablas con exactamente la definición de la base de origen."""
+    fuente = sqlite3.connect(f'file:{origen}?mode=ro', uri=True)
+    try:
+        for tabla in TABLAS:
+            fila = fuente.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+                (tabla,)).fetchone()
+            if fila is None:
+                raise sqlite3.OperationalError(f'La base de origen no tiene la tabla {tabla}')
+            conn.execute(fila[0])
+    finally:
+        fuente.close()
+
+
+def _insertar(conn: sqlite3.Connection, sql: str, filas, total: int,
+              tabla: str, progreso: Optional[Callable[[str, int, int], None]]):
+    """Inserta las filas en transacciones de TAMANO_LOTE."""
+    insertadas = 0
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) == TAMANO_LOTE:
+            with conn:
+                conn.executemany(sql, lote)
+            insertadas += len(lote)
+            lote = []
+            if progreso:
+                progreso(tabla, insertadas, total)
+    if lote:
+        with conn:
+            conn.executemany(sql, lote)
+        insertadas += len(lote)
+        if progreso:
+            progreso(tabla, insertadas, total)
+
+
+def generar(destino: str, pacientes: int, pensamientos: int, dimensiones: int,
+            dias: int = 730, semilla: Optional[int] = None, origen: str = RUTA_DB,
+            progreso: Optional[Callable[[str, int, int], None]] = None) -> Dict[str, int]:
+    """Genera una base sintética con el esquema de la clínica.
+
+    Cada paciente tiene un número de pensamientos con distribución
+    log-normal y cada pensamiento una frecuencia de registro también
+    log-normal, de modo que unos pocos pensamientos concentran la mayoría
+    de las dimensiones. La intensidad y la cantidad bajan a lo largo del
+    periodo de cada pensamiento, como en un tratamiento que avanza.
+    """
+    if os.path.exists(destino):
+        raise FileExistsError(f'{destino} ya existe')
+    pensamientos = max(pensamientos, pacientes)
+    codigos = codigos_paciente(pacientes)
+    rng = np.random.default_rng(semilla)
+    hoy = np.datetime64(date.today(), 'D')
+    inicio = hoy - dias
+
+    conn = sqlite3.connect(destino)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    copiar_esquema(origen, conn)
+
+    # Pacientes
+    alta_paciente = rng.integers(0, int(dias * 0.8), size=pacientes)
+    nacimientos = (np.datetime64('1950-01-01', 'D')
+                   + rng.integers(0, 58 * 365, size=pacientes)).astype(str)
+    nombres = rng.choice(len(NOMBRES), size=pacientes)
+    apellidos = rng.choice(len(APELLIDOS), size=(pacientes, 2))
+    sexos = rng.choice(['F', 'M'], size=pacientes, p=[0.6, 0.4])
+    enfermedades = rng.choice(len(ENFERMEDADES), size=pacientes, p=PESOS_ENFERMEDADES)
+    altas = (inicio + alta_paciente).astype(str)
+    _insertar(conn, """
+        INSERT INTO pacientes (id, codigo, nombre, fecha_nacimiento, sexo,
+                               enfermedad, observaciones, fecha_registro)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, ((i + 1, codigos[i],
+           f'{NOMBRES[nombres[i]]} {APELLIDOS[apellidos[i, 0]]} {APELLIDOS[apellidos[i, 1]]}',
+           nacimientos[i], str(sexos[i]), ENFERMEDADES[enfermedades[i]], None, altas[i])
+          for i in range(pacientes)), pacientes, 'pacientes', progreso)
+
+    # Pensamientos: al menos uno por paciente y como mucho 999 (código PS###)
+    pesos = rng.lognormal(0.0, 0.8, size=pacientes)
+    por_paciente = 1 + rng.multinomial(pensamientos - pacientes, pesos / pesos.sum())
+    por_paciente = np.minimum(por_paciente, 999)
+    pensamientos = int(por_paciente.sum())
+    dueno = np.repeat(np.arange(pacientes), por_paciente)
+    secuencia = np.arange(pensamientos) - np.repeat(np.cumsum(por_paciente) - por_paciente,
+                                                    por_paciente) + 1
+    restante = dias - alta_paciente[dueno]
+    alta_pensamiento = alta_paciente[dueno] + (rng.random(pensamientos) * restante * 0.5).astype(int)
+    textos = rng.integers(0, len(PLANTILLAS) * len(TEMAS), size=pensamientos)
+    fechas_pensamiento = (inicio + alta_pensamiento).astype(str)
+    _insertar(conn, """
+        INSERT INTO pensamientos (id, codigo, paciente_id, pensamiento, fecha_registro)
+        VALUES (?, ?, ?, ?, ?)
+    """, ((i + 1, f'{codigos[dueno[i]]}-PS{secuencia[i]:03d}', int(dueno[i]) + 1,
+           PLANTILLAS[textos[i] // len(TEMAS)].format(TEMAS[textos[i] % len(TEMAS)]),
+           fechas_pensamiento[i])
+          for i in range(pensamientos)), pensamientos, 'pensamientos', progreso)
+
+    # Dimensiones, ordenadas por fecha para que los id sigan al calendario
+    frecuencia = rng.lognormal(0.0, 1.0, size=pensamientos)
+    cual = rng.choice(pensamientos, size=dimensiones, p=frecuencia / frecuencia.sum())
+    duracion_activa = dias - alta_pensamiento[cual]
+    avance = rng.random(dimensiones)
+    dia = alta_pensamiento[cual] + (avance * duracion_activa).astype(int)
+    base_intensidad = rng.uniform(3, 9, size=pensamientos)[cual]
+    base_cantidad = rng.uniform(0.5, 5, size=pensamientos)[cual]
+    intensidad = np.clip(np.rint(base_intensidad * (1 - 0.4 * avance)
+                                 + rng.normal(0, 1.2, size=dimensiones)), 0, 10).astype(int)
+    cantidad = np.clip(rng.poisson(base_cantidad * (1 - 0.3 * avance)), 0, 10)
+    duracion = np.clip(np.rint(rng.lognormal(np.log(10), 0.7, size=dimensiones)), 0, 60).astype(int)
+    sin_duracion = rng.random(dimensiones) < 0.05
+    orden = np.lexsort((cual, dia))
+    fechas = (inicio + dia[orden]).astype(str)
+    cual, cantidad, duracion, intensidad, sin_duracion = (
+        cual[orden].tolist(), cantidad[orden].tolist(), duracion[orden].tolist(),
+        intensidad[orden].tolist(), sin_duracion[orden].tolist())
+    _insertar(conn, """
+        INSERT INTO dimensiones (pensamiento_id, fecha, cantidad, duracion, intensidad)
+        VALUES (?, ?, ?, ?, ?)
+    """, ((cual[i] + 1, fechas[i], cantidad[i],
+           None if sin_duracion[i] else duracion[i], intensidad[i])
+          for i in range(dimensiones)), dimensiones, 'dimensiones', progreso)
+
+    # Índices, disparadores y resumen diario se crean después de la carga
+    conn.isolation_level = None
+    conn.execute('PRAGMA journal_mode=WAL')
+    preparar_esquema(conn)
+    conn.close()
+    return {'pacientes': pacientes, 'pensamientos': pensamientos, 'dimensiones': dimensiones}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Genera una base de datos sintética de la clínica')
+    parser.add_argument('destino', help='ruta de la base de datos a crear')
+    parser.add_argument('--pacientes', type=int, default=5_000)
+    parser.add_argument('--pensamientos', type=int, default=100_000)
+    parser.add_argument('--dimensiones', type=int, default=5_000_000)
+    parser.add_argument('--dias', type=int, default=730, help='días de historia')
+    parser.add_argument('--semilla', type=int, default=None)
+    parser.add_argument('--origen', default=RUTA_DB, help='base de la que copiar el esquema')
+    args = parser.parse_args()
+
+    def mostrar(tabla, insertadas, total):
+        print(f'{tabla}: {insertadas}/{total}', end='\r' if insertadas < total else '\n')
+
+    inicio_reloj = time.perf_counter()
+    totales = generar(args.destino, args.pacientes, args.pensamientos, args.dimensiones,
+                      args.dias, args.semilla, args.origen, mostrar)
+    print(f'Generados {totales} en {time.perf_counter() - inicio_reloj:.1f} s')
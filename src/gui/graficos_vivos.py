@@ -0,0 +1,277 @@
+import math
+import tkinter as tk
+from bisect import bisect_right
+from tkinter import ttk
+from typing import Callable, List, Optional, Sequence
+
+import matplotlib.dates as mdates
+import numpy as np
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+from matplotlib.figure import Figure
+from matplotlib.patches import Wedge
+from matplotlib.ticker import AutoLocator, MaxNLocator
+
+from submuestreo import LineaReducida
+
+
+# Mismas distancias (en radios) que usa Axes.pie por defecto
+DISTANCIA_ETIQUETA = 1.1
+DISTANCIA_PORCENTAJE = 0.6
+ANGULO_INICIAL = 90
+
+
+class BuscadorSectores:
+    """Localiza el sector de un gráfico circular bajo un punto de la pantalla.
+
+    Guarda los ángulos acumulados de los sectores (en el orden antihorario
+    en que los dibuja pie) y busca el del punto por búsqueda binaria, sin
+    recorrer los sectores.
+    """
+    def __init__(self, ax, sectores: Sequence[Wedge]):
+        self.ax = ax
+        self.inicio = sectores[0].theta1 if len(sectores) else 0.0
+        self.limites = [sector.theta2 - self.inicio for sector in sectores]
+        self.centro = np.asarray(sectores[0].center if len(sectores) else (0, 0), dtype=float)
+        self.radio = sectores[0].r if len(sectores) else 0.0
+
+    def indice(self, x: float, y: float) -> Optional[int]:
+        """Posición del sector en las coordenadas de pantalla (x, y), o None."""
+        if not self.limites:
+            return None
+        dx, dy = self.ax.transData.inverted().transform((x, y)) - self.centro
+        if math.hypot(dx, dy) > self.radio:
+            return None
+        angulo = (math.degrees(math.atan2(dy, dx)) - self.inicio) % 360
+        return min(bisect_right(self.limites, angulo), len(self.limites) - 1)
+
+
+class CircularVivo:
+    """Gráfico circular que reutiliza figura, lienzo y sectores entre actualizaciones.
+
+    Los sectores y textos se guardan en reservas: al cambiar los datos solo
+    se mueven los ángulos y colores de los existentes, se crean los que
+    falten y se ocultan los que sobren. La leyenda solo se rehace si cambian
+    las etiquetas o los colores.
+
+    El sector bajo el ratón se resalta con blitting: se guarda el fondo del
+    eje en cada dibujo completo y al mover el ratón solo se repinta el
+    contorno resaltado sobre ese fondo.
+    """
+    def __init__(self, master, figsize=(6, 4), al_elegir: Optional[Callable[[str], None]] = None):
+        self.figura = Figure(figsize=figsize)
+        self.ax = self.figura.add_subplot(111)
+        self.ax.set(frame_on=False, xticks=[], yticks=[], xlim=(-1.25, 1.25), ylim=(-1.25, 1.25))
+        self.ax.set_aspect('equal')
+        self.canvas = FigureCanvasTkAgg(self.figura, master=master)
+        self.sectores: List[Wedge] = []
+        self.textos = []
+        self.porcentajes = []
+        self.etiquetas: List[str] = []
+        self._clave_leyenda = None
+        self.buscador = BuscadorSectores(self.ax, [])
+        self.resaltado = Wedge((0, 0), 1, 0, 0, fill=False, edgecolor='black', linewidth=2,
+                               animated=True, visible=False)
+        self.ax.add_patch(self.resaltado)
+        self._indice_resaltado: Optional[int] = None
+        self._fondo = None
+        self.al_elegir = al_elegir
+        self.canvas.mpl_connect('button_press_event', self._al_pulsar)
+        self.canvas.mpl_connect('motion_notify_event', self._al_mover)
+        self.canvas.mpl_connect('figure_leave_event', lambda _evento: self._resaltar(None))
+        self.canvas.mpl_connect('draw_event', self._al_dibujar)
+
+    def widget(self) -> tk.Widget:
+        return self.canvas.get_tk_widget()
+
+    def _reservar(self, n: int):
+        while len(self.sectores) < n:
+            sector = Wedge((0, 0), 1, 0, 0, clip_on=False)
+            self.ax.add_patch(sector)
+            self.sectores.append(sector)
+            self.textos.append(self.ax.text(0, 0, '', size=8, va='center', clip_on=False))
+            self.porcentajes.append(self.ax.text(0, 0, '', size=8, ha='center', va='center',
+                                                 clip_on=False))
+
+    def actualizar(self, valores: Sequence[float], etiquetas: Sequence[str], colores: Sequence,
+                   formato: Callable[[float], str]) -> bool:
+        """Muestra los valores positivos; devuelve False si no hay ninguno."""
+        valores = np.asarray(valores, dtype=float)
+        n = len(valores)
+        self._reservar(n)
+        total = valores.sum()
+        if n and total > 0:
+            # Ángulos en grados en sentido antihorario desde ANGULO_INICIAL, como pie
+            limites = ANGULO_INICIAL + 360 * np.concatenate([[0], np.cumsum(valores) / total])
+        else:
+            n, limites = 0, np.array([ANGULO_INICIAL])
+        for i in range(n):
+            sector = self.sectores[i]
+            sector.set_theta1(limites[i])
+            sector.set_theta2(limites[i + 1])
+            sector.set_facecolor(colores[i])
+            sector.set_visible(True)
+            medio = np.deg2rad((limites[i] + limites[i + 1]) / 2)
+            x, y = np.cos(medio), np.sin(medio)
+            texto = self.textos[i]
+            texto.set_position((DISTANCIA_ETIQUETA * x, DISTANCIA_ETIQUETA * y))
+            texto.set_text(etiquetas[i])
+            texto.set_horizontalalignment('left' if x > 0 else 'right')
+            texto.set_visible(True)
+            porcentaje = self.porcentajes[i]
+            porcentaje.set_position((DISTANCIA_PORCENTAJE * x, DISTANCIA_PORCENTAJE * y))
+            porcentaje.set_text(formato(100 * valores[i] / total))
+            porcentaje.set_visible(True)
+        for artista in (*self.sectores[n:], *self.textos[n:], *self.porcentajes[n:]):
+            artista.set_visible(False)
+
+        clave_leyenda = (tuple(etiquetas[:n]), tuple(map(str, colores[:n])))
+        if clave_leyenda != self._clave_leyenda:
+            if self.ax.get_legend() is not None:
+                self.ax.get_legend().remove()
+            if n:
+                self.ax.legend(self.sectores[:n], list(etiquetas[:n]), title='Pensamientos',
+                               loc='center left', bbox_to_anchor=(1, 0, 0.5, 1))
+            self._clave_leyenda = clave_leyenda
+        self.etiquetas = list(etiquetas[:n])
+        self.buscador = BuscadorSectores(self.ax, self.sectores[:n])
+        self._indice_resaltado = None
+        self.resaltado.set_visible(False)
+        self.canvas.draw_idle()
+        return n > 0
+
+    def vaciar(self):
+        self.actualizar([], [], [], str)
+
+    def indice_en(self, event) -> Optional[int]:
+        """Posición del sector bajo el evento de ratón, si lo hay."""
+        if event.inaxes is not self.ax:
+            return None
+        return self.buscador.indice(event.x, event.y)
+
+    def etiqueta_en(self, event) -> Optional[str]:
+        i = self.indice_en(event)
+        return None if i is None else self.etiquetas[i]
+
+    def _al_pulsar(self, event):
+        etiqueta = self.etiqueta_en(event)
+        if etiqueta is not None and self.al_elegir is not None:
+            self.al_elegir(etiqueta)
+
+    def _al_mover(self, event):
+        self._resaltar(self.indice_en(event))
+
+    def _al_dibujar(self, event):
+        # El resaltado es animado: no entra en el dibujo normal ni en el fondo
+        self._fondo = self.canvas.copy_from_bbox(self.ax.bbox)
+        if self.resaltado.get_visible():
+            self.ax.draw_artist(self.resaltado)
+
+    def _resaltar(self, i: Optional[int]):
+        if i == self._indice_resaltado:
+            return
+        self._indice_resaltado = i
+        if i is None:
+            self.resaltado.set_visible(False)
+        else:
+            sector = self.sectores[i]
+            self.resaltado.set_theta1(sector.theta1)
+            self.resaltado.set_theta2(sector.theta2)
+            self.resaltado.set_visible(True)
+        if self._fondo is None:
+            return
+        self.canvas.restore_region(self._fondo)
+        if self.resaltado.get_visible():
+            self.ax.draw_artist(self.resaltado)
+        self.canvas.blit(self.ax.bbox)
+
+
+class LineaVivo:
+    """Gráfico de una serie diaria con una sola línea que se actualiza con set_data.
+
+    La línea se reduce al ancho del lienzo; al hacer zoom se vuelve a reducir
+    el tramo visible a partir de la serie completa.
+    """
+    def __init__(self, master, figsize=(6, 3)):
+        self.figura = Figure(figsize=figsize)
+        self.ax = self.figura.add_subplot(111)
+        self.linea, = self.ax.plot([], [], marker='o')
+        self.reducida = LineaReducida(self.linea)
+        self.ax.xaxis_date()
+        self.ax.set_xlabel('Fecha')
+        self.ax.tick_params(axis='x', labelrotation=45)
+        # Márgenes fijos: tight_layout en cada actualización cuesta más que el dibujo
+        self.figura.subplots_adjust(left=0.12, right=0.97, bottom=0.3, top=0.95)
+        self.canvas = FigureCanvasTkAgg(self.figura, master=master)
+
+    def widget(self) -> tk.Widget:
+        return self.canvas.get_tk_widget()
+
+    def actualizar(self, fechas: Sequence, valores: Sequence[float], titulo: str,
+                   ymax: Optional[float] = None, enteros: bool = False):
+        """Cambia los datos de la línea; ymax None toma el máximo de los valores."""
+        x = mdates.date2num(np.asarray(fechas, dtype='datetime64[D]'))
+        y = np.asarray(valores, dtype=float)
+        if len(x):
+            self.ax.set_xlim(x.min() - 0.5, x.max() + 0.5, emit=False)
+        self.reducida.set_data(x, y)
+        if ymax is None:
+            ymax = np.nanmax(y) if len(y) and not np.isnan(y).all() else 1
+        self.ax.set_ylim(0, max(ymax, 1) * 1.1)  # 10% de margen superior
+        self.ax.yaxis.set_major_locator(MaxNLocator(integer=True) if enteros else AutoLocator())
+        self.ax.set_ylabel(titulo)
+        self.canvas.draw_idle()
+
+
+class ControladorGraficos:
+    """Gráficos de la ventana de estadísticas creados una sola vez.
+
+    El circular ocupa la columna 0 de master; la serie del pensamiento
+    elegido y su descripción, la columna 1, que se oculta mientras no hay
+    pensamiento.
+    """
+    def __init__(self, master, al_elegir: Optional[Callable[[str], None]] = None):
+        self.circular = CircularVivo(master, al_elegir=al_elegir)
+        self.circular.widget().grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
+
+        self.frame_derecho = ttk.Frame(master)
+        self.linea = LineaVivo(self.frame_derecho)
+        barra = NavigationToolbar2Tk(self.linea.canvas, self.frame_derecho, pack_toolbar=False)
+        barra.pack(fill=tk.X)
+        self.linea.widget().pack(fill=tk.BOTH, expand=True)
+
+        frame_descripcion = ttk.LabelFrame(self.frame_derecho, text="Descripción del Pensamiento")
+        frame_descripcion.pack(fill=tk.BOTH, expand=True, pady=(10, 0))
+        self.text_descripcion = tk.Text(frame_descripcion, wrap=tk.WORD, height=5,
+                                        padx=10, pady=10, state='disabled')
+        scrollbar = ttk.Scrollbar(frame_descripcion, command=self.text_descripcion.yview)
+        self.text_descripcion.configure(yscrollcommand=scrollbar.set)
+        self.text_descripcion.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.serie_visible = False
+
+    def actualizar_circular(self, valores: Sequence[float], etiquetas: Sequence[str],
+                            colores: Sequence, formato: Callable[[float], str]) -> bool:
+        return self.circular.actualizar(valores, etiquetas, colores, formato)
+
+    def actualizar_serie(self, fechas: Sequence, valores: Sequence[float], titulo: str,
+                         ymax: Optional[float] = None, enteros: bool = False,
+                         descripcion: Optional[str] = None):
+        """Actualiza la serie; la descripción solo se reescribe si se pasa."""
+        self.linea.actualizar(fechas, valores, titulo, ymax, enteros)
+        if descripcion is not None:
+            self.text_descripcion.config(state='normal')
+            self.text_descripcion.delete('1.0', tk.END)
+            self.text_descripcion.insert('1.0', descripcion)
+            self.text_descripcion.config(state='disabled')
+        if not self.serie_visible:
+            self.frame_derecho.grid(row=0, column=1, sticky="nsew", padx=5, pady=5)
+            self.serie_visible = True
+
+    def ocultar_serie(self):
+        if self.serie_visible:
+            self.frame_derecho.grid_remove()
+            self.serie_visible = False
+
+    def limpiar(self):
+        self.circular.vaciar()
+        self.ocultar_serie()
@@ -0,0 +1,158 @@
+import os
+import time
+from typing import List, Optional, Sequence, Tuple
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from deteccion import alertas_paciente
+from motor_estadisticas import Fecha, resumen_periodo
+from render_graficos import TITULOS, CacheGraficos, imagenes_informe
+from servicio_bd import RUTA_DB, ServicioBD, obtener_servicio, pool_procesos
+
+
+LOTES_POR_PROCESO = 4
+
+# (código, nombre, ruta del pdf)
+Tarea = Tuple[str, str, str]
+
+
+def generar_informe(servicio: ServicioBD, codigo_paciente: str, nombre: str,
+                    desde: Fecha, hasta: Fecha, ruta_pdf: str,
+                    dimension: str = 'cantidad', cache: Optional[CacheGraficos] = None) -> int:
+    """Escribe el informe PDF de un paciente y devuelve cuántos pensamientos incluye.
+
+    Las imágenes salen de la caché de gráficos y solo se dibujan si faltan.
+    """
+    resumen = resumen_periodo(servicio, codigo_paciente, desde, hasta)
+    alertas = alertas_paciente(servicio, codigo_paciente, desde, hasta, dimension)
+    styles = getSampleStyleSheet()
+    story = [
+        Paragraph(f'Informe de Pensamientos: {codigo_paciente} - {nombre}', styles['Heading1']),
+        Paragraph(f'Período: {desde} a {hasta}', styles['Normal']),
+        Spacer(1, 12),
+    ]
+
+    if not len(resumen):
+        story.append(Paragraph('No hay registros en el período.', styles['Normal']))
+    else:
+        totales = resumen.totales()
+        story.append(Paragraph(
+            f"Registros: {totales['registros']}<br/>"
+            f"Total ocurrencias: {totales['cantidad']}<br/>"
+            f"Total duración: {totales['duracion']} minutos<br/>"
+            f"Intensidad promedio: {totales['intensidad']:.2f}", styles['Normal']))
+        story.append(Spacer(1, 12))
+        circular, evolucion = imagenes_informe(servicio, codigo_paciente, desde, hasta, dimension,
+                                               cache=cache)
+        story.append(Image(circular, width=6 * inch, height=4 * inch))
+        story.append(Image(evolucion, width=6 * inch, height=3 * inch))
+        story.append(Spacer(1, 12))
+
+        story.append(Paragraph('Resumen por Pensamiento:', styles['Heading2']))
+        intensidades = resumen.valores('intensidad')
+        tabla = [['Código', 'Pensamiento', 'Cantidad', 'Duración', 'Intensidad', 'Alertas']]
+        for i, codigo in enumerate(resumen.codigos):
+            texto = resumen.pensamientos[i] or ''
+            tabla.append([
+                codigo,
+                Paragraph(texto[:80] + '...' if len(texto) > 80 else texto, styles['BodyText']),
+                str(resumen.cantidad[i]),
+                str(resumen.duracion[i]),
+                f'{intensidades[i]:.1f}',
+                Paragraph(alertas.marca(codigo), styles['BodyText']),
+            ])
+        table = Table(tabla, repeatRows=1, colWidths=[1.0 * inch, 2.2 * inch, 0.7 * inch,
+                                                      0.7 * inch, 0.7 * inch, 1.5 * inch])
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ]))
+        story.append(table)
+
+    SimpleDocTemplate(ruta_pdf, pagesize=A4).build(story)
+    return len(resumen)
+
+
+def procesar_lote(ruta_db: str, tareas: Sequence[Tarea], desde: str, hasta: str,
+                  dimension: str) -> Tuple[List[str], List[Tuple[str, str]]]:
+    """Genera los informes de un lote; se ejecuta en un proceso del pool.
+
+    Devuelve (rutas generadas, [(código, error)]); un paciente que falla no
+    detiene al resto.
+    """
+    servicio = obtener_servicio(ruta_db)
+    generados, errores = [], []
+    for codigo, nombre, ruta in tareas:
+        try:
+            generar_informe(servicio, codigo, nombre, desde, hasta, ruta, dimension)
+            generados.append(ruta)
+        except Exception as e:
+            errores.append((codigo, str(e)))
+    return generados, errores
+
+
+def generar_informes(desde: Fecha, hasta: Fecha, carpeta: str,
+                     pacientes: Optional[Sequence[str]] = None, ruta_db: str = RUTA_DB,
+                     procesos: Optional[int] = None, dimension: str = 'cantidad'
+                     ) -> Tuple[List[str], List[Tuple[str, str]]]:
+    """Genera un PDF por paciente (todos o los códigos indicados) en carpeta.
+
+    Los pacientes se reparten en lotes entre procesos (por defecto uno por
+    núcleo) arrancados con pool_procesos, cada uno con su propia conexión.
+    Con procesos=1 todo se hace en este proceso.
+    """
+    desde, hasta = str(desde), str(hasta)
+    os.makedirs(carpeta, exist_ok=True)
+    filas = obtener_servicio(ruta_db).consultar('SELECT codigo, nombre FROM pacientes ORDER BY codigo')
+    if pacientes is not None:
+        elegidos = set(pacientes)
+        filas = [fila for fila in filas if fila[0] in elegidos]
+    sufijo = f'{desde.replace("-", "")}_{hasta.replace("-", "")}'
+    tareas = [(codigo, nombre, os.path.join(carpeta, f'Informe_{codigo}_{sufijo}.pdf'))
+              for codigo, nombre in filas]
+
+    procesos = procesos or os.cpu_count() or 1
+    if procesos == 1:
+        return procesar_lote(ruta_db, tareas, desde, hasta, dimension)
+
+    generados, errores = [], []
+    cuantos = procesos * LOTES_POR_PROCESO
+    lotes = [lote for lote in (tareas[i::cuantos] for i in range(cuantos)) if lote]
+    with pool_procesos(procesos, ruta_db) as pool:
+        futuros = [pool.submit(procesar_lote, ruta_db, lote, desde, hasta, dimension)
+                   for lote in lotes]
+        for futuro in futuros:
+            rutas, fallos = futuro.result()
+            generados.extend(rutas)
+            errores.extend(fallos)
+    return sorted(generados), errores
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Informes PDF de pacientes sin interfaz gráfica')
+    parser.add_argument('desde', help='AAAA-MM-DD')
+    parser.add_argument('hasta', help='AAAA-MM-DD')
+    parser.add_argument('--salida', default='informes', help='carpeta donde se guardan los PDF')
+    parser.add_argument('--pacientes', nargs='+', help='códigos de paciente; por defecto, todos')
+    parser.add_argument('--dimension', choices=tuple(TITULOS), default='cantidad')
+    parser.add_argument('--procesos', type=int, default=None, help='por defecto, uno por núcleo')
+    parser.add_argument('--db', default=RUTA_DB, help='ruta de la base de datos')
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    generados, errores = generar_informes(args.desde, args.hasta, args.salida, args.pacientes,
+                                          args.db, args.procesos, args.dimension)
+    segundos = time.perf_counter() - inicio
+
+    for codigo, error in errores:
+        print(f'{codigo}: {error}')
+    print(f'{len(generados)} informes en {args.salida} ({len(errores)} con errores) en {segundos:.1f} s')
@@ -0,0 +1,250 @@
+import json
+import sqlite3
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from bus_cambios import BORRADA, INSERTADA, MODIFICADA, CambioDimension, RegistroDimension
+from servicio_bd import RUTA_DB, ServicioBD, obtener_servicio
+
+
+# (código de pensamiento, fecha, cantidad, duración, intensidad)
+Fila = Tuple[str, str, Any, Any, Any]
+
+# Columna: (mínimo, máximo, admite vacío)
+RANGOS = {
+    'cantidad': (0, 10, False),
+    'duracion': (0, 60, True),
+    'intensidad': (0, 10, True),
+}
+
+# Cuántos motivos de rechazo se muestran en el error del modo estricto
+MAX_MOTIVOS = 10
+
+INSERTAR = """
+    INSERT INTO dimensiones (pensamiento_id, fecha, cantidad, duracion, intensidad)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+LEER_FILA = """
+    SELECT pa.codigo, p.codigo, d.fecha, d.cantidad, d.duracion, d.intensidad
+    FROM dimensiones d
+    JOIN pensamientos p ON p.id = d.pensamiento_id
+    LEFT JOIN pacientes pa ON pa.id = p.paciente_id
+    WHERE d.id = ?
+"""
+
+
+@dataclass
+class Rechazo:
+    fila: int           # posición en la entrada, empezando en 0
+    motivo: str
+
+
+@dataclass
+class ResultadoIngesta:
+    insertadas: int = 0
+    rechazadas: List[Rechazo] = field(default_factory=list)
+
+
+def _vacio(valor: Any) -> bool:
+    return valor is None or valor == '' or valor == 'nan'
+
+
+def _columna_numerica(valores: Sequence[Any]) -> Tuple[np.ndarray, List[int]]:
+    """Convierte la columna a float con NaN en los vacíos y señala lo no numérico."""
+    try:
+        return np.array([np.nan if _vacio(v) else v for v in valores], dtype=float), []
+    except (TypeError, ValueError):
+        pass
+    arr = np.full(len(valores), np.nan)
+    malas = []
+    for i, v in enumerate(valores):
+        if _vacio(v):
+            continue
+        try:
+            arr[i] = float(v)
+        except (TypeError, ValueError):
+            malas.append(i)
+    return arr, malas
+
+
+def _fechas_validas(fechas: Sequence[Any]) -> np.ndarray:
+    """Máscara de las fechas escritas como AAAA-MM-DD y existentes en el calendario."""
+    texto = np.array([f if isinstance(f, str) else '' for f in fechas])
+    try:
+        dias = texto.astype('datetime64[D]')
+    except ValueError:
+        dias = np.array([_fecha(f) for f in texto], dtype='datetime64[D]')
+    return ~np.isnat(dias) & (dias.astype(str) == texto)
+
+
+def _fecha(texto: str) -> np.datetime64:
+    try:
+        return np.datetime64(texto, 'D')
+    except ValueError:
+        return np.datetime64('NaT')
+
+
+def validar(filas: Sequence[Fila]) -> Tuple[Dict[str, np.ndarray], List[Rechazo]]:
+    """Comprueba códigos, fechas y rangos de todas las filas a la vez.
+
+    Devuelve las columnas numéricas (NaN en los vacíos) y los rechazos.
+    """
+    motivos: Dict[int, str] = {}
+    for i, fila in enumerate(filas):
+        if not isinstance(fila[0], str) or not fila[0]:
+            motivos[i] = f'código de pensamiento no válido: {fila[0]!r}'
+    columnas = {}
+    for posicion, (nombre, (minimo, maximo, admite_vacio)) in enumerate(RANGOS.items(), start=2):
+        arr, malas = _columna_numerica([f[posicion] for f in filas])
+        for i in malas:
+            motivos.setdefault(i, f'{nombre} no es un número')
+        vacias = np.isnan(arr)
+        fuera = ~vacias & ((arr < minimo) | (arr > maximo) | (arr != np.floor(arr)))
+        for i in np.flatnonzero(fuera):
+            motivos.setdefault(int(i), f'{nombre} debe ser un entero entre {minimo} y {maximo}')
+        if not admite_vacio:
+            for i in np.flatnonzero(vacias):
+                if int(i) not in malas:
+                    motivos.setdefault(int(i), f'{nombre} es obligatoria')
+        columnas[nombre] = arr
+    for i in np.flatnonzero(~_fechas_validas([f[1] for f in filas])):
+        motivos.setdefault(int(i), f'fecha no válida: {filas[i][1]!r}')
+    return columnas, [Rechazo(i, m) for i, m in sorted(motivos.items())]
+
+
+def resolver_codigos(conn: sqlite3.Connection,
+                     codigos: Iterable[str]) -> Dict[str, Tuple[int, Optional[str]]]:
+    """Traduce códigos de pensamiento a (id, código del paciente) con una sola consulta."""
+    filas = conn.execute("""
+        SELECT p.codigo, p.id, pa.codigo
+        FROM pensamientos p
+        LEFT JOIN pacientes pa ON pa.id = p.paciente_id
+        WHERE p.codigo IN (SELECT value FROM json_each(?))
+    """, (json.dumps(sorted(set(codigos))),)).fetchall()
+    return {codigo: (id_, paciente) for codigo, id_, paciente in filas}
+
+
+def _entero(valor: float) -> Optional[int]:
+    return None if np.isnan(valor) else int(valor)
+
+
+def ingerir_dimensiones(filas: Iterable[Fila], servicio: Optional[ServicioBD] = None,
+                        estricto: bool = True) -> ResultadoIngesta:
+    """Inserta muchas dimensiones en una sola transacción.
+
+    Con estricto=True cualquier fila inválida o con un código desconocido
+    hace que no se inserte nada y se lanza ValueError; si no, se insertan
+    las válidas y las demás se devuelven en ResultadoIngesta.rechazadas.
+    """
+    filas = [tuple(f) for f in filas]
+    if not filas:
+        return ResultadoIngesta()
+    servicio = servicio or obtener_servicio()
+    columnas, rechazadas = validar(filas)
+    if estricto and rechazadas:
+        raise ValueError(_describir(rechazadas))
+
+    with servicio.transaccion() as conn:
+        ya_rechazadas = {r.fila for r in rechazadas}
+        ids = resolver_codigos(conn, (f[0] for i, f in enumerate(filas) if i not in ya_rechazadas))
+        for i, fila in enumerate(filas):
+            if fila[0] not in ids and i not in ya_rechazadas:
+                rechazadas.append(Rechazo(i, f'pensamiento desconocido: {fila[0]!r}'))
+        rechazadas.sort(key=lambda r: r.fila)
+        if estricto and rechazadas:
+            raise ValueError(_describir(rechazadas))
+
+        excluir = {r.fila for r in rechazadas}
+        cantidad, duracion, intensidad = (columnas[c] for c in RANGOS)
+        insertadas = [
+            RegistroDimension(ids[fila[0]][1], fila[0], fila[1], _entero(cantidad[i]),
+                              _entero(duracion[i]), _entero(intensidad[i]))
+            for i, fila in enumerate(filas) if i not in excluir]
+        conn.executemany(INSERTAR, (
+            (ids[r.pensamiento][0], r.fecha, r.cantidad, r.duracion, r.intensidad)
+            for r in insertadas))
+    servicio.cambios.publicar([CambioDimension(INSERTADA, nuevo=r) for r in insertadas])
+    return ResultadoIngesta(len(insertadas), rechazadas)
+
+
+def _leer_registro(conn: sqlite3.Connection, dimension_id: int) -> RegistroDimension:
+    fila = conn.execute(LEER_FILA, (dimension_id,)).fetchone()
+    if fila is None:
+        raise ValueError(f'No existe la dimensión {dimension_id}')
+    return RegistroDimension(*fila)
+
+
+def modificar_dimension(dimension_id: int, cantidad: Any, duracion: Any, intensidad: Any,
+                        servicio: Optional[ServicioBD] = None) -> RegistroDimension:
+    """Cambia los valores de una dimensión y avisa a las ventanas abiertas."""
+    servicio = servicio or obtener_servicio()
+    with servicio.transaccion() as conn:
+        anterior = _leer_registro(conn, dimension_id)
+        columnas, rechazadas = validar([(anterior.pensamiento, anterior.fecha,
+                                         cantidad, duracion, intensidad)])
+        if rechazadas:
+            raise ValueError(rechazadas[0].motivo)
+        nuevo = RegistroDimension(anterior.paciente, anterior.pensamiento, anterior.fecha,
+                                  *(_entero(columnas[c][0]) for c in RANGOS))
+        conn.execute('UPDATE dimensiones SET cantidad = ?, duracion = ?, intensidad = ? WHERE id = ?',
+                     (nuevo.cantidad, nuevo.duracion, nuevo.intensidad, dimension_id))
+    servicio.cambios.publicar([CambioDimension(MODIFICADA, nuevo=nuevo, anterior=anterior)])
+    return nuevo
+
+
+def borrar_dimension(dimension_id: int, servicio: Optional[ServicioBD] = None) -> RegistroDimension:
+    """Borra una dimensión y avisa a las ventanas abiertas."""
+    servicio = servicio or obtener_servicio()
+    with servicio.transaccion() as conn:
+        anterior = _leer_registro(conn, dimension_id)
+        conn.execute('DELETE FROM dimensiones WHERE id = ?', (dimension_id,))
+    servicio.cambios.publicar([CambioDimension(BORRADA, anterior=anterior)])
+    return anterior
+
+
+def _describir(rechazadas: List[Rechazo]) -> str:
+    lineas = [f'fila {r.fila + 1}: {r.motivo}' for r in rechazadas[:MAX_MOTIVOS]]
+    if len(rechazadas) > MAX_MOTIVOS:
+        lineas.append(f'... y {len(rechazadas) - MAX_MOTIVOS} más')
+    return f'{len(rechazadas)} filas no válidas, no se ha insertado nada:\n' + '\n'.join(lineas)
+
+
+def leer_txt(ruta: str) -> List[Fila]:
+    """Lee un volcado de data/db-extractor.py (id|pensamiento_codigo|fecha|...)."""
+    with open(ruta, encoding='utf-8') as f:
+        cabecera = f.readline().rstrip('\n').split('|')
+        posiciones = [cabecera.index(c) for c in
+                      ('pensamiento_codigo', 'fecha', 'cantidad', 'duracion', 'intensidad')]
+        return [tuple(partes[p] for p in posiciones)
+                for partes in (linea.rstrip('\n').split('|') for linea in f if linea.strip())]
+
+
+def leer_json(ruta: str) -> List[Fila]:
+    """Lee una subida de la app móvil: lista de objetos Dimension en JSON."""
+    with open(ruta, encoding='utf-8') as f:
+        datos = json.load(f)
+    return [(d.get('pensamientoId', d.get('pensamiento_codigo')), d.get('fecha'),
+             d.get('cantidad'), d.get('duracion'), d.get('intensidad')) for d in datos]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Carga dimensiones en bloque desde un volcado txt o json')
+    parser.add_argument('archivo', help='dimensiones_data.txt o subida .json de la app móvil')
+    parser.add_argument('--db', default=RUTA_DB, help='ruta de la base de datos')
+    parser.add_argument('--parcial', action='store_true',
+                        help='insertar las filas válidas aunque haya rechazadas')
+    args = parser.parse_args()
+
+    filas = leer_json(args.archivo) if args.archivo.endswith('.json') else leer_txt(args.archivo)
+    try:
+        resultado = ingerir_dimensiones(filas, obtener_servicio(args.db), not args.parcial)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    print(f'Insertadas {resultado.insertadas} de {len(filas)} dimensiones')
+    for r in resultado.rechazadas:
+        print(f'  fila {r.fila + 1}: {r.motivo}')
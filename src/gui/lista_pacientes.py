@@ -0,0 +1,60 @@
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import List, Optional
+
+from servicio_bd import ServicioBD
+
+
+# Días que cuentan como actividad reciente en las listas
+DIAS_RECIENTES = 7
+
+# Lee pacientes_resumen (mantenida por disparadores) y suma los últimos días
+# de pacientes_diarios con una búsqueda por clave para cada paciente
+CONSULTA_FICHAS = """
+    SELECT pa.codigo, pa.nombre, pa.fecha_nacimiento, pa.sexo, pa.enfermedad,
+           IFNULL(r.pensamientos, 0), IFNULL(r.registros, 0), r.ultimo_registro,
+           IFNULL((SELECT SUM(d.registros) FROM pacientes_diarios d
+                   WHERE d.paciente_id = pa.id AND d.fecha >= ?), 0)
+    FROM pacientes pa
+    LEFT JOIN pacientes_resumen r ON r.paciente_id = pa.id
+    ORDER BY pa.codigo
+"""
+
+
+@dataclass
+class FichaPaciente:
+    """Datos de un paciente con sus totales para listas y desplegables."""
+    codigo: str
+    nombre: str
+    fecha_nacimiento: Optional[str]
+    sexo: Optional[str]
+    enfermedad: Optional[str]
+    pensamientos: int
+    registros: int
+    ultimo_registro: Optional[str]      # AAAA-MM-DD
+    registros_recientes: int            # en los últimos DIAS_RECIENTES días
+
+    def ultimo_registro_texto(self) -> str:
+        """Fecha del último registro como dd/mm/aaaa, o '-' si no hay."""
+        if not self.ultimo_registro:
+            return '-'
+        anio, mes, dia = self.ultimo_registro[:10].split('-')
+        return f'{dia}/{mes}/{anio}'
+
+    def etiqueta(self) -> str:
+        """Texto para los desplegables; empieza por 'código - nombre'."""
+        return (f'{self.codigo} - {self.nombre}  ({self.pensamientos} pens., '
+                f'último {self.ultimo_registro_texto()}, '
+                f'{self.registros_recientes} en {DIAS_RECIENTES} días)')
+
+
+def fichas_pacientes(servicio: ServicioBD, hoy: Optional[date] = None) -> List[FichaPaciente]:
+    """Todos los pacientes ordenados por código con sus totales."""
+    desde = (hoy or date.today()) - timedelta(days=DIAS_RECIENTES - 1)
+    return [FichaPaciente(*fila)
+            for fila in servicio.consultar_cacheado(CONSULTA_FICHAS, (desde.isoformat(),))]
+
+
+def etiquetas_pacientes(servicio: ServicioBD) -> List[str]:
+    """Valores de los desplegables de pacientes."""
+    return [ficha.etiqueta() for ficha in fichas_pacientes(servicio)]
@@ -1,12 +1,42 @@
+import importlib
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox
-import sqlite3
-from datetime import datetime
-import os
-from registroPacientes import GestionPacientes
-from registraPensamientos import VentanaPensamientos
-from registroDimensionesbu import VentanaDimensiones
-from estadisticasfecha import VentanaEstadisticas
+from servicio_bd import obtener_servicio
+
+# Módulo y clase de cada ventana. Se importan al abrirla por primera vez para
+# que el menú aparezca sin cargar matplotlib, numpy, tkcalendar ni pandas
+VENTANAS = {
+    'pacientes': ('registroPacientes', 'GestionPacientes'),
+    'pensamientos': ('registraPensamientos', 'VentanaPensamientos'),
+    'dimensiones': ('registroDimensionesbu', 'VentanaDimensiones'),
+    'estadisticas': ('estadisticasfecha', 'VentanaEstadisticas'),
+}
+
+
+def clase_ventana(nombre):
+    """Importa (solo la primera vez) y devuelve la clase de la ventana"""
+    modulo, clase = VENTANAS[nombre]
+    return getattr(importlib.import_module(modulo), clase)
+
+
+def precargar(nombres=tuple(VENTANAS)):
+    """Importa en un hilo de fondo los módulos de las ventanas.
+
+    Si se pulsa un botón mientras tanto, el import del hilo principal espera
+    al de fondo en vez de repetirlo.
+    """
+    def cargar():
+        for nombre in nombres:
+            try:
+                importlib.import_module(VENTANAS[nombre][0])
+            except Exception:
+                pass  # El error se mostrará al abrir la ventana
+    hilo = threading.Thread(target=cargar, name='precarga', daemon=True)
+    hilo.start()
+    return hilo
+
+
 class AppPsicologia:
     def __init__(self, root):
         self.root = root
@@ -44,27 +74,16 @@ class AppPsicologia:
     def verificar_estado_botones(self):
         """Verifica si hay datos para activar/desactivar botones"""
 
-        # Define la carpeta específica y el nombre del archivo
-        folder_path = "../../data/"
-        db_name = "db_psicologia_clinic.db"
-        db_path = os.path.join(folder_path, db_name)
-        print(db_path)
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
+        db = obtener_servicio()
         
         # Verificar si hay pacientes
-        cursor.execute("SELECT COUNT(*) FROM pacientes")
-        hay_pacientes = cursor.fetchone()[0] > 0
+        hay_pacientes = db.consultar_uno("SELECT EXISTS(SELECT 1 FROM pacientes)")[0] > 0
         
         # Verificar si hay pensamientos
-        cursor.execute("SELECT COUNT(*) FROM pensamientos")
-        hay_pensamientos = cursor.fetchone()[0] > 0
+        hay_pensamientos = db.consultar_uno("SELECT EXISTS(SELECT 1 FROM pensamientos)")[0] > 0
         
         # Verificar si hay dimensiones
-        cursor.execute("SELECT COUNT(*) FROM dimensiones")
-        hay_dimensiones = cursor.fetchone()[0] > 0
-        
-        conn.close()
+        hay_dimensiones = db.consultar_uno("SELECT EXISTS(SELECT 1 FROM dimensiones)")[0] > 0
         
         # Activar/desactivar botones según corresponda
         self.btn_pensamientos['state'] = 'normal' if hay_pacientes else 'disabled'
@@ -91,7 +110,7 @@ class AppPsicologia:
         #ventana = tk.Toplevel(self.root)
         #ventana.title("Gestión de Pacientes")
         #ventana.geometry("600x400")
-        ventana = GestionPacientes(root)
+        ventana = clase_ventana('pacientes')(root)
         
         # Aquí irían los widgets para gestionar pacientes
         # Se implementará en un método separado
@@ -101,7 +120,7 @@ class AppPsicologia:
         #ventana = tk.Toplevel(self.root)
         #ventana.title("Registro de Pensamientos")
         #ventana.geometry("600x400")
-        ventana = VentanaPensamientos(root)
+        ventana = clase_ventana('pensamientos')(root)
         
         # Aquí irían los widgets para registrar pensamientos
         # Se implementará en un método separado
@@ -111,7 +130,7 @@ class AppPsicologia:
         #ventana = tk.Toplevel(self.root)
         #ventana.title("Registro de Dimensiones")
         #ventana.geometry("600x400")
-        ventana = VentanaDimensiones(root)
+        ventana = clase_ventana('dimensiones')(root)
         # Aquí irían los widgets para registrar dimensiones
         # Se implementará en un método separado
 
@@ -122,7 +141,7 @@ class AppPsicologia:
         # ventana.geometry("1600x700")
         #from estadisticasfecha import VentanaEstadisticas
         #if __name__ == "__main__":
-        ventana = VentanaEstadisticas(root)
+        ventana = clase_ventana('estadisticas')(root)
         #app.ventana.mainloop()
 
         #ventana = VentanaEstadisticas()
@@ -139,6 +158,15 @@ class AppPsicologia:
         )
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Sistema de Seguimiento Psicológico')
+    parser.add_argument('--precargar', action='store_true',
+                        help='importar las ventanas en segundo plano tras mostrar el menú')
+    args = parser.parse_args()
+
     root = tk.Tk()
     app = AppPsicologia(root)
+    if args.precargar:
+        root.after(200, precargar)
     root.mainloop()
\ No newline at end of file
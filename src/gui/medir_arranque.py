@@ -0,0 +1,120 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+
+CARPETA = os.path.dirname(os.path.abspath(__file__))
+
+# Tiempo máximo (mediana) hasta que el menú de main.py está listo
+PRESUPUESTO_MS = 300
+REPETICIONES = 5
+
+# Módulos que no deben cargarse antes de abrir alguna ventana
+PESADOS = ('matplotlib', 'numpy', 'pandas', 'tkcalendar', 'reportlab', 'openpyxl')
+
+# Se ejecuta en un intérprete nuevo para cada medida. Sin pantalla solo se
+# mide el import; con pantalla, también la creación del menú hasta que se pinta
+ARRANQUE = """
+import json, sys, time
+inicio = time.perf_counter()
+import main
+importado = time.perf_counter()
+menu_ms = None
+try:
+    raiz = main.tk.Tk()
+except main.tk.TclError:
+    raiz = None
+if raiz is not None:
+    main.AppPsicologia(raiz)
+    raiz.update()
+    menu_ms = (time.perf_counter() - importado) * 1000
+    raiz.destroy()
+print(json.dumps({
+    'import_ms': (importado - inicio) * 1000,
+    'menu_ms': menu_ms,
+    'pesados': [m for m in %r if m in sys.modules],
+}))
+""" % (PESADOS,)
+
+
+@dataclass
+class Arranque:
+    import_ms: float
+    menu_ms: Optional[float]
+    pesados: List[str]
+
+    @property
+    def total_ms(self) -> float:
+        return self.import_ms + (self.menu_ms or 0)
+
+
+def _ejecutar(*opciones: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *opciones, '-c', ARRANQUE], cwd=CARPETA,
+                          capture_output=True, text=True, check=True)
+
+
+def medir_arranque() -> Arranque:
+    """Un arranque en frío de main.py en un proceso nuevo."""
+    return Arranque(**json.loads(_ejecutar().stdout.strip().splitlines()[-1]))
+
+
+def modulos_mas_lentos(cuantos: int = 15) -> List[Tuple[str, float]]:
+    """[(módulo, ms acumulados)] que importa main, según python -X importtime."""
+    filas = []
+    for linea in _ejecutar('-X', 'importtime').stderr.splitlines():
+        if not linea.startswith('import time:') or 'cumulative' in linea:
+            continue
+        _, acumulado, nombre = linea[len('import time:'):].split('|')
+        filas.append((nombre[1:], int(acumulado) / 1000))
+    # importtime escribe cada módulo después de los que importa: los de main
+    # son las filas sangradas justo antes de la suya
+    fin = next(i for i, (nombre, _) in enumerate(filas) if nombre == 'main')
+    inicio = fin
+    while inicio > 0 and filas[inicio - 1][0].startswith(' '):
+        inicio -= 1
+    tiempos = [(nombre.strip(), ms) for nombre, ms in filas[inicio:fin + 1]]
+    return sorted(tiempos, key=lambda t: -t[1])[:cuantos]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Mide el arranque de main.py y falla si supera el presupuesto')
+    parser.add_argument('--presupuesto', type=float, default=PRESUPUESTO_MS, help='ms (mediana)')
+    parser.add_argument('--repeticiones', type=int, default=REPETICIONES)
+    args = parser.parse_args()
+
+    try:
+        arranques = [medir_arranque() for _ in range(args.repeticiones)]
+    except subprocess.CalledProcessError as e:
+        print(f'FALLO: main.py no arranca\n{e.stderr}')
+        sys.exit(1)
+    mediana = statistics.median(a.total_ms for a in arranques)
+    con_menu = [a.menu_ms for a in arranques if a.menu_ms is not None]
+    print(f'import de main: mediana {statistics.median(a.import_ms for a in arranques):.1f} ms')
+    if con_menu:
+        print(f'menú pintado:   mediana {statistics.median(con_menu):.1f} ms más')
+    else:
+        print('sin pantalla: solo se mide el import')
+
+    pesados = sorted({m for a in arranques for m in a.pesados})
+    fallos = []
+    if mediana > args.presupuesto:
+        fallos.append(f'{mediana:.1f} ms supera el presupuesto de {args.presupuesto:.0f} ms')
+    if pesados:
+        fallos.append(f'se cargan al arrancar: {", ".join(pesados)}')
+    if not fallos:
+        print(f'OK: {mediana:.1f} ms de {args.presupuesto:.0f} ms')
+        sys.exit(0)
+
+    for fallo in fallos:
+        print(f'FALLO: {fallo}')
+    print('\nmódulos más lentos (python -X importtime):')
+    for nombre, ms in modulos_mas_lentos():
+        print(f'  {ms:8.1f} ms  {nombre}')
+    sys.exit(1)
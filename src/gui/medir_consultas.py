@@ -0,0 +1,227 @@
+import json
+import random
+import sqlite3
+import statistics
+import time
+from dataclasses import asdict, dataclass
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Sequence
+
+from motor_estadisticas import (CONSULTA_AGRUPADA, CONSULTA_AGRUPADA_CLINICA, CONSULTA_PENSAMIENTOS,
+                                CONSULTA_PERIODO, CONSULTA_REGISTROS, CONSULTA_SERIE, RESOLUCIONES)
+from distribuciones import CONSULTA_DIAS, CONSULTA_MESES, CONSULTA_PACIENTE
+from lista_pacientes import CONSULTA_FICHAS
+from registraPensamientos import CONSULTA_PENSAMIENTOS_PACIENTE, CONSULTA_SIGUIENTE_CODIGO
+from servicio_bd import RUTA_DB, obtener_servicio
+
+
+@dataclass
+class Muestra:
+    """Valores reales de la base con los que se parametrizan las consultas."""
+    paciente: str
+    pensamiento: str
+    desde: str
+    hasta: str
+
+
+@dataclass
+class Consulta:
+    origen: str
+    sql: str
+    parametros: Callable[[Muestra], Sequence]
+    pesada: bool = False            # recorre tablas completas (exportadores)
+    recorrido: bool = False         # recorre una tabla a propósito, pero es barata
+
+
+@dataclass
+class Resultado:
+    nombre: str
+    origen: str
+    repeticiones: int
+    filas: int
+    p50_ms: float
+    p95_ms: float
+    max_ms: float
+
+
+# Sentencias de lectura de las ventanas y exportadores, agrupadas por origen
+CONSULTAS: Dict[str, Consulta] = {
+    # EXISTS se detiene en la primera fila
+    'existe_paciente': Consulta(
+        'main.py', 'SELECT EXISTS(SELECT 1 FROM pacientes)', lambda m: (), recorrido=True),
+    'existe_dimension': Consulta(
+        'main.py', 'SELECT EXISTS(SELECT 1 FROM dimensiones)', lambda m: (), recorrido=True),
+    # Lista todos los pacientes
+    'fichas_pacientes': Consulta(
+        'lista_pacientes.py (desplegables y registroPacientes.py)',
+        CONSULTA_FICHAS, lambda m: (m.desde,), recorrido=True),
+    'siguiente_codigo_paciente': Consulta(
+        'registroPacientes.py',
+        'SELECT MAX(CAST(SUBSTR(codigo, 2) AS INTEGER)) FROM pacientes', lambda m: ()),
+    'pensamientos_paciente': Consulta(
+        'registraPensamientos.py', CONSULTA_PENSAMIENTOS_PACIENTE, lambda m: (m.paciente,)),
+    'siguiente_codigo_pensamiento': Consulta(
+        'registraPensamientos.py', CONSULTA_SIGUIENTE_CODIGO,
+        lambda m: (f'{m.paciente}-PS', f'{m.paciente}-PT')),
+    'dimensiones_del_dia': Consulta('registroDimensionesbu.py', """
+        SELECT cantidad, duracion, intensidad
+        FROM dimensiones
+        WHERE pensamiento_id = (SELECT id FROM pensamientos WHERE codigo = ?)
+        AND fecha = ?
+        ORDER BY id DESC
+    """, lambda m: (m.pensamiento, m.hasta)),
+    'resumen_periodo': Consulta(
+        'motor_estadisticas.py (ventanas de estadísticas)',
+        CONSULTA_PERIODO, lambda m: (m.paciente, m.desde, m.hasta)),
+    'serie_diaria': Consulta(
+        'motor_estadisticas.py (ventanas de estadísticas)',
+        CONSULTA_SERIE, lambda m: (m.pensamiento, m.desde, m.hasta)),
+    'series_por_mes': Consulta(
+        'motor_estadisticas.py (estadisticas-fusionado.py)',
+        CONSULTA_AGRUPADA.format(periodo=RESOLUCIONES['mes'][0]),
+        lambda m: (m.paciente, m.desde, m.hasta)),
+    'series_clinica_por_dia': Consulta(
+        'motor_estadisticas.py (deteccion.py)',
+        CONSULTA_AGRUPADA_CLINICA.format(periodo=RESOLUCIONES['dia'][0]),
+        lambda m: (m.desde, m.hasta), pesada=True),
+    'histograma_paciente': Consulta(
+        'distribuciones.py', CONSULTA_PACIENTE,
+        lambda m: (m.paciente, 'duracion', m.desde, m.hasta)),
+    'histograma_meses': Consulta(
+        'distribuciones.py', CONSULTA_MESES, lambda m: ('duracion', m.desde[:7], m.hasta[:7])),
+    'histograma_dias': Consulta(
+        'distribuciones.py', CONSULTA_DIAS, lambda m: ('duracion', m.desde, m.hasta)),
+    'resumen_con_pensamientos_vacios': Consulta('estadisticas-fusionado.py', """
+        SELECT p.codigo, p.pensamiento,
+               IFNULL(SUM(r.registros), 0) as total_registros,
+               SUM(r.cantidad) as total_cantidad,
+               SUM(r.duracion) as total_duracion,
+               SUM(r.suma_intensidad) * 1.0 / NULLIF(SUM(r.registros_intensidad), 0) as promedio_intensidad,
+               MAX(r.max_cantidad) as max_cantidad,
+               MAX(r.max_duracion) as max_duracion,
+               COUNT(r.fecha) as dias_registrados
+        FROM pensamientos p
+        LEFT JOIN dimensiones_diarias r ON r.pensamiento_id = p.id
+            AND r.fecha BETWEEN ? AND ?
+        WHERE p.paciente_id = (SELECT id FROM pacientes WHERE codigo = ?)
+        GROUP BY p.codigo, p.pensamiento
+        ORDER BY total_cantidad DESC
+    """, lambda m: (m.desde, m.hasta, m.paciente)),
+    'registros_paciente': Consulta(
+        'motor_estadisticas.py (psicologia-stats.py)',
+        CONSULTA_REGISTROS, lambda m: (m.paciente, m.desde, m.hasta)),
+    'textos_pensamientos': Consulta(
+        'motor_estadisticas.py (estadisticasfecha.py, psicologia-stats.py)',
+        CONSULTA_PENSAMIENTOS, lambda m: (m.paciente,)),
+    'exportar_general': Consulta('db-excel-export.py', """
+        SELECT pac.codigo, pac.nombre, pac.fecha_nacimiento, pac.sexo,
+               pac.enfermedad, pac.observaciones, pac.fecha_registro,
+               pen.codigo, pen.pensamiento, pen.fecha_registro,
+               dim.fecha, dim.cantidad, dim.duracion, dim.intensidad
+        FROM pacientes pac
+        LEFT JOIN pensamientos pen ON pac.id = pen.paciente_id
+        LEFT JOIN dimensiones dim ON pen.id = dim.pensamiento_id
+        ORDER BY pac.codigo, pen.codigo, dim.fecha
+    """, lambda m: (), pesada=True),
+    'exportar_dimensiones': Consulta(
+        'db-excel-export.py', 'SELECT * FROM dimensiones', lambda m: (), pesada=True),
+    'volcar_dimensiones': Consulta('data/db-extractor.py', """
+        SELECT d.id, p.codigo as pensamiento_codigo,
+               d.fecha, d.cantidad, d.duracion, d.intensidad
+        FROM dimensiones d
+        JOIN pensamientos p ON d.pensamiento_id = p.id
+        ORDER BY d.fecha, p.codigo
+    """, lambda m: (), pesada=True),
+}
+
+
+def muestras(conn: sqlite3.Connection, cantidad: int, dias: int = 30,
+             semilla: Optional[int] = None) -> List[Muestra]:
+    """Elige pensamientos con registros y un periodo de `dias` que los contiene."""
+    azar = random.Random(semilla)
+    maximo = conn.execute('SELECT MAX(id) FROM dimensiones').fetchone()[0] or 0
+    elegidas = []
+    while len(elegidas) < cantidad and maximo:
+        fila = conn.execute("""
+            SELECT pa.codigo, p.codigo, d.fecha
+            FROM dimensiones d
+            JOIN pensamientos p ON d.pensamiento_id = p.id
+            JOIN pacientes pa ON p.paciente_id = pa.id
+            WHERE d.id >= ?
+            ORDER BY d.id
+            LIMIT 1
+        """, (azar.randint(1, maximo),)).fetchone()
+        if fila is None:
+            continue
+        hasta = date.fromisoformat(fila[2])
+        elegidas.append(Muestra(fila[0], fila[1],
+                                (hasta - timedelta(days=dias - 1)).isoformat(),
+                                hasta.isoformat()))
+    return elegidas
+
+
+def medir(conn: sqlite3.Connection, nombre: str, consulta: Consulta,
+          lista: List[Muestra], repeticiones: int) -> Resultado:
+    """Ejecuta la consulta leyendo todas sus filas y resume las latencias."""
+    tiempos = []
+    filas = 0
+    for i in range(repeticiones):
+        parametros = consulta.parametros(lista[i % len(lista)])
+        inicio = time.perf_counter()
+        cursor = conn.execute(consulta.sql, parametros)
+        filas = 0
+        while True:
+            bloque = cursor.fetchmany(1000)
+            if not bloque:
+                break
+            filas += len(bloque)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    p95 = statistics.quantiles(tiempos, n=20, method='inclusive')[18] \
+        if len(tiempos) > 1 else tiempos[0]
+    return Resultado(nombre, consulta.origen, repeticiones, filas,
+                     statistics.median(tiempos), p95, tiempos[-1])
+
+
+def medir_todas(conn: sqlite3.Connection, repeticiones: int = 50,
+                repeticiones_pesadas: int = 3, dias: int = 30,
+                semilla: Optional[int] = None, incluir_pesadas: bool = True
+                ) -> List[Resultado]:
+    """Mide cada consulta registrada con muestras aleatorias de la base."""
+    lista = muestras(conn, max(repeticiones, 1), dias, semilla)
+    if not lista:
+        raise ValueError('La base no tiene dimensiones con las que medir')
+    resultados = []
+    for nombre, consulta in CONSULTAS.items():
+        if consulta.pesada and not incluir_pesadas:
+            continue
+        veces = repeticiones_pesadas if consulta.pesada else repeticiones
+        resultados.append(medir(conn, nombre, consulta, lista, veces))
+    return resultados
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Mide la latencia de las consultas de la aplicación')
+    parser.add_argument('--db', default=RUTA_DB, help='ruta de la base de datos')
+    parser.add_argument('--repeticiones', type=int, default=50)
+    parser.add_argument('--repeticiones-pesadas', type=int, default=3,
+                        help='repeticiones de las consultas de exportación')
+    parser.add_argument('--dias', type=int, default=30, help='días de cada periodo consultado')
+    parser.add_argument('--semilla', type=int, default=None)
+    parser.add_argument('--sin-pesadas', action='store_true',
+                        help='omitir las consultas que recorren tablas completas')
+    parser.add_argument('--json', help='guardar los resultados en este fichero')
+    args = parser.parse_args()
+
+    with obtener_servicio(args.db).conexion() as conn:
+        resultados = medir_todas(conn, args.repeticiones, args.repeticiones_pesadas,
+                                 args.dias, args.semilla, not args.sin_pesadas)
+
+    print(f"{'consulta':34} {'filas':>9} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    for r in resultados:
+        print(f'{r.nombre:34} {r.filas:>9} {r.p50_ms:>9.2f} {r.p95_ms:>9.2f} {r.max_ms:>9.2f}')
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump([asdict(r) for r in resultados], f, ensure_ascii=False, indent=2)
@@ -0,0 +1,326 @@
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from esquema import preparar_esquema, reconstruir_histogramas, reconstruir_resumen_diario, transaccion
+
+
+# Filas copiadas por transacción al reconstruir una tabla
+TAMANO_LOTE = 5000
+
+TABLAS_CONTROL = (
+    """CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        nombre TEXT NOT NULL,
+        aplicada TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+    # Punto de control de las copias por lotes en curso
+    """CREATE TABLE IF NOT EXISTS migraciones_progreso (
+        version INTEGER PRIMARY KEY,
+        ultimo_id INTEGER NOT NULL,
+        copiadas INTEGER NOT NULL
+    )""",
+)
+
+Progreso = Callable[[int, int], None]
+
+
+class SentenciasSQL:
+    """Paso de migración formado por sentencias que se aplican de una vez."""
+    def __init__(self, *sentencias: str):
+        self.sentencias = sentencias
+
+    def estimar(self, conn: sqlite3.Connection) -> int:
+        """Filas que el paso tendrá que procesar."""
+        return 0
+
+    def simular(self, conn: sqlite3.Connection, version: int, tamano_lote: int) -> float:
+        """Segundos estimados por fila procesada."""
+        return 0.0
+
+    def ejecutar(self, conn: sqlite3.Connection, version: int, tamano_lote: int,
+                 progreso: Optional[Progreso] = None):
+        """No hay trabajo previo: todo ocurre al finalizar."""
+
+    def finalizar(self, conn: sqlite3.Connection, version: int):
+        """Aplica las sentencias dentro de la transacción de la migración."""
+        for sentencia in self.sentencias:
+            conn.execute(sentencia)
+
+
+@dataclass
+class ReconstruirTabla:
+    """Paso que recrea una tabla con otra definición copiando por lotes.
+
+    La copia avanza por id en transacciones cortas y guarda un punto de
+    control tras cada lote, de modo que una ejecución interrumpida continúa
+    donde se quedó. Mientras dura, unos disparadores trasladan a la copia
+    las modificaciones y borrados de filas ya copiadas.
+    """
+    tabla: str
+    definicion: str                  # CREATE TABLE {tabla} (...)
+    columnas: Sequence[str]
+    expresiones: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def nueva(self) -> str:
+        return f'{self.tabla}_nueva'
+
+    def _seleccion(self) -> str:
+        """Columnas de origen con las transformaciones de la migración."""
+        return ', '.join(self.expresiones.get(c, c) for c in self.columnas)
+
+    def _insertar_rango(self, conn: sqlite3.Connection, desde: int, hasta: int) -> int:
+        """Copia a la tabla nueva las filas con id en (desde, hasta]."""
+        return conn.execute(f"""
+            INSERT INTO {self.nueva} ({', '.join(self.columnas)})
+            SELECT {self._seleccion()} FROM {self.tabla}
+            WHERE id > ? AND id <= ?
+        """, (desde, hasta)).rowcount
+
+    def _copiar_lote(self, conn: sqlite3.Connection, desde: int,
+                     tamano_lote: int) -> Tuple[int, int]:
+        """Copia el siguiente lote y devuelve (filas, último id copiado)."""
+        hasta = conn.execute(f"""
+            SELECT MAX(id) FROM (
+                SELECT id FROM {self.tabla} WHERE id > ? ORDER BY id LIMIT ?)
+        """, (desde, tamano_lote)).fetchone()[0]
+        if hasta is None:
+            return 0, desde
+        return self._insertar_rango(conn, desde, hasta), hasta
+
+    def _disparadores(self, version: int) -> Tuple[str, ...]:
+        """Disparadores que mantienen la copia al día durante la migración."""
+        return (
+            f"""CREATE TRIGGER IF NOT EXISTS trg_{self.nueva}_update
+                AFTER UPDATE ON {self.tabla}
+                BEGIN
+                    DELETE FROM {self.nueva} WHERE id = OLD.id;
+                    INSERT INTO {self.nueva} ({', '.join(self.columnas)})
+                    SELECT {self._seleccion()} FROM {self.tabla}
+                    WHERE id = NEW.id
+                    AND id <= (SELECT ultimo_id FROM migraciones_progreso
+                               WHERE version = {version});
+                END""",
+            f"""CREATE TRIGGER IF NOT EXISTS trg_{self.nueva}_delete
+                AFTER DELETE ON {self.tabla}
+                BEGIN
+                    DELETE FROM {self.nueva} WHERE id = OLD.id;
+                END""",
+        )
+
+    def estimar(self, conn: sqlite3.Connection) -> int:
+        """Filas que el paso tendrá que copiar."""
+        return conn.execute(f'SELECT COUNT(*) FROM {self.tabla}').fetchone()[0]
+
+    def simular(self, conn: sqlite3.Connection, version: int, tamano_lote: int) -> float:
+        """Copia un lote dentro de una transacción descartada y mide su coste."""
+        conn.execute('BEGIN')
+        try:
+            conn.execute(self.definicion.format(tabla=f'{self.nueva}_simulada'))
+            inicio = time.perf_counter()
+            hasta = conn.execute(f"""
+                SELECT MAX(id) FROM (
+                    SELECT id FROM {self.tabla} ORDER BY id LIMIT ?)
+            """, (tamano_lote,)).fetchone()[0] or 0
+            filas = conn.execute(f"""
+                INSERT INTO {self.nueva}_simulada ({', '.join(self.columnas)})
+                SELECT {self._seleccion()} FROM {self.tabla}
+                WHERE id <= ?
+            """, (hasta,)).rowcount
+            segundos = time.perf_counter() - inicio
+        finally:
+            conn.rollback()
+        return segundos / filas if filas else 0.0
+
+    def ejecutar(self, conn: sqlite3.Connection, version: int, tamano_lote: int,
+                 progreso: Optional[Progreso] = None):
+        """Copia la tabla por lotes reanudando desde el último punto de control."""
+        estado = conn.execute(
+            'SELECT ultimo_id, copiadas FROM migraciones_progreso WHERE version = ?',
+            (version,)).fetchone()
+        if estado is None:
+            with transaccion(conn, inmediata=True):
+                conn.execute(f'DROP TABLE IF EXISTS {self.nueva}')
+                conn.execute(self.definicion.format(tabla=self.nueva))
+                for disparador in self._disparadores(version):
+                    conn.execute(disparador)
+                conn.execute('INSERT INTO migraciones_progreso VALUES (?, 0, 0)', (version,))
+            ultimo_id, copiadas = 0, 0
+        else:
+            ultimo_id, copiadas = estado
+        total = self.estimar(conn)
+        while True:
+            with transaccion(conn, inmediata=True):
+                filas, ultimo_id = self._copiar_lote(conn, ultimo_id, tamano_lote)
+                if not filas:
+                    break
+                copiadas += filas
+                conn.execute("""
+                    UPDATE migraciones_progreso SET ultimo_id = ?, copiadas = ?
+                    WHERE version = ?
+                """, (ultimo_id, copiadas, version))
+            if progreso:
+                progreso(copiadas, total)
+
+    def finalizar(self, conn: sqlite3.Connection, version: int):
+        """Copia el resto y sustituye la tabla original por la nueva."""
+        ultimo_id = conn.execute(
+            'SELECT ultimo_id FROM migraciones_progreso WHERE version = ?',
+            (version,)).fetchone()[0]
+        maximo = conn.execute(f'SELECT MAX(id) FROM {self.tabla}').fetchone()[0]
+        if maximo is not None and maximo > ultimo_id:
+            self._insertar_rango(conn, ultimo_id, maximo)
+        conn.execute(f'DROP TRIGGER IF EXISTS trg_{self.nueva}_update')
+        conn.execute(f'DROP TRIGGER IF EXISTS trg_{self.nueva}_delete')
+        conn.execute(f'DROP TABLE {self.tabla}')
+        # Los disparadores de otras tablas que nombran la original (los de
+        # pensamientos recalculan desde dimensiones) impiden el renombrado
+        # moderno mientras no existe; el antiguo no revisa sus cuerpos y
+        # vuelven a apuntar a la tabla nueva con el mismo nombre
+        conn.execute('PRAGMA legacy_alter_table = ON')
+        try:
+            conn.execute(f'ALTER TABLE {self.nueva} RENAME TO {self.tabla}')
+        finally:
+            conn.execute('PRAGMA legacy_alter_table = OFF')
+        conn.execute('DELETE FROM migraciones_progreso WHERE version = ?', (version,))
+
+
+@dataclass
+class Migracion:
+    version: int
+    nombre: str
+    paso: Union[SentenciasSQL, ReconstruirTabla]
+
+
+COLUMNAS_DIMENSIONES = ('id', 'pensamiento_id', 'fecha', 'cantidad', 'duracion', 'intensidad')
+
+# Migraciones en orden de versión; nunca se modifica una ya publicada
+MIGRACIONES: List[Migracion] = [
+    Migracion(1, 'esquema_inicial', SentenciasSQL(
+        """CREATE TABLE IF NOT EXISTS pacientes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            codigo TEXT UNIQUE CHECK(codigo LIKE 'P%' AND length(codigo) = 4),
+            nombre TEXT NOT NULL,
+            fecha_nacimiento DATE NOT NULL,
+            sexo TEXT CHECK(sexo IN ('F', 'M')),
+            enfermedad TEXT,
+            observaciones TEXT,
+            fecha_registro DATE DEFAULT CURRENT_DATE
+        )""",
+        """CREATE TABLE IF NOT EXISTS pensamientos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            codigo TEXT UNIQUE CHECK(codigo LIKE 'P___-PS%'),
+            paciente_id INTEGER,
+            pensamiento TEXT NOT NULL,
+            fecha_registro DATE DEFAULT CURRENT_DATE,
+            FOREIGN KEY (paciente_id) REFERENCES pacientes (id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS dimensiones (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pensamiento_id INTEGER,
+            fecha DATE DEFAULT CURRENT_DATE,
+            cantidad INTEGER CHECK(cantidad BETWEEN 0 AND 10),
+            duracion INTEGER CHECK(duracion BETWEEN 0 AND 120),
+            intensidad INTEGER CHECK(intensidad BETWEEN 0 AND 10),
+            FOREIGN KEY (pensamiento_id) REFERENCES pensamientos (id)
+        )""",
+    )),
+    # Antes src/db/db_modificaciones.py: la duración pasa a un máximo de 60
+    # minutos, igual que valida la ventana de registro de dimensiones
+    Migracion(2, 'duracion_maxima_60', ReconstruirTabla(
+        tabla='dimensiones',
+        definicion="""CREATE TABLE {tabla} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pensamiento_id INTEGER,
+            fecha DATE DEFAULT CURRENT_DATE,
+            cantidad INTEGER CHECK(cantidad BETWEEN 0 AND 10),
+            duracion INTEGER CHECK(duracion BETWEEN 0 AND 60),
+            intensidad INTEGER CHECK(intensidad BETWEEN 0 AND 10),
+            FOREIGN KEY (pensamiento_id) REFERENCES pensamientos (id)
+        )""",
+        columnas=COLUMNAS_DIMENSIONES,
+        expresiones={'duracion': 'CASE WHEN duracion > 60 THEN 60 ELSE duracion END'},
+    )),
+]
+
+
+def asegurar_tablas_control(conn: sqlite3.Connection):
+    """Crea las tablas de control de versiones si no existen."""
+    with transaccion(conn):
+        for sentencia in TABLAS_CONTROL:
+            conn.execute(sentencia)
+
+
+def version_actual(conn: sqlite3.Connection) -> int:
+    """Última versión de esquema aplicada."""
+    asegurar_tablas_control(conn)
+    return conn.execute('SELECT IFNULL(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+
+def pendientes(conn: sqlite3.Connection) -> List[Migracion]:
+    """Migraciones posteriores a la versión actual, en orden."""
+    actual = version_actual(conn)
+    return sorted((m for m in MIGRACIONES if m.version > actual), key=lambda m: m.version)
+
+
+def simular_pendientes(conn: sqlite3.Connection,
+                       tamano_lote: int = TAMANO_LOTE) -> List[Tuple[Migracion, int, float]]:
+    """Estima filas y segundos de cada migración pendiente sin aplicarla."""
+    estimaciones = []
+    for migracion in pendientes(conn):
+        filas = migracion.paso.estimar(conn)
+        por_fila = migracion.paso.simular(conn, migracion.version, tamano_lote)
+        estimaciones.append((migracion, filas, filas * por_fila))
+    return estimaciones
+
+
+def aplicar_pendientes(conn: sqlite3.Connection, tamano_lote: int = TAMANO_LOTE,
+                       progreso: Optional[Callable[[Migracion, int, int], None]] = None
+                       ) -> List[int]:
+    """Aplica en orden las migraciones pendientes y devuelve sus versiones."""
+    aplicadas = []
+    for migracion in pendientes(conn):
+        aviso = (lambda copiadas, total, m=migracion: progreso(m, copiadas, total)) \
+            if progreso else None
+        migracion.paso.ejecutar(conn, migracion.version, tamano_lote, aviso)
+        with transaccion(conn, inmediata=True):
+            migracion.paso.finalizar(conn, migracion.version)
+            conn.execute('INSERT INTO schema_version (version, nombre) VALUES (?, ?)',
+                         (migracion.version, migracion.nombre))
+            # Recrear una tabla elimina sus índices y disparadores, y la copia
+            # no pasa por ellos: los resúmenes se recalculan con los datos nuevos
+            preparar_esquema(conn)
+            reconstruir_resumen_diario(conn)
+            reconstruir_histogramas(conn)
+        aplicadas.append(migracion.version)
+    return aplicadas
+
+
+if __name__ == '__main__':
+    import argparse
+    from servicio_bd import RUTA_DB, obtener_servicio
+
+    parser = argparse.ArgumentParser(description='Migraciones del esquema de la clínica')
+    parser.add_argument('accion', nargs='?', default='estado',
+                        choices=['estado', 'simular', 'aplicar'])
+    parser.add_argument('--db', default=RUTA_DB, help='ruta de la base de datos')
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE,
+                        help='filas copiadas por transacción')
+    args = parser.parse_args()
+
+    with obtener_servicio(args.db).conexion() as conn:
+        if args.accion == 'estado':
+            print(f'Versión actual: {version_actual(conn)}')
+            for migracion in pendientes(conn):
+                print(f'Pendiente: {migracion.version:04d} {migracion.nombre}')
+        elif args.accion == 'simular':
+            for migracion, filas, segundos in simular_pendientes(conn, args.lote):
+                print(f'{migracion.version:04d} {migracion.nombre}: '
+                      f'{filas} filas, ~{segundos:.1f} s')
+        else:
+            def mostrar(migracion, copiadas, total):
+                print(f'{migracion.version:04d} {migracion.nombre}: {copiadas}/{total}')
+            for version in aplicar_pendientes(conn, args.lote, mostrar):
+                print(f'Aplicada la versión {version}')
@@ -0,0 +1,716 @@
+from dataclasses import dataclass, fields
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+import numpy as np
+
+from bus_cambios import CambioDimension, RegistroDimension
+from servicio_bd import ServicioBD
+
+
+DIMENSIONES = ('cantidad', 'duracion', 'intensidad')
+
+Fecha = Union[str, date]
+
+# Una fila por pensamiento y día; la agregación por pensamiento se hace en NumPy
+CONSULTA_PERIODO = """
+    SELECT p.codigo, p.pensamiento, r.registros,
+           r.cantidad, r.duracion, r.suma_intensidad, r.registros_intensidad,
+           r.max_cantidad, r.max_duracion, r.fecha
+    FROM pacientes pa
+    JOIN pensamientos p ON p.paciente_id = pa.id
+    JOIN dimensiones_diarias r ON r.pensamiento_id = p.id
+    WHERE pa.codigo = ?
+    AND r.fecha BETWEEN ? AND ?
+    ORDER BY p.codigo
+"""
+
+CONSULTA_SERIE = """
+    SELECT r.fecha, r.registros, r.cantidad, r.duracion,
+           r.suma_intensidad, r.registros_intensidad
+    FROM dimensiones_diarias r
+    JOIN pensamientos p ON r.pensamiento_id = p.id
+    WHERE p.codigo = ?
+    AND r.fecha BETWEEN ? AND ?
+    ORDER BY r.fecha
+"""
+
+# Registros sueltos; el texto de cada pensamiento se lee aparte una sola vez
+CONSULTA_PENSAMIENTOS = """
+    SELECT id, codigo, pensamiento
+    FROM pensamientos
+    WHERE paciente_id = (SELECT id FROM pacientes WHERE codigo = ?)
+    ORDER BY codigo
+"""
+
+CONSULTA_REGISTROS = """
+    SELECT d.pensamiento_id, d.fecha, d.cantidad, d.duracion, d.intensidad
+    FROM pacientes pa
+    JOIN pensamientos p ON p.paciente_id = pa.id
+    JOIN dimensiones d ON d.pensamiento_id = p.id
+    WHERE pa.codigo = ? AND d.fecha BETWEEN ? AND ?
+    ORDER BY p.codigo, d.fecha
+"""
+
+# Inicio del periodo al que pertenece r.fecha y paso entre periodos en NumPy
+RESOLUCIONES = {
+    'dia': ('r.fecha', 'D', 1),
+    'semana': ("date(r.fecha, 'weekday 0', '-6 days')", 'D', 7),     # lunes
+    'mes': ("strftime('%Y-%m-01', r.fecha)", 'M', 1),
+    'trimestre': ("printf('%s-%02d-01', strftime('%Y', r.fecha), "
+                  "(strftime('%m', r.fecha) - 1) / 3 * 3 + 1)", 'M', 3),
+}
+
+# Una fila por pensamiento y periodo; {periodo} es la expresión de RESOLUCIONES
+CONSULTA_AGRUPADA = """
+    SELECT p.codigo, {periodo} AS periodo, SUM(r.registros),
+           SUM(r.cantidad), SUM(r.duracion), SUM(r.suma_intensidad),
+           SUM(r.registros_intensidad), MAX(r.max_cantidad), MAX(r.max_duracion)
+    FROM pacientes pa
+    JOIN pensamientos p ON p.paciente_id = pa.id
+    JOIN dimensiones_diarias r ON r.pensamiento_id = p.id
+    WHERE pa.codigo = ?
+    AND r.fecha BETWEEN ? AND ?
+    GROUP BY p.codigo, periodo
+"""
+
+# Igual para todos los pensamientos de la clínica (procesos nocturnos)
+CONSULTA_AGRUPADA_CLINICA = """
+    SELECT p.codigo, {periodo} AS periodo, SUM(r.registros),
+           SUM(r.cantidad), SUM(r.duracion), SUM(r.suma_intensidad),
+           SUM(r.registros_intensidad), MAX(r.max_cantidad), MAX(r.max_duracion)
+    FROM pensamientos p
+    JOIN dimensiones_diarias r ON r.pensamiento_id = p.id
+    WHERE r.fecha BETWEEN ? AND ?
+    GROUP BY p.codigo, periodo
+"""
+
+
+def _texto(fecha: Fecha) -> str:
+    return fecha if isinstance(fecha, str) else fecha.strftime('%Y-%m-%d')
+
+
+def _dividir(numerador: np.ndarray, denominador: np.ndarray) -> np.ndarray:
+    """División elemento a elemento con NaN donde el denominador es 0."""
+    resultado = np.full(len(numerador), np.nan)
+    np.divide(numerador, denominador, out=resultado, where=denominador > 0)
+    return resultado
+
+
+def _numero(valor: float) -> Optional[float]:
+    return None if np.isnan(valor) else float(valor)
+
+
+@dataclass
+class ResumenPeriodo:
+    """Agregados por pensamiento de un paciente en un periodo (un elemento por pensamiento)."""
+    codigos: np.ndarray
+    pensamientos: np.ndarray
+    registros: np.ndarray
+    dias: np.ndarray                # días con algún registro
+    cantidad: np.ndarray            # suma
+    duracion: np.ndarray            # suma, en minutos
+    intensidad: np.ndarray          # media de los registros con intensidad; NaN si no hay
+    registros_intensidad: np.ndarray
+    max_cantidad: np.ndarray        # máximo de un solo registro
+    max_duracion: np.ndarray
+    max_intensidad_diaria: np.ndarray
+    dias_periodo: int
+
+    def __len__(self) -> int:
+        return len(self.codigos)
+
+    def valores(self, dimension: str) -> np.ndarray:
+        """Valor de cada pensamiento: suma de cantidad o duración, media de intensidad."""
+        if dimension not in DIMENSIONES:
+            raise ValueError(f'Dimensión desconocida: {dimension}')
+        return np.nan_to_num(getattr(self, dimension))
+
+    def proporciones(self, dimension: str) -> np.ndarray:
+        """Parte de cada pensamiento sobre el total de la dimensión."""
+        valores = self.valores(dimension)
+        total = valores.sum()
+        return valores / total if total > 0 else np.zeros(len(valores))
+
+    def promedio_diario(self, dimension: str) -> np.ndarray:
+        """Suma de la dimensión repartida entre todos los días del periodo."""
+        return self.valores(dimension) / max(self.dias_periodo, 1)
+
+    def seleccionar(self, mascara: np.ndarray) -> 'ResumenPeriodo':
+        """Devuelve el resumen solo con los pensamientos marcados."""
+        return ResumenPeriodo(**{
+            f.name: getattr(self, f.name)[mascara] if f.name != 'dias_periodo' else self.dias_periodo
+            for f in fields(self)})
+
+    def totales(self) -> Dict[str, Any]:
+        """Cifras del paciente en el periodo sumando todos los pensamientos."""
+        con_intensidad = self.registros_intensidad > 0
+        return {
+            'registros': int(self.registros.sum()),
+            'cantidad': int(self.cantidad.sum()),
+            'duracion': int(self.duracion.sum()),
+            'intensidad': float(np.average(self.intensidad[con_intensidad],
+                                           weights=self.registros_intensidad[con_intensidad]))
+                          if con_intensidad.any() else 0.0,
+            'promedio_diario': float(self.cantidad.sum()) / max(self.dias_periodo, 1),
+            'max_cantidad': int(self.max_cantidad.max(initial=0)),
+            'max_duracion': int(self.max_duracion.max(initial=0)),
+            'dias_registrados': int(self.dias.max(initial=0)),
+        }
+
+    def como_dict(self) -> Dict[str, Dict[str, Any]]:
+        """{código: {pensamiento, cantidad, duracion, intensidad, max_*}} como usan las ventanas."""
+        intensidad = self.valores('intensidad')
+        return {
+            codigo: {
+                'pensamiento': self.pensamientos[i],
+                'cantidad': int(self.cantidad[i]),
+                'duracion': int(self.duracion[i]),
+                'intensidad': float(intensidad[i]),
+                'max_cantidad': int(self.max_cantidad[i]),
+                'max_duracion': int(self.max_duracion[i]),
+            }
+            for i, codigo in enumerate(self.codigos)}
+
+
+@dataclass
+class SerieDiaria:
+    """Valores por día de un pensamiento."""
+    fechas: np.ndarray              # datetime64[D]
+    registros: np.ndarray
+    cantidad: np.ndarray
+    duracion: np.ndarray
+    intensidad: np.ndarray          # media del día; NaN si no hay intensidad
+
+    def __len__(self) -> int:
+        return len(self.fechas)
+
+    def valores(self, dimension: str) -> np.ndarray:
+        if dimension not in DIMENSIONES:
+            raise ValueError(f'Dimensión desconocida: {dimension}')
+        return getattr(self, dimension)
+
+    def rellenar(self, desde: Fecha, hasta: Fecha) -> 'SerieDiaria':
+        """Devuelve la serie con todos los días del rango, con ceros en los vacíos."""
+        inicio = np.datetime64(_texto(desde), 'D')
+        fechas = np.arange(inicio, np.datetime64(_texto(hasta), 'D') + 1)
+        posiciones = (self.fechas - inicio).astype(int)
+        columnas = {}
+        for nombre in ('registros', 'cantidad', 'duracion', 'intensidad'):
+            columna = np.zeros(len(fechas), dtype=getattr(self, nombre).dtype)
+            columna[posiciones] = np.nan_to_num(getattr(self, nombre))
+            columnas[nombre] = columna
+        return SerieDiaria(fechas, **columnas)
+
+    def como_filas(self) -> List[Tuple[str, int, int, Optional[float]]]:
+        """[(fecha, cantidad, duracion, intensidad)] con None si no hubo intensidad."""
+        return [(str(f), int(c), int(d), _numero(i)) for f, c, d, i in
+                zip(self.fechas, self.cantidad, self.duracion, self.intensidad)]
+
+    def como_dict(self) -> Dict[str, Dict[str, float]]:
+        """{fecha: {cantidad, duracion, intensidad}} con 0 si no hubo intensidad."""
+        intensidad = np.nan_to_num(self.intensidad)
+        return {str(f): {'cantidad': int(self.cantidad[i]),
+                         'duracion': int(self.duracion[i]),
+                         'intensidad': float(intensidad[i])}
+                for i, f in enumerate(self.fechas)}
+
+
+def _resumen_vacio(dias_periodo: int) -> ResumenPeriodo:
+    vacio = np.zeros(0, dtype=np.int64)
+    return ResumenPeriodo(np.zeros(0, dtype=object), np.zeros(0, dtype=object),
+                          vacio, vacio, vacio, vacio, np.zeros(0), vacio, vacio, vacio,
+                          np.zeros(0), dias_periodo)
+
+
+def _serie_vacia() -> SerieDiaria:
+    vacio = np.zeros(0, dtype=np.int64)
+    return SerieDiaria(np.zeros(0, dtype='datetime64[D]'), vacio, vacio, vacio, np.zeros(0))
+
+
+@dataclass
+class RegistrosPaciente:
+    """Registros de dimensiones de un paciente en columnas, una fila por registro.
+
+    Las filas están ordenadas por pensamiento y fecha, así que los registros
+    de cada pensamiento forman un tramo contiguo y vista() los devuelve sin
+    copiar. El texto de cada pensamiento se guarda una sola vez en textos.
+    """
+    codigos: np.ndarray             # códigos de los pensamientos, ordenados
+    textos: np.ndarray              # texto de cada pensamiento, alineado con codigos
+    pensamiento: np.ndarray         # por fila: posición en codigos
+    fechas: np.ndarray              # datetime64[D]
+    cantidad: np.ndarray            # 0 si no se anotó
+    duracion: np.ndarray            # 0 si no se anotó
+    intensidad: np.ndarray          # NaN si no se anotó
+    inicios: np.ndarray             # fila donde empieza cada pensamiento; len(codigos) + 1
+    dias_periodo: int
+
+    def __len__(self) -> int:
+        return len(self.fechas)
+
+    def _posicion(self, codigo: str) -> int:
+        i = int(np.searchsorted(self.codigos, codigo))
+        if i == len(self.codigos) or self.codigos[i] != codigo:
+            raise KeyError(codigo)
+        return i
+
+    def texto(self, codigo: str) -> str:
+        return self.textos[self._posicion(codigo)]
+
+    def vista(self, codigo: str) -> 'RegistrosPaciente':
+        """Registros de un pensamiento como vistas de las columnas, sin copiarlas."""
+        i = self._posicion(codigo)
+        tramo = slice(self.inicios[i], self.inicios[i + 1])
+        return RegistrosPaciente(
+            self.codigos, self.textos, self.pensamiento[tramo], self.fechas[tramo],
+            self.cantidad[tramo], self.duracion[tramo], self.intensidad[tramo],
+            # Tramos vacíos para los demás pensamientos
+            np.r_[np.zeros(i + 1, dtype=np.int64),
+                  np.full(len(self.codigos) - i, tramo.stop - tramo.start)],
+            self.dias_periodo)
+
+    def _dias(self) -> np.ndarray:
+        """Primera fila de cada (pensamiento, día)."""
+        cambia = (self.fechas[1:] != self.fechas[:-1]) | (self.pensamiento[1:] != self.pensamiento[:-1])
+        return np.flatnonzero(np.r_[True, cambia])
+
+    def resumen(self) -> ResumenPeriodo:
+        """Agregados por pensamiento de los pensamientos con algún registro."""
+        if not len(self):
+            return _resumen_vacio(self.dias_periodo)
+        con_filas = np.flatnonzero(np.diff(self.inicios) > 0)
+        inicios = self.inicios[con_filas]
+        dias = self._dias()
+        dia_inicial = np.searchsorted(dias, inicios)
+        con_intensidad = ~np.isnan(self.intensidad)
+        suma_intensidad = np.nan_to_num(self.intensidad).astype(float)
+        sumar = lambda columna, tramos=inicios: np.add.reduceat(columna, tramos, dtype=np.int64)
+        registros_intensidad = sumar(con_intensidad)
+        media_dia = _dividir(np.add.reduceat(suma_intensidad, dias), sumar(con_intensidad, dias))
+        return ResumenPeriodo(
+            codigos=self.codigos[con_filas],
+            pensamientos=self.textos[con_filas],
+            registros=np.diff(np.r_[inicios, len(self)]),
+            dias=np.diff(np.r_[dia_inicial, len(dias)]),
+            cantidad=sumar(self.cantidad),
+            duracion=sumar(self.duracion),
+            intensidad=_dividir(np.add.reduceat(suma_intensidad, inicios), registros_intensidad),
+            registros_intensidad=registros_intensidad,
+            max_cantidad=np.maximum.reduceat(self.cantidad, inicios).astype(np.int64),
+            max_duracion=np.maximum.reduceat(self.duracion, inicios).astype(np.int64),
+            max_intensidad_diaria=np.fmax.reduceat(media_dia, dia_inicial),
+            dias_periodo=self.dias_periodo)
+
+    def serie(self, codigo: str) -> SerieDiaria:
+        """Serie por día de un pensamiento calculada sin volver a la base."""
+        vista = self.vista(codigo)
+        if not len(vista):
+            return _serie_vacia()
+        dias = vista._dias()
+        sumar = lambda columna: np.add.reduceat(columna, dias, dtype=np.int64)
+        return SerieDiaria(
+            fechas=vista.fechas[dias],
+            registros=np.diff(np.r_[dias, len(vista)]),
+            cantidad=sumar(vista.cantidad),
+            duracion=sumar(vista.duracion),
+            intensidad=_dividir(np.add.reduceat(np.nan_to_num(vista.intensidad).astype(float), dias),
+                                sumar(~np.isnan(vista.intensidad))))
+
+    def como_columnas(self) -> Dict[str, np.ndarray]:
+        """Columnas por registro, con código y texto del pensamiento, para exportar."""
+        return {
+            'codigo': self.codigos[self.pensamiento],
+            'pensamiento': self.textos[self.pensamiento],
+            'fecha': self.fechas.astype(str),
+            'cantidad': self.cantidad,
+            'duracion': self.duracion,
+            'intensidad': self.intensidad,
+        }
+
+
+def registros_paciente(servicio: ServicioBD, codigo_paciente: str,
+                       desde: Fecha, hasta: Fecha) -> RegistrosPaciente:
+    """Lee en columnas todos los registros de un paciente entre dos fechas."""
+    desde, hasta = _texto(desde), _texto(hasta)
+    pensamientos = servicio.consultar_cacheado(CONSULTA_PENSAMIENTOS, (codigo_paciente,))
+    filas = servicio.consultar_cacheado(CONSULTA_REGISTROS, (codigo_paciente, desde, hasta))
+    dias_periodo = int((np.datetime64(hasta, 'D') - np.datetime64(desde, 'D')).astype(int)) + 1
+
+    ids = np.array([p[0] for p in pensamientos], dtype=np.int64)
+    codigos = np.array([p[1] for p in pensamientos], dtype=object)
+    textos = np.array([p[2] for p in pensamientos], dtype=object)
+    if filas:
+        pensamiento_id, fechas, cantidad, duracion, intensidad = zip(*filas)
+        # ids no está ordenado por id: se busca sobre una copia ordenada
+        orden = np.argsort(ids)
+        posicion = orden[np.searchsorted(ids, pensamiento_id, sorter=orden)].astype(np.int32)
+        fechas = np.array(fechas, dtype='datetime64[D]')
+        cantidad, duracion, intensidad = (np.array(c, dtype=float) for c in (cantidad, duracion, intensidad))
+        cantidad = np.nan_to_num(cantidad).astype(np.int32)
+        duracion = np.nan_to_num(duracion).astype(np.int32)
+        intensidad = intensidad.astype(np.float32)
+    else:
+        posicion = np.zeros(0, dtype=np.int32)
+        fechas = np.zeros(0, dtype='datetime64[D]')
+        cantidad = duracion = np.zeros(0, dtype=np.int32)
+        intensidad = np.zeros(0, dtype=np.float32)
+    inicios = np.searchsorted(posicion, np.arange(len(codigos) + 1))
+    return RegistrosPaciente(codigos, textos, posicion, fechas, cantidad, duracion,
+                             intensidad, inicios, dias_periodo)
+
+
+def resumen_periodo(servicio: ServicioBD, codigo_paciente: str,
+                    desde: Fecha, hasta: Fecha) -> ResumenPeriodo:
+    """Agrega por pensamiento los registros de un paciente entre dos fechas."""
+    desde, hasta = _texto(desde), _texto(hasta)
+    filas = servicio.consultar_cacheado(CONSULTA_PERIODO, (codigo_paciente, desde, hasta))
+    dias_periodo = int((np.datetime64(hasta, 'D') - np.datetime64(desde, 'D')).astype(int)) + 1
+    if not filas:
+        return _resumen_vacio(dias_periodo)
+
+    codigos, pensamientos, *numericas, _ = zip(*filas)
+    registros, cantidad, duracion, suma_int, registros_int, max_cantidad, max_duracion = (
+        np.array(c, dtype=np.int64) for c in numericas)
+    codigos = np.array(codigos, dtype=object)
+    # Las filas llegan ordenadas por código: cada pensamiento es un tramo contiguo
+    inicios = np.flatnonzero(np.r_[True, codigos[1:] != codigos[:-1]])
+    sumar = lambda columna: np.add.reduceat(columna, inicios)
+    maximo = lambda columna: np.maximum.reduceat(columna, inicios)
+    registros_int_pensamiento = sumar(registros_int)
+    return ResumenPeriodo(
+        codigos=codigos[inicios],
+        pensamientos=np.array(pensamientos, dtype=object)[inicios],
+        registros=sumar(registros),
+        dias=np.diff(np.r_[inicios, len(codigos)]),
+        cantidad=sumar(cantidad),
+        duracion=sumar(duracion),
+        intensidad=_dividir(sumar(suma_int), registros_int_pensamiento),
+        registros_intensidad=registros_int_pensamiento,
+        max_cantidad=maximo(max_cantidad),
+        max_duracion=maximo(max_duracion),
+        max_intensidad_diaria=np.fmax.reduceat(_dividir(suma_int, registros_int), inicios),
+        dias_periodo=dias_periodo)
+
+
+def serie_diaria(servicio: ServicioBD, codigo_pensamiento: str,
+                 desde: Fecha, hasta: Fecha, rellenar: bool = False) -> SerieDiaria:
+    """Serie por día de un pensamiento; con rellenar=True incluye los días sin registros."""
+    desde, hasta = _texto(desde), _texto(hasta)
+    filas = servicio.consultar_cacheado(CONSULTA_SERIE, (codigo_pensamiento, desde, hasta))
+    if filas:
+        fechas, *numericas = zip(*filas)
+        registros, cantidad, duracion, suma_int, registros_int = (
+            np.array(c, dtype=np.int64) for c in numericas)
+        serie = SerieDiaria(np.array(fechas, dtype='datetime64[D]'), registros,
+                            cantidad, duracion, _dividir(suma_int, registros_int))
+    else:
+        serie = _serie_vacia()
+    return serie.rellenar(desde, hasta) if rellenar else serie
+
+
+def inicios_periodo(desde: Fecha, hasta: Fecha, resolucion: str) -> np.ndarray:
+    """Primer día de cada periodo de la resolución que toca el rango, sin huecos."""
+    if resolucion not in RESOLUCIONES:
+        raise ValueError(f'Resolución desconocida: {resolucion}')
+    _, unidad, paso = RESOLUCIONES[resolucion]
+    desde = np.datetime64(_texto(desde), 'D')
+    hasta = np.datetime64(_texto(hasta), 'D')
+    if unidad == 'D':
+        # El 1970-01-01 fue jueves: (días + 3) % 7 cuenta desde el lunes
+        inicio = desde - (desde.astype(np.int64) + 3) % 7 if paso == 7 else desde
+        return np.arange(inicio, hasta + 1, paso)
+    mes = desde.astype('datetime64[M]')
+    inicio = mes - mes.astype(np.int64) % paso
+    return np.arange(inicio, hasta.astype('datetime64[M]') + 1, paso).astype('datetime64[D]')
+
+
+@dataclass
+class SeriesAgrupadas:
+    """Series de todos los pensamientos de un paciente alineadas por periodo.
+
+    Cada matriz tiene una fila por pensamiento y una columna por periodo;
+    los periodos sin registros quedan a 0 (NaN en intensidad).
+    """
+    resolucion: str
+    periodos: np.ndarray            # datetime64[D], inicio de cada periodo
+    codigos: np.ndarray
+    registros: np.ndarray
+    cantidad: np.ndarray
+    duracion: np.ndarray
+    intensidad: np.ndarray          # media de los registros con intensidad
+    registros_intensidad: np.ndarray
+    max_cantidad: np.ndarray
+    max_duracion: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.codigos)
+
+    def valores(self, dimension: str) -> np.ndarray:
+        if dimension not in DIMENSIONES:
+            raise ValueError(f'Dimensión desconocida: {dimension}')
+        return getattr(self, dimension)
+
+    def serie(self, codigo: str) -> SerieDiaria:
+        """Fila de un pensamiento como SerieDiaria; fechas son los inicios de periodo."""
+        i = np.flatnonzero(self.codigos == codigo)
+        if not len(i):
+            vacio = np.zeros(len(self.periodos), dtype=np.int64)
+            return SerieDiaria(self.periodos, vacio, vacio, vacio, np.full(len(self.periodos), np.nan))
+        i = i[0]
+        return SerieDiaria(self.periodos, self.registros[i], self.cantidad[i],
+                           self.duracion[i], self.intensidad[i])
+
+    def totales(self) -> SerieDiaria:
+        """Suma de todos los pensamientos por periodo."""
+        suma_intensidad = np.nansum(self.intensidad * self.registros_intensidad, axis=0)
+        return SerieDiaria(self.periodos, self.registros.sum(axis=0), self.cantidad.sum(axis=0),
+                           self.duracion.sum(axis=0),
+                           _dividir(suma_intensidad, self.registros_intensidad.sum(axis=0)))
+
+
+def series_periodo(servicio: ServicioBD, codigo_paciente: str, desde: Fecha, hasta: Fecha,
+                   resolucion: str = 'dia') -> SeriesAgrupadas:
+    """Agrupa por periodo los registros de todos los pensamientos con una sola consulta."""
+    periodos = inicios_periodo(desde, hasta, resolucion)
+    sql = CONSULTA_AGRUPADA.format(periodo=RESOLUCIONES[resolucion][0])
+    filas = servicio.consultar_cacheado(sql, (codigo_paciente, _texto(desde), _texto(hasta)))
+    return _agrupar(filas, periodos, resolucion)
+
+
+def series_clinica(servicio: ServicioBD, desde: Fecha, hasta: Fecha,
+                   resolucion: str = 'dia') -> SeriesAgrupadas:
+    """Como series_periodo, pero con todos los pensamientos de todos los pacientes."""
+    periodos = inicios_periodo(desde, hasta, resolucion)
+    sql = CONSULTA_AGRUPADA_CLINICA.format(periodo=RESOLUCIONES[resolucion][0])
+    return _agrupar(servicio.consultar(sql, (_texto(desde), _texto(hasta))), periodos, resolucion)
+
+
+def _agrupar(filas: List[tuple], periodos: np.ndarray, resolucion: str) -> SeriesAgrupadas:
+    """Coloca las filas (código, periodo, totales...) en matrices pensamiento × periodo."""
+    if filas:
+        codigos_fila, etiquetas, *numericas = zip(*filas)
+    else:
+        codigos_fila, etiquetas, numericas = (), (), [()] * 7
+    codigos, fila = np.unique(np.array(codigos_fila, dtype=object), return_inverse=True)
+    columna = np.searchsorted(periodos, np.array(etiquetas, dtype='datetime64[D]'))
+    forma = (len(codigos), len(periodos))
+
+    matrices = []
+    for valores in numericas:
+        matriz = np.zeros(forma, dtype=np.int64)
+        matriz[fila, columna] = valores
+        matrices.append(matriz)
+    registros, cantidad, duracion, suma_int, registros_int, max_cantidad, max_duracion = matrices
+    intensidad = _dividir(suma_int.ravel(), registros_int.ravel()).reshape(forma)
+    return SeriesAgrupadas(resolucion, periodos, codigos, registros, cantidad, duracion,
+                           intensidad, registros_int, max_cantidad, max_duracion)
+
+
+@dataclass
+class AgregadoDiario:
+    """Totales de un pensamiento en un día, como en dimensiones_diarias."""
+    registros: int = 0
+    cantidad: int = 0
+    duracion: int = 0
+    suma_intensidad: int = 0
+    registros_intensidad: int = 0
+    max_cantidad: int = 0
+    max_duracion: int = 0
+
+    def media_intensidad(self) -> float:
+        return self.suma_intensidad / self.registros_intensidad if self.registros_intensidad else np.nan
+
+
+class AgregadosPeriodo:
+    """Resumen de un paciente en un periodo que se mantiene al día sin volver a la base.
+
+    Guarda el ResumenPeriodo y los totales por pensamiento y día de los que
+    sale. aplicar() suma o resta cada fila cambiada en tiempo constante; solo
+    cuando se borra el máximo de un día que conserva otras filas no hay
+    forma de saber el nuevo máximo y se marca requiere_recarga.
+    """
+    def __init__(self, codigo_paciente: str, desde: Fecha, hasta: Fecha,
+                 resumen: ResumenPeriodo, dias: Dict[str, Dict[str, AgregadoDiario]],
+                 textos: Dict[str, str]):
+        self.paciente = codigo_paciente
+        self.desde, self.hasta = _texto(desde), _texto(hasta)
+        self.resumen = resumen
+        self.dias = dias
+        self.textos = textos
+        self.requiere_recarga = False
+        self._suma_intensidad = np.rint(np.nan_to_num(resumen.intensidad)
+                                        * resumen.registros_intensidad).astype(np.int64)
+        self._indexar()
+
+    def _indexar(self):
+        self._posicion = {codigo: i for i, codigo in enumerate(self.resumen.codigos)}
+
+    def afecta(self, registro: RegistroDimension) -> bool:
+        return registro.paciente == self.paciente and self.desde <= registro.fecha <= self.hasta
+
+    def aplicar(self, cambios: Iterable[CambioDimension]) -> Set[str]:
+        """Aplica los cambios que caen en el periodo y devuelve los pensamientos afectados."""
+        afectados = set()
+        for cambio in cambios:
+            if cambio.anterior is not None and self.afecta(cambio.anterior):
+                self._quitar(cambio.anterior)
+                afectados.add(cambio.anterior.pensamiento)
+            if cambio.nuevo is not None and self.afecta(cambio.nuevo):
+                self._sumar(cambio.nuevo)
+                afectados.add(cambio.nuevo.pensamiento)
+        return afectados
+
+    def serie(self, codigo: str) -> SerieDiaria:
+        """Serie por día de un pensamiento a partir de los totales guardados."""
+        dias = self.dias.get(codigo)
+        if not dias:
+            return _serie_vacia()
+        fechas = sorted(dias)
+        columna = lambda nombre: np.array([getattr(dias[f], nombre) for f in fechas], dtype=np.int64)
+        return SerieDiaria(np.array(fechas, dtype='datetime64[D]'), columna('registros'),
+                           columna('cantidad'), columna('duracion'),
+                           _dividir(columna('suma_intensidad'), columna('registros_intensidad')))
+
+    def _sumar(self, r: RegistroDimension):
+        i = self._posicion.get(r.pensamiento)
+        if i is None:
+            if r.pensamiento not in self.textos:
+                # Pensamiento creado después de cargar: falta su texto
+                self.requiere_recarga = True
+                return
+            i = self._agregar_pensamiento(r.pensamiento)
+        res = self.resumen
+        dias = self.dias.setdefault(r.pensamiento, {})
+        dia = dias.get(r.fecha)
+        if dia is None:
+            dia = dias[r.fecha] = AgregadoDiario()
+            res.dias[i] += 1
+        media_anterior = dia.media_intensidad()
+        duracion = r.duracion or 0
+        dia.registros += 1
+        dia.cantidad += r.cantidad
+        dia.duracion += duracion
+        dia.max_cantidad = max(dia.max_cantidad, r.cantidad)
+        dia.max_duracion = max(dia.max_duracion, duracion)
+        res.registros[i] += 1
+        res.cantidad[i] += r.cantidad
+        res.duracion[i] += duracion
+        res.max_cantidad[i] = max(res.max_cantidad[i], r.cantidad)
+        res.max_duracion[i] = max(res.max_duracion[i], duracion)
+        if r.intensidad is not None:
+            dia.suma_intensidad += r.intensidad
+            dia.registros_intensidad += 1
+            self._sumar_intensidad(i, r.intensidad, 1)
+            self._actualizar_max_intensidad(i, r.pensamiento, media_anterior, dia.media_intensidad())
+
+    def _quitar(self, r: RegistroDimension):
+        i = self._posicion.get(r.pensamiento)
+        dia = self.dias.get(r.pensamiento, {}).get(r.fecha)
+        if i is None or dia is None:
+            self.requiere_recarga = True
+            return
+        res = self.resumen
+        duracion = r.duracion or 0
+        media_anterior = dia.media_intensidad()
+        dia.registros -= 1
+        dia.cantidad -= r.cantidad
+        dia.duracion -= duracion
+        res.registros[i] -= 1
+        res.cantidad[i] -= r.cantidad
+        res.duracion[i] -= duracion
+        if r.intensidad is not None:
+            dia.suma_intensidad -= r.intensidad
+            dia.registros_intensidad -= 1
+            self._sumar_intensidad(i, -r.intensidad, -1)
+        if not dia.registros:
+            del self.dias[r.pensamiento][r.fecha]
+            res.dias[i] -= 1
+        elif 0 < r.cantidad >= dia.max_cantidad or 0 < duracion >= dia.max_duracion:
+            # El máximo del día era esta fila y no se sabe cuál es el siguiente;
+            # con máximo 0 las demás filas también valen 0 y no cambia
+            self.requiere_recarga = True
+        if not res.registros[i]:
+            self._quitar_pensamiento(i)
+            return
+        if r.cantidad >= res.max_cantidad[i] or duracion >= res.max_duracion[i]:
+            dias = self.dias[r.pensamiento].values()
+            res.max_cantidad[i] = max(d.max_cantidad for d in dias)
+            res.max_duracion[i] = max(d.max_duracion for d in dias)
+        if r.intensidad is not None:
+            self._actualizar_max_intensidad(i, r.pensamiento, media_anterior, dia.media_intensidad())
+
+    def _sumar_intensidad(self, i: int, suma: int, registros: int):
+        res = self.resumen
+        self._suma_intensidad[i] += suma
+        res.registros_intensidad[i] += registros
+        res.intensidad[i] = (self._suma_intensidad[i] / res.registros_intensidad[i]
+                             if res.registros_intensidad[i] else np.nan)
+
+    def _actualizar_max_intensidad(self, i: int, codigo: str, anterior: float, nueva: float):
+        maximo = self.resumen.max_intensidad_diaria
+        if anterior == maximo[i] and not nueva >= anterior:
+            # Bajó el día que tenía el máximo: se busca entre los días del pensamiento
+            maximo[i] = np.fmax.reduce([d.media_intensidad() for d in self.dias[codigo].values()],
+                                       initial=np.nan)
+        else:
+            maximo[i] = np.fmax(maximo[i], nueva)
+
+    def _agregar_pensamiento(self, codigo: str) -> int:
+        """Inserta un pensamiento sin registros en su sitio del resumen."""
+        res = self.resumen
+        i = int(np.searchsorted(res.codigos, codigo))
+        valores = {'codigos': codigo, 'pensamientos': self.textos[codigo],
+                   'intensidad': np.nan, 'max_intensidad_diaria': np.nan}
+        for f in fields(res):
+            if f.name != 'dias_periodo':
+                setattr(res, f.name, np.insert(getattr(res, f.name), i, valores.get(f.name, 0)))
+        self._suma_intensidad = np.insert(self._suma_intensidad, i, 0)
+        self._indexar()
+        return i
+
+    def _quitar_pensamiento(self, i: int):
+        """Saca del resumen un pensamiento que se ha quedado sin registros."""
+        res = self.resumen
+        self.dias.pop(res.codigos[i], None)
+        self.resumen = res.seleccionar(np.arange(len(res)) != i)
+        self._suma_intensidad = np.delete(self._suma_intensidad, i)
+        self._indexar()
+
+
+def agregados_periodo(servicio: ServicioBD, codigo_paciente: str,
+                      desde: Fecha, hasta: Fecha) -> AgregadosPeriodo:
+    """Como resumen_periodo, pero con los totales diarios para aplicar cambios después."""
+    desde, hasta = _texto(desde), _texto(hasta)
+    resumen = resumen_periodo(servicio, codigo_paciente, desde, hasta)
+    dias: Dict[str, Dict[str, AgregadoDiario]] = {}
+    for codigo, _, registros, cantidad, duracion, suma_int, registros_int, max_cantidad, \
+            max_duracion, fecha in servicio.consultar_cacheado(CONSULTA_PERIODO,
+                                                               (codigo_paciente, desde, hasta)):
+        dias.setdefault(codigo, {})[fecha] = AgregadoDiario(
+            registros, cantidad, duracion, suma_int, registros_int, max_cantidad, max_duracion)
+    textos = {codigo: texto for _, codigo, texto in
+              servicio.consultar_cacheado(CONSULTA_PENSAMIENTOS, (codigo_paciente,))}
+    return AgregadosPeriodo(codigo_paciente, desde, hasta, resumen, dias, textos)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from servicio_bd import RUTA_DB, obtener_servicio
+
+    parser = argparse.ArgumentParser(description='Resumen de un paciente en un periodo')
+    parser.add_argument('paciente', help='código del paciente, por ejemplo P001')
+    parser.add_argument('desde', help='AAAA-MM-DD')
+    parser.add_argument('hasta', help='AAAA-MM-DD')
+    parser.add_argument('--dimension', choices=DIMENSIONES, default='cantidad')
+    parser.add_argument('--db', default=RUTA_DB, help='ruta de la base de datos')
+    args = parser.parse_args()
+
+    resumen = resumen_periodo(obtener_servicio(args.db), args.paciente, args.desde, args.hasta)
+    valores = resumen.valores(args.dimension)
+    proporciones = resumen.proporciones(args.dimension)
+    for i in np.argsort(-valores):
+        print(f'{resumen.codigos[i]:14} {valores[i]:>10.2f} {proporciones[i]:>7.1%}  '
+              f'{resumen.pensamientos[i]}')
+    print(resumen.totales())
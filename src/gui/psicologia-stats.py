@@ -1,98 +1,71 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import sqlite3
+import threading
 from datetime import datetime, timedelta
 from tkcalendar import DateEntry
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
 import numpy as np
-from typing import Dict, List, Optional, Tuple, Any
-from dataclasses import dataclass
+from typing import Dict, List, Optional, Any
 from contextlib import contextmanager
 import pandas as pd
 from abc import ABC, abstractmethod
-
-
-@dataclass
-class DatosPensamiento:
-    """Estructura de datos para almacenar información de pensamientos."""
-    pensamiento: str
-    cantidad: float
-    duracion: float
-    intensidad: float
-    fecha: str
-    codigo: str
-
-    def to_dict(self) -> Dict[str, Any]:
-        return {
-            'pensamiento': self.pensamiento,
-            'cantidad': self.cantidad,
-            'duracion': self.duracion,
-            'intensidad': self.intensidad,
-            'fecha': self.fecha,
-            'codigo': self.codigo
-        }
+from servicio_bd import obtener_servicio
+from motor_estadisticas import RegistrosPaciente, ResumenPeriodo, SerieDiaria, registros_paciente
+from deteccion import Alertas, alertas_paciente
+from correlaciones import Correlaciones, correlaciones_paciente
+from lista_pacientes import FichaPaciente, fichas_pacientes
+from submuestreo import LineaReducida
+from graficos_vivos import BuscadorSectores
+from render_graficos import imagenes_informe
 
 
 class BaseDatos:
     """Clase para manejar todas las operaciones de base de datos."""
-    def __init__(self, ruta_db: str):
+    def __init__(self, ruta_db: str, instantanea: bool = False):
         self.ruta_db = ruta_db
+        self.servicio = obtener_servicio(ruta_db, instantanea)
 
     @contextmanager
     def conexion(self):
-        conn = None
-        try:
-            conn = sqlite3.connect(self.ruta_db)
+        with self.servicio.conexion() as conn:
             yield conn
-        finally:
-            if conn:
-                conn.close()
 
-    def obtener_pacientes(self) -> List[Tuple[str, str]]:
-        """Obtiene la lista de pacientes."""
+    def obtener_pacientes(self) -> List[FichaPaciente]:
+        """Obtiene la lista de pacientes con sus totales."""
         try:
-            with self.conexion() as conn:
-                cursor = conn.cursor()
-                cursor.execute('SELECT codigo, nombre FROM pacientes ORDER BY codigo')
-                return cursor.fetchall()
+            return fichas_pacientes(self.servicio)
         except sqlite3.Error as e:
             raise Exception(f"Error al obtener pacientes: {str(e)}")
 
-    def obtener_datos_paciente(self, codigo_paciente: str, fecha_inicio: str, 
-                             fecha_fin: str) -> Dict[str, List[DatosPensamiento]]:
-        """Obtiene los datos de un paciente en un rango de fechas."""
+    def obtener_datos_paciente(self, codigo_paciente: str, fecha_inicio: str,
+                             fecha_fin: str) -> RegistrosPaciente:
+        """Obtiene en columnas los registros de un paciente en un rango de fechas."""
         try:
-            with self.conexion() as conn:
-                cursor = conn.cursor()
-                query = """
-                SELECT p.codigo, p.pensamiento, d.cantidad, d.duracion, 
-                       d.intensidad, d.fecha
-                FROM dimensiones d
-                JOIN pensamientos p ON d.pensamiento_id = p.id
-                WHERE p.codigo LIKE ? AND d.fecha BETWEEN ? AND ?
-                ORDER BY d.fecha
-                """
-                cursor.execute(query, (f'{codigo_paciente}%', fecha_inicio, fecha_fin))
-                
-                datos: Dict[str, List[DatosPensamiento]] = {}
-                for row in cursor.fetchall():
-                    codigo = row[0]
-                    if codigo not in datos:
-                        datos[codigo] = []
-                    datos[codigo].append(DatosPensamiento(
-                        pensamiento=row[1],
-                        cantidad=row[2] or 0,
-                        duracion=row[3] or 0,
-                        intensidad=row[4] or 0,
-                        fecha=row[5],
-                        codigo=codigo
-                    ))
-                return datos
+            return registros_paciente(self.servicio, codigo_paciente, fecha_inicio, fecha_fin)
         except sqlite3.Error as e:
             raise Exception(f"Error al obtener datos del paciente: {str(e)}")
 
+    def obtener_alertas(self, codigo_paciente: str, fecha_inicio: str, fecha_fin: str,
+                        dimension: str) -> Alertas:
+        """Tendencias y anomalías de todos los pensamientos del paciente."""
+        try:
+            return alertas_paciente(self.servicio, codigo_paciente, fecha_inicio, fecha_fin,
+                                    dimension)
+        except sqlite3.Error as e:
+            raise Exception(f"Error al obtener alertas: {str(e)}")
+
+    def obtener_correlaciones(self, codigo_paciente: str, fecha_inicio: str, fecha_fin: str,
+                              dimension: str) -> Correlaciones:
+        """Correlaciones entre los pensamientos del paciente, guardadas en caché."""
+        try:
+            return correlaciones_paciente(self.servicio, codigo_paciente, fecha_inicio, fecha_fin,
+                                          dimension)
+        except sqlite3.Error as e:
+            raise Exception(f"Error al obtener correlaciones: {str(e)}")
+
     def obtener_descripcion_pensamiento(self, codigo: str) -> str:
         """Obtiene la descripción de un pensamiento específico."""
         try:
@@ -112,8 +85,7 @@ class GraficoBase(ABC):
         self.colores_base = plt.cm.Set3(np.linspace(0, 1, 12))
 
     @abstractmethod
-    def crear(self, datos: Dict[str, List[DatosPensamiento]], 
-             dimension: str) -> Figure:
+    def crear(self, datos: Any, dimension: str) -> Figure:
         pass
 
     def _obtener_color_por_intensidad(self, valor: float) -> str:
@@ -126,29 +98,20 @@ class GraficoBase(ABC):
 
 class GraficoCircular(GraficoBase):
     """Implementación de gráfico circular."""
-    def crear(self, datos: Dict[str, List[DatosPensamiento]], 
-             dimension: str) -> Figure:
+    def crear(self, datos: ResumenPeriodo, dimension: str) -> Figure:
         fig = Figure(figsize=(6, 4))
         ax = fig.add_subplot(111)
 
-        valores = []
-        etiquetas = []
-        colores = []
-
-        for codigo, registros in datos.items():
-            if dimension == 'intensidad':
-                valor = sum(d.intensidad for d in registros) / len(registros)
-                color = self._obtener_color_por_intensidad(valor)
-            else:
-                valor = sum(getattr(d, dimension) for d in registros)
-                color = self.colores_base[len(colores) % len(self.colores_base)]
+        valores = datos.valores(dimension)
+        mascara = valores > 0
+        valores = valores[mascara]
+        etiquetas = list(datos.codigos[mascara])
+        if dimension == 'intensidad':
+            colores = [self._obtener_color_por_intensidad(v) for v in valores]
+        else:
+            colores = [self.colores_base[i % len(self.colores_base)] for i in range(len(valores))]
 
-            if valor > 0:
-                valores.append(valor)
-                etiquetas.append(codigo)
-                colores.append(color)
-
-        if valores:
+        if len(valores):
             wedges, texts, autotexts = ax.pie(valores, labels=etiquetas, 
                                             colors=colores, autopct='%1.1f%%', 
                                             startangle=90)
@@ -162,19 +125,24 @@ class GraficoCircular(GraficoBase):
 
 class GraficoLineal(GraficoBase):
     """Implementación de gráfico lineal."""
-    def crear(self, datos: List[DatosPensamiento], dimension: str) -> Figure:
+    def crear(self, datos: SerieDiaria, dimension: str, alertas: Optional[Alertas] = None,
+              codigo: Optional[str] = None) -> Figure:
         fig = Figure(figsize=(6, 3))
         ax = fig.add_subplot(111)
 
-        df = pd.DataFrame([d.to_dict() for d in datos])
-        df['fecha'] = pd.to_datetime(df['fecha'])
-        df = df.set_index('fecha')
-
-        valores = df[dimension]
-        ax.plot(df.index, valores, marker='o')
+        valores = datos.valores(dimension)
+        # Se dibujan los puntos que caben en el ancho; el zoom vuelve a reducir
+        linea, = ax.plot(datos.fechas, valores, marker='o')
+        LineaReducida(linea).set_data(datos.fechas, valores)
+        fila = alertas.fila(codigo) if alertas is not None else None
+        if fila is not None:
+            self._dibujar_alertas(ax, alertas, fila)
         
-        ymax = 10 if dimension == 'intensidad' else valores.max()
-        ax.set_ylim(0, ymax * 1.1)  # 10% de margen superior
+        if dimension == 'intensidad':
+            ymax = 10
+        else:
+            ymax = np.nanmax(valores) if len(valores) and not np.isnan(valores).all() else 1
+        ax.set_ylim(0, max(ymax, 1) * 1.1)  # 10% de margen superior
         
         titulo = {
             'cantidad': 'Cantidad de veces',
@@ -189,10 +157,51 @@ class GraficoLineal(GraficoBase):
 
         return fig
 
+    def _dibujar_alertas(self, ax, alertas: Alertas, fila: int):
+        """Superpone media móvil, EWMA, anomalías y cambio de nivel del pensamiento."""
+        for serie, estilo, color, nombre in ((alertas.media_movil[fila], '--', 'gray', 'Media móvil'),
+                                             (alertas.ewma[fila], ':', 'purple', 'EWMA')):
+            linea, = ax.plot(alertas.fechas, serie, estilo, color=color, label=nombre)
+            LineaReducida(linea, marcador=None).set_data(alertas.fechas, serie)
+        anomalias = alertas.anomalias[fila]
+        if anomalias.any():
+            ax.scatter(alertas.fechas[anomalias], alertas.valores[fila][anomalias],
+                       color='red', zorder=3, label='Anomalía')
+        if alertas.cambio[fila] >= 0:
+            ax.axvline(alertas.fechas[alertas.cambio[fila]], color='orange', linestyle='--',
+                       label='Cambio de nivel')
+        if alertas.marcas[fila]:
+            ax.set_title(alertas.marcas[fila], fontsize=9, color='red')
+        ax.legend(fontsize=7)
+
+
+class GraficoCalor(GraficoBase):
+    """Mapa de calor de la correlación entre pensamientos."""
+    # Con más pensamientos no caben las etiquetas de los ejes
+    MAX_ETIQUETAS = 40
+
+    def crear(self, datos: Correlaciones, dimension: str, desfase: int = 0) -> Figure:
+        fig = Figure(figsize=(7, 6))
+        ax = fig.add_subplot(111)
+        # Una sola imagen para toda la matriz: cambiar de desfase es un set_data
+        imagen = ax.imshow(datos.cruzada[desfase], cmap='RdBu_r', vmin=-1, vmax=1,
+                           interpolation='nearest')
+        fig.colorbar(imagen, ax=ax, label='Correlación')
+        etiquetas = [codigo.split('-')[-1] for codigo in datos.codigos]
+        if len(etiquetas) <= self.MAX_ETIQUETAS:
+            ax.set_xticks(range(len(etiquetas)))
+            ax.set_xticklabels(etiquetas, rotation=90, fontsize=7)
+            ax.set_yticks(range(len(etiquetas)))
+            ax.set_yticklabels(etiquetas, fontsize=7)
+        ax.set_xlabel('Pensamiento (días después)')
+        ax.set_ylabel('Pensamiento')
+        fig.tight_layout()
+        return fig
+
 
 class EstadisticasUI:
     """Clase principal de la interfaz de usuario."""
-    def __init__(self):
+    def __init__(self, instantanea: bool = False):
         self.ventana = tk.Tk()
         self.ventana.title('Estadísticas de Pensamientos')
         self.ventana.geometry('1280x800')
@@ -201,11 +210,15 @@ class EstadisticasUI:
         self.paciente_seleccionado = tk.StringVar()
         self.dimension_actual = tk.StringVar(value='cantidad')
         self.pensamiento_seleccionado = None
+        self.registros: Optional[RegistrosPaciente] = None
+        self.alertas: Optional[Alertas] = None
+        self.nombres: Dict[str, str] = {}
         
         # Componentes
-        self.db = BaseDatos('../../data/db_psicologia_clinic.db')
+        self.db = BaseDatos('../../data/db_psicologia_clinic.db', instantanea)
         self.grafico_circular = GraficoCircular()
         self.grafico_lineal = GraficoLineal()
+        self.grafico_calor = GraficoCalor()
         
         self._crear_interfaz()
         self._cargar_pacientes()
@@ -275,6 +288,8 @@ class EstadisticasUI:
                   command=self._exportar_datos).pack(side=tk.LEFT, padx=5)
         ttk.Button(frame_botones, text='Generar Informe', 
                   command=self._generar_informe).pack(side=tk.LEFT, padx=5)
+        ttk.Button(frame_botones, text='Correlaciones',
+                  command=self._mostrar_correlaciones).pack(side=tk.LEFT, padx=5)
 
     def _crear_panel_graficos(self):
         """Crea el panel para los gráficos."""
@@ -285,7 +300,8 @@ class EstadisticasUI:
         """Carga la lista de pacientes en el combobox."""
         try:
             pacientes = self.db.obtener_pacientes()
-            self.combo_pacientes['values'] = [f'{p[0]} - {p[1]}' for p in pacientes]
+            self.nombres = {p.codigo: p.nombre for p in pacientes}
+            self.combo_pacientes['values'] = [p.etiqueta() for p in pacientes]
         except Exception as e:
             messagebox.showerror('Error', str(e))
 
@@ -304,22 +320,39 @@ class EstadisticasUI:
             fecha_inicio = self.fecha_inicio.get_date().strftime('%Y-%m-%d')
             fecha_fin = self.fecha_fin.get_date().strftime('%Y-%m-%d')
             
-            datos = self.db.obtener_datos_paciente(codigo_paciente, 
-                                                 fecha_inicio, fecha_fin)
+            self.registros = self.db.obtener_datos_paciente(codigo_paciente,
+                                                            fecha_inicio, fecha_fin)
+            resumen = self.registros.resumen()
+            self.alertas = self.db.obtener_alertas(codigo_paciente, fecha_inicio, fecha_fin,
+                                                   self.dimension_actual.get())
             
-            if not datos:
+            if not len(resumen):
                 messagebox.showinfo('Información', 
                                   'No hay datos para el período seleccionado')
                 return
 
             # Crear gráficos
-            self._crear_grafico_circular(datos)
-            if self.pensamiento_seleccionado:
-                self._crear_grafico_lineal(datos)
+            self._crear_grafico_circular(resumen)
+            if self.pensamiento_seleccionado in resumen.codigos:
+                self._crear_grafico_lineal()
+
+            # El informe de este periodo encontrará sus imágenes ya dibujadas
+            threading.Thread(target=self._preparar_informe,
+                             args=(codigo_paciente, fecha_inicio, fecha_fin,
+                                   self.dimension_actual.get()),
+                             daemon=True).start()
 
         except Exception as e:
             messagebox.showerror('Error', str(e))
 
+    def _preparar_informe(self, codigo_paciente: str, fecha_inicio: str, fecha_fin: str,
+                          dimension: str):
+        """Dibuja en segundo plano las imágenes del informe en la caché de gráficos."""
+        try:
+            imagenes_informe(self.db.servicio, codigo_paciente, fecha_inicio, fecha_fin, dimension)
+        except (sqlite3.Error, OSError):
+            pass  # Solo adelanta trabajo: el informe las dibuja si faltan
+
     def _validar_seleccion(self) -> bool:
         """Valida la selección actual."""
         if not self.paciente_seleccionado.get():
@@ -333,31 +366,34 @@ class EstadisticasUI:
             
         return True
 
-    def _crear_grafico_circular(self, datos: Dict[str, List[DatosPensamiento]]):
+    def _crear_grafico_circular(self, resumen: ResumenPeriodo):
         """Crea y muestra el gráfico circular."""
-        fig = self.grafico_circular.crear(datos, self.dimension_actual.get())
+        fig = self.grafico_circular.crear(resumen, self.dimension_actual.get())
         canvas = FigureCanvasTkAgg(fig, master=self.frame_graficos)
         canvas.draw()
         canvas.get_tk_widget().grid(row=0, column=0, sticky='nsew', padx=5, pady=5)
         
+        ax = fig.axes[0]
+        buscador = BuscadorSectores(ax, ax.patches)
+        
         def on_click(event):
-            if event.inaxes == fig.axes[0]:
-                self._manejar_click_grafico(event, fig.axes[0], datos)
+            if event.inaxes == ax:
+                self._manejar_click_grafico(event, ax, buscador)
                 
         canvas.mpl_connect('button_press_event', on_click)
 
-    def _crear_grafico_lineal(self, datos: Dict[str, List[DatosPensamiento]]):
+    def _crear_grafico_lineal(self):
         """Crea y muestra el gráfico lineal."""
-        if self.pensamiento_seleccionado not in datos:
+        serie = self.registros.serie(self.pensamiento_seleccionado)
+        if not len(serie):
             return
-#########
-#####
-        registros = datos[self.pensamiento_seleccionado]
+
         frame_derecho = ttk.Frame(self.frame_graficos)
         frame_derecho.grid(row=0, column=1, sticky='nsew', padx=5, pady=5)
         
         # Crear gráfico lineal
-        fig = self.grafico_lineal.crear(registros, self.dimension_actual.get())
+        fig = self.grafico_lineal.crear(serie, self.dimension_actual.get(), self.alertas,
+                                        self.pensamiento_seleccionado)
         canvas = FigureCanvasTkAgg(fig, master=frame_derecho)
         canvas.draw()
         canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
@@ -365,21 +401,20 @@ class EstadisticasUI:
         # Mostrar descripción del pensamiento
         self._mostrar_descripcion_pensamiento(frame_derecho)
 
-    def _manejar_click_grafico(self, event, ax, datos: Dict[str, List[DatosPensamiento]]):
+    def _manejar_click_grafico(self, event, ax, buscador: BuscadorSectores):
         """Maneja el evento de click en el gráfico circular."""
-        for wedge in ax.patches:  # patches contiene los wedges del pie chart
-            if wedge.contains_point([event.x, event.y]):
-                codigo = wedge.get_label()
-                self.pensamiento_seleccionado = codigo
-                self._mostrar_detalle_pensamiento(datos[codigo][0].pensamiento)
-                self._crear_grafico_lineal(datos)
-                break
+        i = buscador.indice(event.x, event.y)
+        if i is None:
+            return
+        codigo = ax.patches[i].get_label()  # patches contiene los wedges del pie chart
+        self.pensamiento_seleccionado = codigo
+        self._mostrar_detalle_pensamiento(self.registros.texto(codigo))
+        self._crear_grafico_lineal()
 
     def _mostrar_descripcion_pensamiento(self, frame_padre: ttk.Frame):
         """Muestra la descripción del pensamiento seleccionado."""
         try:
-            descripcion = self.db.obtener_descripcion_pensamiento(
-                self.pensamiento_seleccionado)
+            descripcion = self.registros.texto(self.pensamiento_seleccionado)
             
             frame_descripcion = ttk.LabelFrame(frame_padre, 
                                              text='Descripción del Pensamiento')
@@ -440,6 +475,65 @@ class EstadisticasUI:
         y = (ventana.winfo_screenheight() // 2) - (height // 2)
         ventana.geometry(f'{width}x{height}+{x}+{y}')
 
+    def _mostrar_correlaciones(self):
+        """Muestra el mapa de calor de correlaciones del paciente y periodo actuales."""
+        if not self._validar_seleccion():
+            return
+
+        try:
+            codigo_paciente = self.paciente_seleccionado.get().split(' - ')[0]
+            fecha_inicio = self.fecha_inicio.get_date().strftime('%Y-%m-%d')
+            fecha_fin = self.fecha_fin.get_date().strftime('%Y-%m-%d')
+            correlaciones = self.db.obtener_correlaciones(codigo_paciente, fecha_inicio, fecha_fin,
+                                                          self.dimension_actual.get())
+        except Exception as e:
+            messagebox.showerror('Error', str(e))
+            return
+
+        if len(correlaciones) < 2:
+            messagebox.showinfo('Información',
+                              'Hacen falta al menos dos pensamientos con registros')
+            return
+
+        ventana = tk.Toplevel(self.ventana)
+        ventana.title(f'Correlaciones de {codigo_paciente}')
+        ventana.geometry('800x750')
+
+        frame_desfase = ttk.Frame(ventana, padding='5')
+        frame_desfase.pack(fill=tk.X)
+        ttk.Label(frame_desfase, text='Desfase (días):').pack(side=tk.LEFT)
+        desfase = tk.IntVar(value=0)
+        info = ttk.Label(ventana, text='Pase el ratón por una celda', padding='5')
+
+        fig = self.grafico_calor.crear(correlaciones, self.dimension_actual.get())
+        imagen = fig.axes[0].images[0]
+        canvas = FigureCanvasTkAgg(fig, master=ventana)
+        canvas.draw()
+        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        info.pack(fill=tk.X)
+
+        def cambiar_desfase(*_):
+            imagen.set_data(correlaciones.cruzada[desfase.get()])
+            canvas.draw_idle()
+
+        def on_move(event):
+            if event.inaxes is not fig.axes[0] or event.xdata is None:
+                return
+            i, j = int(round(event.ydata)), int(round(event.xdata))
+            if not (0 <= i < len(correlaciones) and 0 <= j < len(correlaciones)):
+                return
+            k = desfase.get()
+            r = correlaciones.cruzada[k, i, j]
+            valor = 'sin datos suficientes' if np.isnan(r) else f'r = {r:+.2f}'
+            despues = f' {k} días después' if k else ''
+            info.config(text=f'{correlaciones.codigos[i]} y {correlaciones.codigos[j]}'
+                             f'{despues}: {valor}')
+
+        ttk.Spinbox(frame_desfase, from_=0, to=len(correlaciones.cruzada) - 1, width=4,
+                    textvariable=desfase, state='readonly',
+                    command=cambiar_desfase).pack(side=tk.LEFT, padx=5)
+        canvas.mpl_connect('motion_notify_event', on_move)
+
     def _exportar_datos(self):
         """Exporta los datos actuales a un archivo Excel."""
         if not self._validar_seleccion():
@@ -453,25 +547,21 @@ class EstadisticasUI:
             datos = self.db.obtener_datos_paciente(codigo_paciente, 
                                                  fecha_inicio, fecha_fin)
             
-            if not datos:
+            if not len(datos):
                 messagebox.showinfo('Información', 
                                   'No hay datos para exportar')
                 return
                 
-            # Convertir datos a DataFrame
-            filas = []
-            for codigo, registros in datos.items():
-                for registro in registros:
-                    filas.append({
-                        'Código': codigo,
-                        'Pensamiento': registro.pensamiento,
-                        'Fecha': registro.fecha,
-                        'Cantidad': registro.cantidad,
-                        'Duración (min)': registro.duracion,
-                        'Intensidad': registro.intensidad
-                    })
-            
-            df = pd.DataFrame(filas)
+            # Las columnas pasan tal cual al DataFrame
+            columnas = datos.como_columnas()
+            df = pd.DataFrame({
+                'Código': columnas['codigo'],
+                'Pensamiento': columnas['pensamiento'],
+                'Fecha': columnas['fecha'],
+                'Cantidad': columnas['cantidad'],
+                'Duración (min)': columnas['duracion'],
+                'Intensidad': np.nan_to_num(columnas['intensidad'])
+            })
             
             # Solicitar ubicación para guardar
             filename = filedialog.asksaveasfilename(
@@ -495,10 +585,7 @@ class EstadisticasUI:
             return
             
         try:
-            from reportlab.lib import colors
-            from reportlab.lib.pagesizes import letter
-            from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+            from informes import generar_informe
             
             # Solicitar ubicación para guardar
             filename = filedialog.asksaveasfilename(
@@ -510,56 +597,13 @@ class EstadisticasUI:
             if not filename:
                 return
                 
-            # Obtener datos
-            codigo_paciente = self.paciente_seleccionado.get()
+            codigo_paciente = self.paciente_seleccionado.get().split(' - ')[0]
             fecha_inicio = self.fecha_inicio.get_date().strftime('%Y-%m-%d')
             fecha_fin = self.fecha_fin.get_date().strftime('%Y-%m-%d')
             
-            datos = self.db.obtener_datos_paciente(
-                codigo_paciente.split(' - ')[0], 
-                fecha_inicio, 
-                fecha_fin
-            )
-            
-            # Crear documento
-            doc = SimpleDocTemplate(filename, pagesize=letter)
-            styles = getSampleStyleSheet()
-            story = []
-            
-            # Título
-            story.append(Paragraph(f'Informe de Pensamientos: {codigo_paciente}', 
-                                 styles['Heading1']))
-            story.append(Spacer(1, 12))
-            
-            # Período
-            story.append(Paragraph(f'Período: {fecha_inicio} a {fecha_fin}', 
-                                 styles['Normal']))
-            story.append(Spacer(1, 12))
-            
-            # Resumen por pensamiento
-            story.append(Paragraph('Resumen por Pensamiento:', 
-                                 styles['Heading2']))
-            story.append(Spacer(1, 12))
-            
-            for codigo, registros in datos.items():
-                # Estadísticas del pensamiento
-                total_cantidad = sum(r.cantidad for r in registros)
-                total_duracion = sum(r.duracion for r in registros)
-                promedio_intensidad = sum(r.intensidad for r in registros) / len(registros)
-                
-                story.append(Paragraph(f'Pensamiento: {codigo}', 
-                                     styles['Heading3']))
-                story.append(Paragraph(f'Descripción: {registros[0].pensamiento}', 
-                                     styles['Normal']))
-                story.append(Paragraph(
-                    f'Total ocurrencias: {total_cantidad}<br/>'
-                    f'Total duración: {total_duracion} minutos<br/>'
-                    f'Intensidad promedio: {promedio_intensidad:.2f}',
-                    styles['Normal']))
-                story.append(Spacer(1, 12))
-            
-            # Generar PDF
-            doc.build(story)
+            generar_informe(self.db.servicio, codigo_paciente,
+                            self.nombres.get(codigo_paciente, ''), fecha_inicio,
+                            fecha_fin, filename, self.dimension_actual.get())
             messagebox.showinfo('Éxito', 'Informe generado correctamente')
             
         except Exception as e:
@@ -572,6 +616,11 @@ class EstadisticasUI:
 
 
 if __name__ == '__main__':
-    app = EstadisticasUI()
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Estadísticas de pensamientos')
+    parser.add_argument('--instantanea', action='store_true',
+                        help='trabajar sobre una copia en memoria de la base')
+    app = EstadisticasUI(parser.parse_args().instantanea)
     app.ejecutar()
 
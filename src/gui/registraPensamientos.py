@@ -2,12 +2,28 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import sqlite3
 from datetime import datetime
+from servicio_bd import obtener_servicio
+from lista_pacientes import etiquetas_pacientes
+
+CONSULTA_SIGUIENTE_CODIGO = """
+    SELECT MAX(CAST(SUBSTR(codigo, -3) AS INTEGER))
+    FROM pensamientos
+    WHERE codigo >= ? AND codigo < ?
+"""
+
+CONSULTA_PENSAMIENTOS_PACIENTE = """
+    SELECT codigo, pensamiento, fecha_registro
+    FROM pensamientos
+    WHERE paciente_id = (SELECT id FROM pacientes WHERE codigo = ?)
+    ORDER BY codigo
+"""
 
 class VentanaPensamientos:
     def __init__(self, parent):
         self.ventana = tk.Toplevel(parent)
         self.ventana.title("Registro de Pensamientos")
         self.ventana.geometry("800x600")
+        self.db = obtener_servicio()
         
         # Crear marco principal con padding
         self.main_frame = ttk.Frame(self.ventana, padding="10")
@@ -88,14 +104,7 @@ class VentanaPensamientos:
     def cargar_pacientes(self):
         """Cargar lista de pacientes en el combobox"""
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            cursor.execute("SELECT codigo, nombre FROM pacientes ORDER BY codigo")
-            pacientes = cursor.fetchall()
-            conn.close()
-            
-            # Formatear para el combobox
-            self.pacientes_lista = [f"{p[0]} - {p[1]}" for p in pacientes]
+            self.pacientes_lista = etiquetas_pacientes(self.db)
             self.paciente_combo['values'] = self.pacientes_lista
             
         except sqlite3.Error as e:
@@ -104,18 +113,9 @@ class VentanaPensamientos:
     def generar_codigo_pensamiento(self, paciente_codigo):
         """Generar código único para pensamiento"""
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            
             # Obtener el último número de pensamiento para este paciente
-            cursor.execute("""
-                SELECT MAX(CAST(SUBSTR(codigo, -3) AS INTEGER))
-                FROM pensamientos
-                WHERE codigo LIKE ?
-            """, (f'{paciente_codigo}-PS%',))
-            
-            ultimo_numero = cursor.fetchone()[0]
-            conn.close()
+            ultimo_numero = self.db.consultar_uno(
+                CONSULTA_SIGUIENTE_CODIGO, (f'{paciente_codigo}-PS', f'{paciente_codigo}-PT'))[0]
             
             # Generar nuevo número
             nuevo_numero = 1 if ultimo_numero is None else ultimo_numero + 1
@@ -129,25 +129,15 @@ class VentanaPensamientos:
     def cargar_pensamientos(self, paciente_codigo):
         """Cargar pensamientos del paciente seleccionado"""
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            
             # Limpiar treeview actual
             for item in self.tree.get_children():
                 self.tree.delete(item)
             
             # Cargar pensamientos
-            cursor.execute("""
-                SELECT codigo, pensamiento, fecha_registro
-                FROM pensamientos
-                WHERE codigo LIKE ?
-                ORDER BY codigo
-            """, (f'{paciente_codigo}%',))
+            pensamientos = self.db.consultar(CONSULTA_PENSAMIENTOS_PACIENTE, (paciente_codigo,))
             
-            for pensamiento in cursor.fetchall():
+            for pensamiento in pensamientos:
                 self.tree.insert('', 'end', values=pensamiento)
-                
-            conn.close()
             
         except sqlite3.Error as e:
             messagebox.showerror("Error", f"Error al cargar pensamientos: {str(e)}")
@@ -171,16 +161,10 @@ class VentanaPensamientos:
             paciente_codigo = self.paciente_combo.get().split(' - ')[0]
             nuevo_codigo = self.generar_codigo_pensamiento(paciente_codigo)
             
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                INSERT INTO pensamientos (codigo, pensamiento, fecha_registro)
-                VALUES (?, ?, date('now'))
-            """, (nuevo_codigo, pensamiento))
-            
-            conn.commit()
-            conn.close()
+            self.db.ejecutar("""
+                INSERT INTO pensamientos (codigo, paciente_id, pensamiento, fecha_registro)
+                VALUES (?, (SELECT id FROM pacientes WHERE codigo = ?), ?, date('now'))
+            """, (nuevo_codigo, paciente_codigo, pensamiento))
             
             # Actualizar lista de pensamientos
             self.cargar_pensamientos(paciente_codigo)
@@ -212,18 +196,12 @@ class VentanaPensamientos:
         try:
             codigo = self.tree.item(selected[0])['values'][0]
             
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            self.db.ejecutar("""
                 UPDATE pensamientos
                 SET pensamiento = ?
                 WHERE codigo = ?
             """, (pensamiento, codigo))
             
-            conn.commit()
-            conn.close()
-            
             # Actualizar lista de pensamientos
             paciente_codigo = self.paciente_combo.get().split(' - ')[0]
             self.cargar_pensamientos(paciente_codigo)
@@ -249,13 +227,7 @@ class VentanaPensamientos:
         try:
             codigo = self.tree.item(selected[0])['values'][0]
             
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            
-            cursor.execute("DELETE FROM pensamientos WHERE codigo = ?", (codigo,))
-            
-            conn.commit()
-            conn.close()
+            self.db.ejecutar("DELETE FROM pensamientos WHERE codigo = ?", (codigo,))
             
             # Actualizar lista de pensamientos
             paciente_codigo = self.paciente_combo.get().split(' - ')[0]
@@ -3,11 +3,15 @@ from tkinter import ttk, messagebox
 import sqlite3
 from datetime import datetime
 from tkcalendar import DateEntry
+from servicio_bd import obtener_servicio
+from lista_pacientes import etiquetas_pacientes
+from ingesta_dimensiones import ingerir_dimensiones
 
 class VentanaDimensiones:
     def __init__(self, parent):
         self.ventana = tk.Toplevel(parent)
         self.ventana.title("Registro de Dimensiones")
+        self.db = obtener_servicio()
         self.ventana.geometry("1280x600")
         
         self.main_frame = ttk.Frame(self.ventana, padding="10")
@@ -126,12 +130,7 @@ class VentanaDimensiones:
 
     def cargar_pacientes(self):
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            cursor.execute("SELECT codigo, nombre FROM pacientes ORDER BY codigo")
-            pacientes = cursor.fetchall()
-            self.combo_pacientes['values'] = [f"{p[0]} - {p[1]}" for p in pacientes]
-            conn.close()
+            self.combo_pacientes['values'] = etiquetas_pacientes(self.db)
         except sqlite3.Error as e:
             messagebox.showerror("Error", f"Error al cargar pacientes: {str(e)}")
 
@@ -142,23 +141,18 @@ class VentanaDimensiones:
         codigo_paciente = self.paciente_seleccionado.get().split(' - ')[0]
         
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            
             for item in self.tree.get_children():
                 self.tree.delete(item)
                 
-            cursor.execute("""
+            pensamientos = self.db.consultar("""
                 SELECT codigo, pensamiento
                 FROM pensamientos
-                WHERE codigo LIKE ?
+                WHERE paciente_id = (SELECT id FROM pacientes WHERE codigo = ?)
                 ORDER BY codigo
-            """, (f'{codigo_paciente}%',))
+            """, (codigo_paciente,))
             
-            for pensamiento in cursor.fetchall():
+            for pensamiento in pensamientos:
                 self.tree.insert('', 'end', values=pensamiento)
-                
-            conn.close()
         except sqlite3.Error as e:
             messagebox.showerror("Error", f"Error al cargar pensamientos: {str(e)}")
 
@@ -174,28 +168,13 @@ class VentanaDimensiones:
             return
             
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                INSERT INTO dimensiones (pensamiento_id, fecha, cantidad, duracion, intensidad)
-                VALUES (
-                    (SELECT id FROM pensamientos WHERE codigo = ?),
-                    ?,
-                    ?,
-                    ?,
-                    ?
-                )
-            """, (
+            ingerir_dimensiones([(
                 codigo_pensamiento,
                 self.fecha_actual.get_date().strftime('%Y-%m-%d'),
                 dims['cantidad'].get(),
-                int(dims['duracion'].get()),
+                dims['duracion'].get(),
                 dims['intensidad'].get()
-            ))
-            
-            conn.commit()
-            conn.close()
+            )], self.db)
             
             messagebox.showinfo("Éxito", "Dimensión guardada correctamente")
             
@@ -204,6 +183,8 @@ class VentanaDimensiones:
             dims['duracion'].set('')
             dims['intensidad'].set(0)
             
+        except ValueError as e:
+            messagebox.showwarning("Advertencia", str(e))
         except sqlite3.Error as e:
             messagebox.showerror("Error", f"Error al guardar: {str(e)}")
 
@@ -276,25 +257,19 @@ class VentanaDimensiones:
 
     def cargar_dimensiones_existentes(self, codigo_pensamiento):
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
             fecha_actual = self.fecha_actual.get_date().strftime('%Y-%m-%d')
             
-            cursor.execute("""
+            dimensiones_hoy = self.db.consultar_uno("""
                 SELECT cantidad, duracion, intensidad
                 FROM dimensiones
                 WHERE pensamiento_id = (SELECT id FROM pensamientos WHERE codigo = ?)
                 AND fecha = ?
                 ORDER BY id DESC
             """, (codigo_pensamiento, fecha_actual))
-            
-            dimensiones_hoy = cursor.fetchone()  # Removido .execute
             if dimensiones_hoy:
                 self.dimensiones[codigo_pensamiento]['cantidad'].set(dimensiones_hoy[0])
                 self.dimensiones[codigo_pensamiento]['duracion'].set(str(dimensiones_hoy[1]) if dimensiones_hoy[1] else '')
                 self.dimensiones[codigo_pensamiento]['intensidad'].set(dimensiones_hoy[2])
-            
-            conn.close()
         except sqlite3.Error as e:
             messagebox.showerror("Error", f"Error al cargar dimensiones: {str(e)}")
 
@@ -304,11 +279,9 @@ class VentanaDimensiones:
         frame_lista.grid(row=3, column=0, pady=10, sticky='ew')
         
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
             fecha_actual = self.fecha_actual.get_date().strftime('%Y-%m-%d')
             
-            cursor.execute("""
+            dimensiones = self.db.consultar("""
                 SELECT cantidad, duracion, intensidad
                 FROM dimensiones
                 WHERE pensamiento_id = (SELECT id FROM pensamientos WHERE codigo = ?)
@@ -316,8 +289,6 @@ class VentanaDimensiones:
                 ORDER BY id DESC
             """, (codigo_pensamiento, fecha_actual))
             
-            dimensiones = cursor.fetchall()
-            
             if dimensiones:
                 # Crear Treeview para mostrar dimensiones
                 tree = ttk.Treeview(frame_lista, columns=('Cantidad', 'Duración', 'Intensidad'), 
@@ -332,8 +303,6 @@ class VentanaDimensiones:
                 tree.pack(fill='x', padx=5, pady=5)
             else:
                 ttk.Label(frame_lista, text="No hay dimensiones registradas hoy").pack(pady=5)
-            
-            conn.close()
         except sqlite3.Error as e:
             messagebox.showerror("Error", f"Error al mostrar dimensiones: {str(e)}")
 
@@ -343,36 +312,16 @@ class VentanaDimensiones:
             return
             
         dims = self.dimensiones[codigo_pensamiento]
-        duracion_valor = dims['duracion'].get()
-        
-        # Validar duración si se ingresó
-        if duracion_valor and not (0 <= int(duracion_valor) <= 60):
-            messagebox.showwarning("Advertencia", "La duración debe estar entre 0 y 60 minutos")
-            return
             
         try:
-            conn = sqlite3.connect('../../data/db_psicologia_clinic.db')
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                INSERT INTO dimensiones (pensamiento_id, fecha, cantidad, duracion, intensidad)
-                VALUES (
-                    (SELECT id FROM pensamientos WHERE codigo = ?),
-                    ?,
-                    ?,
-                    ?,
-                    ?
-                )
-            """, (
+            # La duración, si se ingresó, se valida junto al resto (0 a 60 minutos)
+            ingerir_dimensiones([(
                 codigo_pensamiento,
                 self.fecha_actual.get_date().strftime('%Y-%m-%d'),
                 dims['cantidad'].get(),
-                int(duracion_valor) if duracion_valor else None,
+                dims['duracion'].get(),
                 dims['intensidad'].get()
-            ))
-            
-            conn.commit()
-            conn.close()
+            )], self.db)
             
             messagebox.showinfo("Éxito", "Dimensión guardada correctamente")
             
@@ -384,6 +333,8 @@ class VentanaDimensiones:
             dims['duracion'].set('')
             dims['intensidad'].set(0)
             
+        except ValueError as e:
+            messagebox.showwarning("Advertencia", str(e))
         except sqlite3.Error as e:
             messagebox.showerror("Error", f"Error al guardar: {str(e)}")
 
@@ -3,13 +3,33 @@ from tkinter import ttk, messagebox
 import sqlite3
 from datetime import datetime
 from tkcalendar import DateEntry  # Para el selector de fecha
-import os
+from servicio_bd import obtener_servicio
+from lista_pacientes import DIAS_RECIENTES, fichas_pacientes
+
+def fecha_ordenable(texto):
+    """Convierte dd/mm/aaaa en aaaa/mm/dd para ordenar; otros formatos quedan igual"""
+    texto = texto or ''
+    return '/'.join(reversed(texto.split('/'))) if '/' in texto else texto
+
+# Clave de ordenación de cada columna de la tabla de pacientes
+ORDEN_COLUMNAS = {
+    'codigo': lambda f: f.codigo,
+    'nombre': lambda f: (f.nombre or '').lower(),
+    'fecha_nac': lambda f: fecha_ordenable(f.fecha_nacimiento),
+    'sexo': lambda f: f.sexo or '',
+    'enfermedad': lambda f: (f.enfermedad or '').lower(),
+    'pensamientos': lambda f: f.pensamientos,
+    'registros': lambda f: f.registros,
+    'ultimo': lambda f: f.ultimo_registro or '',
+    'recientes': lambda f: f.registros_recientes,
+}
 
 class GestionPacientes:
     def __init__(self, parent):
         self.ventana = tk.Toplevel(parent)
         self.ventana.title("Gestión de Pacientes")
         self.ventana.geometry("800x600")
+        self.db = obtener_servicio()
         
         # Crear marcos principales
         self.frame_form = ttk.LabelFrame(self.ventana, text="Formulario de Paciente", padding="10")
@@ -34,6 +54,9 @@ class GestionPacientes:
         self.crear_botones()
         
         # Cargar datos iniciales
+        self.fichas = []
+        self.orden_columna = 'codigo'
+        self.orden_descendente = False
         self.cargar_pacientes()
         
         # Variable para rastrear si estamos editando
@@ -75,15 +98,22 @@ class GestionPacientes:
     def crear_lista_pacientes(self):
         """Crear la tabla de pacientes"""
         # Crear Treeview
-        columns = ('codigo', 'nombre', 'fecha_nac', 'sexo', 'enfermedad')
+        columns = ('codigo', 'nombre', 'fecha_nac', 'sexo', 'enfermedad',
+                   'pensamientos', 'registros', 'ultimo', 'recientes')
         self.tabla = ttk.Treeview(self.frame_lista, columns=columns, show='headings')
         
-        # Definir encabezados
+        # Definir encabezados; al pulsarlos se ordena por esa columna
         self.tabla.heading('codigo', text='Código')
         self.tabla.heading('nombre', text='Nombre')
         self.tabla.heading('fecha_nac', text='Fecha Nac.')
         self.tabla.heading('sexo', text='Sexo')
         self.tabla.heading('enfermedad', text='Enfermedad')
+        self.tabla.heading('pensamientos', text='Pens.')
+        self.tabla.heading('registros', text='Registros')
+        self.tabla.heading('ultimo', text='Último')
+        self.tabla.heading('recientes', text=f'{DIAS_RECIENTES} días')
+        for columna in columns:
+            self.tabla.heading(columna, command=lambda c=columna: self.ordenar_por(c))
         
         # Definir anchos de columna
         self.tabla.column('codigo', width=70)
@@ -91,6 +121,10 @@ class GestionPacientes:
         self.tabla.column('fecha_nac', width=100)
         self.tabla.column('sexo', width=50)
         self.tabla.column('enfermedad', width=200)
+        self.tabla.column('pensamientos', width=50, anchor='e')
+        self.tabla.column('registros', width=70, anchor='e')
+        self.tabla.column('ultimo', width=90)
+        self.tabla.column('recientes', width=60, anchor='e')
         
         # Agregar scrollbar
         scrollbar = ttk.Scrollbar(self.frame_lista, orient="vertical", command=self.tabla.yview)
@@ -115,16 +149,8 @@ class GestionPacientes:
 
     def obtener_siguiente_codigo(self):
         """Obtener el siguiente código disponible"""
-
-
-        folder_path = "../../data/"
-        db_name = "db_psicologia_clinic.db"
-        db_path = os.path.join(folder_path, db_name)
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT MAX(CAST(SUBSTR(codigo, 2) AS INTEGER)) FROM pacientes")
-        resultado = cursor.fetchone()[0]
-        conn.close()
+        resultado = self.db.consultar_uno(
+            "SELECT MAX(CAST(SUBSTR(codigo, 2) AS INTEGER)) FROM pacientes")[0]
         
         if resultado is None:
             return "P001"
@@ -134,27 +160,24 @@ class GestionPacientes:
 
     def cargar_pacientes(self):
         """Cargar la lista de pacientes desde la base de datos"""
-        # Limpiar tabla actual
-        for item in self.tabla.get_children():
-            self.tabla.delete(item)
-            
-        # Cargar datos de la BD
-        folder_path = "../../data/"
-        db_name = "db_psicologia_clinic.db"
-        db_path = os.path.join(folder_path, db_name)
-        print("folder :" + db_path )
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT codigo, nombre, fecha_nacimiento, sexo, enfermedad 
-            FROM pacientes 
-            ORDER BY codigo
-        """)
-        
-        for row in cursor.fetchall():
-            self.tabla.insert('', 'end', values=row)
-            
-        conn.close()
+        # Los totales vienen de pacientes_resumen, sin agregar registros
+        self.fichas = fichas_pacientes(self.db)
+        self.mostrar_pacientes()
+
+    def mostrar_pacientes(self):
+        """Volver a llenar la tabla con las fichas en el orden actual"""
+        self.fichas.sort(key=ORDEN_COLUMNAS[self.orden_columna], reverse=self.orden_descendente)
+        self.tabla.delete(*self.tabla.get_children())
+        for f in self.fichas:
+            self.tabla.insert('', 'end', values=(
+                f.codigo, f.nombre, f.fecha_nacimiento, f.sexo, f.enfermedad,
+                f.pensamientos, f.registros, f.ultimo_registro_texto(), f.registros_recientes))
+
+    def ordenar_por(self, columna):
+        """Ordenar la tabla por la columna pulsada; pulsarla otra vez invierte el orden"""
+        self.orden_descendente = (columna == self.orden_columna and not self.orden_descendente)
+        self.orden_columna = columna
+        self.mostrar_pacientes()
 
     def on_select(self, event):
         """Manejar la selección de un paciente en la tabla"""
@@ -175,14 +198,8 @@ class GestionPacientes:
         self.var_enfermedad.set(paciente[4])
         
         # Cargar observaciones
-        folder_path = "../../data/"
-        db_name = "db_psicologia_clinic.db"
-        db_path = os.path.join(folder_path, db_name)
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()        
-        cursor.execute("SELECT observaciones FROM pacientes WHERE codigo = ?", (paciente[0],))
-        observaciones = cursor.fetchone()[0]
-        conn.close()
+        observaciones = self.db.consultar_uno(
+            "SELECT observaciones FROM pacientes WHERE codigo = ?", (paciente[0],))[0]
         
         self.text_observaciones.delete('1.0', tk.END)
         self.text_observaciones.insert('1.0', observaciones if observaciones else '')
@@ -215,15 +232,9 @@ class GestionPacientes:
         }
         
         try:
-            folder_path = "../../data/"
-            db_name = "db_psicologia_clinic.db"
-            db_path = os.path.join(folder_path, db_name)
-            print("ruta: "+db_path)
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
             if self.editando:
                 # Actualizar paciente existente
-                cursor.execute("""
+                self.db.ejecutar("""
                     UPDATE pacientes 
                     SET nombre=?, fecha_nacimiento=?, sexo=?, enfermedad=?, observaciones=?
                     WHERE codigo=?
@@ -231,22 +242,18 @@ class GestionPacientes:
                       datos['enfermedad'], datos['observaciones'], datos['codigo']))
             else:
                 # Insertar nuevo paciente
-                cursor.execute("""
+                self.db.ejecutar("""
                     INSERT INTO pacientes (codigo, nombre, fecha_nacimiento, sexo, enfermedad, observaciones)
                     VALUES (?, ?, ?, ?, ?, ?)
                 """, (datos['codigo'], datos['nombre'], datos['fecha_nacimiento'], 
                       datos['sexo'], datos['enfermedad'], datos['observaciones']))
             
-            conn.commit()
             messagebox.showinfo("Éxito", "Paciente guardado correctamente")
             self.cargar_pacientes()
             self.limpiar_formulario()
             
         except sqlite3.Error as e:
             messagebox.showerror("Error", f"Error en la base de datos: {str(e)}")
-            
-        finally:
-            conn.close()
 
     def eliminar_paciente(self):
         """Eliminar paciente seleccionado"""
@@ -256,22 +263,13 @@ class GestionPacientes:
             
         if messagebox.askyesno("Confirmar", "¿Está seguro de eliminar este paciente?"):
             try:
-                folder_path = "../../data/"
-                db_name = "db_psicologia_clinic.db"
-                db_path = os.path.join(folder_path, db_name)
-                conn = sqlite3.connect(db_path)
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM pacientes WHERE codigo = ?", (self.var_codigo.get(),))
-                conn.commit()
+                self.db.ejecutar("DELETE FROM pacientes WHERE codigo = ?", (self.var_codigo.get(),))
                 messagebox.showinfo("Éxito", "Paciente eliminado correctamente")
                 self.cargar_pacientes()
                 self.limpiar_formulario()
                 
             except sqlite3.Error as e:
                 messagebox.showerror("Error", f"Error en la base de datos: {str(e)}")
-                
-            finally:
-                conn.close()
 
     def limpiar_formulario(self):
         """Limpiar todos los campos del formulario"""
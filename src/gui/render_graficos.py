@@ -0,0 +1,263 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import matplotlib.style
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from motor_estadisticas import (Fecha, ResumenPeriodo, SerieDiaria, SeriesAgrupadas, resumen_periodo,
+                                 series_periodo)
+from servicio_bd import RUTA_DB, ServicioBD
+
+
+CARPETA_CACHE = os.path.join(os.path.dirname(RUTA_DB), 'cache_graficos')
+MAX_BYTES = 200 * 1024 * 1024
+# Las imágenes usadas hace menos de esto no se borran al recortar: quien
+# las pidió (otro hilo u otro proceso) puede estar a punto de leerlas
+SEGUNDOS_PROTEGIDOS = 60
+DPI = 100
+
+# Cambiar al modificar cómo se dibuja cualquier gráfico: invalida lo guardado
+VERSION_DIBUJO = 1
+
+# Estilo de matplotlib de cada tema; None usa la configuración actual sin
+# tocar rcParams, así que es el único seguro fuera del hilo de la interfaz
+TEMAS = {
+    'claro': None,
+    'oscuro': 'dark_background',
+}
+
+FORMATOS = ('png', 'svg')
+
+# Pensamientos con más registros que aparecen en el gráfico de evolución
+PENSAMIENTOS_EVOLUCION = 5
+
+TITULOS = {
+    'cantidad': 'Cantidad de veces',
+    'duracion': 'Duración (minutos)',
+    'intensidad': 'Intensidad',
+}
+
+
+def figura_circular(resumen: ResumenPeriodo, dimension: str, tamano=(6, 4)) -> Figure:
+    """Reparto de la dimensión entre pensamientos."""
+    fig = Figure(figsize=tamano)
+    ax = fig.add_subplot(111)
+    valores = resumen.valores(dimension)
+    mascara = valores > 0
+    if mascara.any():
+        ax.pie(valores[mascara], labels=list(resumen.codigos[mascara]), autopct='%1.1f%%',
+               startangle=90, textprops={'fontsize': 8})
+    ax.set_title(TITULOS[dimension])
+    return fig
+
+
+def figura_evolucion(series: SeriesAgrupadas, dimension: str, tamano=(6, 3),
+                     pensamientos: int = PENSAMIENTOS_EVOLUCION) -> Figure:
+    """Evolución de los pensamientos con más registros."""
+    fig = Figure(figsize=tamano)
+    ax = fig.add_subplot(111)
+    valores = series.valores(dimension)
+    for i in np.argsort(-series.registros.sum(axis=1), kind='stable')[:pensamientos]:
+        ax.plot(series.periodos, valores[i], marker='o', markersize=3, label=series.codigos[i])
+    if len(series):
+        ax.legend(fontsize=7)
+    ax.set_xlabel('Semana' if series.resolucion == 'semana' else 'Fecha')
+    ax.set_ylabel(TITULOS[dimension])
+    for etiqueta in ax.get_xticklabels():
+        etiqueta.set_rotation(45)
+    fig.tight_layout()
+    return fig
+
+
+def figura_lineal(serie: SerieDiaria, dimension: str, tamano=(6, 3)) -> Figure:
+    """Serie diaria de un pensamiento."""
+    fig = Figure(figsize=tamano)
+    ax = fig.add_subplot(111)
+    valores = serie.valores(dimension)
+    ax.plot(serie.fechas, valores, marker='o', markersize=3)
+    if dimension == 'intensidad':
+        ymax = 10
+    else:
+        ymax = np.nanmax(valores) if len(valores) and not np.isnan(valores).all() else 1
+    ax.set_ylim(0, max(ymax, 1) * 1.1)
+    ax.set_xlabel('Fecha')
+    ax.set_ylabel(TITULOS[dimension])
+    for etiqueta in ax.get_xticklabels():
+        etiqueta.set_rotation(45)
+    fig.tight_layout()
+    return fig
+
+
+def huella(*partes: Any) -> str:
+    """SHA-256 de las partes; los arrays entran con su tipo, forma y contenido."""
+    h = hashlib.sha256()
+    for parte in partes:
+        if isinstance(parte, np.ndarray):
+            h.update(f'{parte.dtype.str}{parte.shape}'.encode())
+            if parte.dtype == object:
+                h.update('\x1f'.join(map(str, parte.ravel())).encode())
+            else:
+                h.update(np.ascontiguousarray(parte).tobytes())
+        elif isinstance(parte, (tuple, list)):
+            h.update(huella(*parte).encode())
+        else:
+            h.update(repr(parte).encode())
+        h.update(b'\x1e')
+    return h.hexdigest()
+
+
+class CacheGraficos:
+    """Imágenes de gráficos guardadas en disco por contenido.
+
+    La clave es la huella de los datos, la dimensión, el tamaño, el tema y
+    el formato, así que un mismo gráfico se dibuja una sola vez aunque lo
+    pidan la interfaz, un informe o un lote en otro proceso. Al leer se
+    actualiza la fecha de modificación del fichero y, cuando la carpeta pasa
+    de max_bytes, se borran los menos usados salvo los de los últimos
+    SEGUNDOS_PROTEGIDOS, así que la ruta devuelta siempre existe.
+    """
+    def __init__(self, carpeta: str = CARPETA_CACHE, max_bytes: int = MAX_BYTES):
+        self.carpeta = carpeta
+        self.max_bytes = max_bytes
+        self.aciertos = 0
+        self.fallos = 0
+        self._bytes: Optional[int] = None
+        self._lock = threading.Lock()
+        os.makedirs(carpeta, exist_ok=True)
+
+    def ruta(self, clave: str, formato: str) -> str:
+        return os.path.join(self.carpeta, f'{clave}.{formato}')
+
+    def obtener(self, clave: str, formato: str, dibujar: Callable[[], Figure],
+                tema: str = 'claro', dpi: int = DPI) -> str:
+        """Ruta de la imagen; si no está guardada la dibuja con dibujar() en Agg."""
+        if formato not in FORMATOS:
+            raise ValueError(f'Formato no soportado: {formato}')
+        ruta = self.ruta(clave, formato)
+        try:
+            os.utime(ruta)
+            with self._lock:
+                self.aciertos += 1
+            return ruta
+        except FileNotFoundError:
+            pass
+
+        estilo = TEMAS[tema]
+        with matplotlib.style.context(estilo) if estilo else nullcontext():
+            fig = dibujar()
+            FigureCanvasAgg(fig)
+            # Se escribe aparte y se renombra: otro proceso nunca ve un fichero a medias
+            descriptor, temporal = tempfile.mkstemp(prefix='.', suffix='.tmp', dir=self.carpeta)
+            try:
+                with os.fdopen(descriptor, 'wb') as salida:
+                    fig.savefig(salida, format=formato, dpi=dpi, bbox_inches='tight')
+                # mkstemp lo crea solo legible por su dueño
+                os.chmod(temporal, 0o644)
+                os.replace(temporal, ruta)
+            except BaseException:
+                os.remove(temporal)
+                raise
+        with self._lock:
+            self.fallos += 1
+            if self._bytes is not None:
+                self._bytes += os.path.getsize(ruta)
+        self._recortar()
+        return ruta
+
+    def _recortar(self):
+        """Borra las imágenes menos usadas hasta quedar por debajo de max_bytes."""
+        protegidas = time.time() - SEGUNDOS_PROTEGIDOS
+        with self._lock:
+            if self._bytes is not None and self._bytes <= self.max_bytes:
+                return
+            ficheros = []
+            for entrada in os.scandir(self.carpeta):
+                if entrada.is_file() and entrada.name.endswith(FORMATOS):
+                    try:
+                        estado = entrada.stat()
+                    except FileNotFoundError:
+                        continue
+                    ficheros.append((estado.st_mtime, estado.st_size, entrada.path))
+            total = sum(tamano for _, tamano, _ in ficheros)
+            for usada, tamano, ruta in sorted(ficheros):
+                if total <= self.max_bytes or usada >= protegidas:
+                    break
+                try:
+                    os.remove(ruta)
+                except FileNotFoundError:
+                    pass
+                total -= tamano
+            self._bytes = total
+
+    def vaciar(self):
+        for entrada in os.scandir(self.carpeta):
+            if entrada.is_file() and entrada.name.endswith(FORMATOS):
+                os.remove(entrada.path)
+        with self._lock:
+            self._bytes = 0
+
+
+_caches: Dict[str, CacheGraficos] = {}
+_caches_lock = threading.Lock()
+
+
+def obtener_cache(carpeta: str = CARPETA_CACHE) -> CacheGraficos:
+    """Devuelve la caché compartida de la carpeta indicada."""
+    clave = os.path.abspath(carpeta)
+    with _caches_lock:
+        if clave not in _caches:
+            _caches[clave] = CacheGraficos(carpeta)
+        return _caches[clave]
+
+
+def imagen_circular(resumen: ResumenPeriodo, dimension: str, tamano: Tuple[float, float] = (6, 4),
+                    tema: str = 'claro', formato: str = 'png',
+                    cache: Optional[CacheGraficos] = None) -> str:
+    """Ruta de la imagen del gráfico circular del resumen."""
+    clave = huella('circular', VERSION_DIBUJO, resumen.codigos, resumen.valores(dimension),
+                   dimension, tamano, tema, DPI)
+    return (cache or obtener_cache()).obtener(
+        clave, formato, lambda: figura_circular(resumen, dimension, tamano), tema)
+
+
+def imagen_evolucion(series: SeriesAgrupadas, dimension: str, tamano: Tuple[float, float] = (6, 3),
+                     tema: str = 'claro', formato: str = 'png',
+                     cache: Optional[CacheGraficos] = None) -> str:
+    """Ruta de la imagen de evolución de los pensamientos con más registros."""
+    clave = huella('evolucion', VERSION_DIBUJO, series.resolucion, series.periodos, series.codigos,
+                   series.registros, series.valores(dimension), dimension, tamano, tema, DPI)
+    return (cache or obtener_cache()).obtener(
+        clave, formato, lambda: figura_evolucion(series, dimension, tamano), tema)
+
+
+def imagen_lineal(serie: SerieDiaria, dimension: str, tamano: Tuple[float, float] = (6, 3),
+                  tema: str = 'claro', formato: str = 'png',
+                  cache: Optional[CacheGraficos] = None) -> str:
+    """Ruta de la imagen de la serie diaria de un pensamiento."""
+    clave = huella('lineal', VERSION_DIBUJO, serie.fechas, serie.valores(dimension),
+                   dimension, tamano, tema, DPI)
+    return (cache or obtener_cache()).obtener(
+        clave, formato, lambda: figura_lineal(serie, dimension, tamano), tema)
+
+
+def imagenes_informe(servicio: ServicioBD, codigo_paciente: str, desde: Fecha, hasta: Fecha,
+                     dimension: str = 'cantidad', tema: str = 'claro',
+                     cache: Optional[CacheGraficos] = None) -> Optional[Tuple[str, str]]:
+    """(circular, evolución semanal) del informe de un paciente; None si no hay registros.
+
+    La interfaz puede llamarla de antemano para que el informe encuentre
+    las imágenes ya hechas.
+    """
+    resumen = resumen_periodo(servicio, codigo_paciente, desde, hasta)
+    if not len(resumen):
+        return None
+    semanal = series_periodo(servicio, codigo_paciente, desde, hasta, 'semana')
+    return (imagen_circular(resumen, dimension, tema=tema, cache=cache),
+            imagen_evolucion(semanal, dimension, tema=tema, cache=cache))
@@ -0,0 +1,362 @@
+import multiprocessing
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from bus_cambios import obtener_bus
+from cache_consultas import CacheConsultas
+from esquema import preparar_esquema
+
+
+RUTA_DB = os.path.normpath(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    '..', '..', 'data', 'db_psicologia_clinic.db'))
+
+# Pragmas aplicados a cada conexión nueva del pool
+PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-16000',       # ~16 MB de caché de páginas
+    'PRAGMA mmap_size=268435456',     # 256 MB mapeados en memoria
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA busy_timeout=5000',
+)
+
+# Número de sentencias preparadas que sqlite3 conserva por conexión
+TAMANO_CACHE_SENTENCIAS = 256
+
+# Páginas copiadas por paso al refrescar una instantánea en memoria
+PAGINAS_POR_PASO = 1024
+
+
+class ServicioBD:
+    """Pool de conexiones SQLite compartido por todas las ventanas."""
+    def __init__(self, ruta_db: str = RUTA_DB, tamano_pool: int = 4):
+        self.ruta_db = ruta_db
+        self.tamano_pool = tamano_pool
+        self._libres: 'queue.LifoQueue[sqlite3.Connection]' = queue.LifoQueue()
+        self._creadas = 0
+        self._lock = threading.Lock()
+        self._cerrado = False
+        self._esquema_preparado = False
+        self._esquema_lock = threading.Lock()
+        self._en_uso: Dict[int, List[sqlite3.Connection]] = {}
+        self.cache = CacheConsultas(ruta_db)
+        # Avisos de dimensiones escritas, compartidos con las instantáneas
+        self.cambios = obtener_bus(ruta_db)
+
+    def _crear_conexion(self) -> sqlite3.Connection:
+        """Abre una conexión nueva con los pragmas del servicio."""
+        conn = sqlite3.connect(self.ruta_db,
+                               check_same_thread=False,
+                               isolation_level=None,
+                               cached_statements=TAMANO_CACHE_SENTENCIAS)
+        try:
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+            self._preparar_esquema(conn)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def _preparar_esquema(self, conn: sqlite3.Connection):
+        """Prepara el esquema una sola vez, sin retener el lock del pool.
+
+        Las demás conexiones que se abran mientras tanto esperan aquí, pero
+        las que ya están libres en el pool se siguen prestando.
+        """
+        if self._esquema_preparado:
+            return
+        with self._esquema_lock:
+            if not self._esquema_preparado:
+                preparar_esquema(conn)
+                self._esquema_preparado = True
+
+    def _tomar(self) -> sqlite3.Connection:
+        """Toma una conexión libre o crea una si el pool no está lleno."""
+        if self._cerrado:
+            raise sqlite3.ProgrammingError('El servicio de base de datos está cerrado')
+        try:
+            return self._libres.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._creadas < self.tamano_pool:
+                self._creadas += 1
+                crear = True
+            else:
+                crear = False
+        if crear:
+            try:
+                return self._crear_conexion()
+            except sqlite3.Error:
+                with self._lock:
+                    self._creadas -= 1
+                raise
+        return self._libres.get()
+
+    def _devolver(self, conn: sqlite3.Connection):
+        """Devuelve la conexión al pool deshaciendo transacciones abiertas."""
+        if conn.in_transaction:
+            conn.rollback()
+        if self._cerrado:
+            conn.close()
+            return
+        self._libres.put(conn)
+
+    @contextmanager
+    def conexion(self):
+        """Presta una conexión del pool durante el bloque with."""
+        conn = self._tomar()
+        hilo = threading.get_ident()
+        with self._lock:
+            self._en_uso.setdefault(hilo, []).append(conn)
+        try:
+            yield conn
+        finally:
+            with self._lock:
+                prestadas = self._en_uso[hilo]
+                prestadas.remove(conn)
+                if not prestadas:
+                    del self._en_uso[hilo]
+            self._devolver(conn)
+
+    def interrumpir(self, hilo: int):
+        """Aborta las consultas en curso de las conexiones prestadas a un hilo."""
+        with self._lock:
+            for conn in self._en_uso.get(hilo, ()):
+                conn.interrupt()
+
+    @contextmanager
+    def transaccion(self):
+        """Presta una conexión dentro de una transacción explícita."""
+        with self.conexion() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def consultar(self, sql: str, parametros: Sequence[Any] = ()) -> List[tuple]:
+        """Ejecuta una consulta de lectura y devuelve todas las filas."""
+        with self.conexion() as conn:
+            return conn.execute(sql, parametros).fetchall()
+
+    def consultar_uno(self, sql: str, parametros: Sequence[Any] = ()) -> Optional[tuple]:
+        """Ejecuta una consulta de lectura y devuelve la primera fila."""
+        with self.conexion() as conn:
+            return conn.execute(sql, parametros).fetchone()
+
+    def consultar_dict(self, sql: str, parametros: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+        """Ejecuta una consulta y devuelve las filas como diccionarios."""
+        with self.conexion() as conn:
+            cursor = conn.execute(sql, parametros)
+            columnas = [c[0] for c in cursor.description]
+            return [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+
+    def consultar_cacheado(self, sql: str, parametros: Sequence[Any] = ()) -> List[tuple]:
+        """Como consultar, pero reutiliza el resultado mientras la base no cambie."""
+        return self.cache.obtener(sql, parametros, lambda: self.consultar(sql, parametros), 'filas')
+
+    def consultar_dict_cacheado(self, sql: str, parametros: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+        """Como consultar_dict, pero reutiliza el resultado mientras la base no cambie."""
+        return self.cache.obtener(sql, parametros, lambda: self.consultar_dict(sql, parametros), 'dict')
+
+    def ejecutar(self, sql: str, parametros: Sequence[Any] = ()) -> int:
+        """Ejecuta una sentencia de escritura en su propia transacción."""
+        with self.transaccion() as conn:
+            return conn.execute(sql, parametros).lastrowid
+
+    def ejecutar_muchos(self, sql: str, filas: Iterable[Sequence[Any]]) -> int:
+        """Ejecuta una sentencia para muchas filas en una sola transacción."""
+        with self.transaccion() as conn:
+            return conn.executemany(sql, filas).rowcount
+
+    def cerrar(self):
+        """Cierra todas las conexiones libres del pool."""
+        self._cerrado = True
+        self.cache.cerrar()
+        while True:
+            try:
+                self._libres.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class ServicioInstantanea(ServicioBD):
+    """Servicio de solo lectura sobre una copia en memoria de la base.
+
+    La copia se hace con la API de backup de SQLite al crear el servicio.
+    Cada vez que se presta una conexión se mira el PRAGMA data_version de
+    la base en disco y solo si ha cambiado se copia una generación nueva.
+    Cada generación es una copia completa de la base (la API de backup no
+    copia diferencias), hecha por pasos de PAGINAS_POR_PASO para no
+    bloquear a quien escribe. Las conexiones de la generación anterior se
+    cierran al devolverse.
+
+    Antes de la primera copia el esquema se prepara una vez con el
+    ServicioBD compartido de la misma base; las copias nunca escriben en
+    la base en disco.
+    """
+    def __init__(self, ruta_db: str = RUTA_DB, tamano_pool: int = 4,
+                 paginas_por_paso: int = PAGINAS_POR_PASO):
+        super().__init__(ruta_db, tamano_pool)
+        self.paginas_por_paso = paginas_por_paso
+        self.cache = CacheConsultas(ruta_db, version=self._version_cache)
+        self._generacion = 0
+        self._generacion_de: Dict[sqlite3.Connection, int] = {}
+        self._ancla: Optional[sqlite3.Connection] = None
+        self._version_copiada: Optional[int] = None
+        self._copia_lock = threading.Lock()
+        self._vigia = sqlite3.connect(ruta_db, check_same_thread=False, isolation_level=None)
+        self._vigia_lock = threading.Lock()
+        # Relleno de paciente_id y tablas de resumen que leen las consultas
+        with obtener_servicio(ruta_db).conexion():
+            pass
+        self._copiar(self._version_origen())
+
+    def _uri(self, generacion: int) -> str:
+        return f'file:instantanea_{id(self)}_{generacion}?mode=memory&cache=shared'
+
+    def _version_origen(self) -> int:
+        with self._vigia_lock:
+            return self._vigia.execute('PRAGMA data_version').fetchone()[0]
+
+    def _version_cache(self) -> int:
+        """Generación de la copia, refrescada antes para no servir resultados viejos."""
+        self.refrescar()
+        return self._generacion
+
+    def _copiar(self, version: int):
+        """Copia la base en disco a una generación nueva en memoria y la activa."""
+        with self._lock:
+            generacion = self._generacion + 1
+        origen = sqlite3.connect(self.ruta_db, isolation_level=None)
+        try:
+            ancla = sqlite3.connect(self._uri(generacion), uri=True, check_same_thread=False)
+            try:
+                origen.backup(ancla, pages=self.paginas_por_paso)
+            except BaseException:
+                ancla.close()
+                raise
+        finally:
+            origen.close()
+        with self._lock:
+            if self._cerrado:
+                ancla.close()
+                return
+            anterior, self._ancla = self._ancla, ancla
+            self._generacion = generacion
+            self._version_copiada = version
+        # Las conexiones libres apuntan a la copia anterior
+        while True:
+            try:
+                self._descartar(self._libres.get_nowait())
+            except queue.Empty:
+                break
+        if anterior is not None:
+            anterior.close()
+
+    def refrescar(self) -> bool:
+        """Copia de nuevo la base si cambió desde la última copia."""
+        if self._version_origen() == self._version_copiada:
+            return False
+        with self._copia_lock:
+            # Otro hilo pudo haber copiado mientras se esperaba el lock
+            version = self._version_origen()
+            if version == self._version_copiada or self._cerrado:
+                return False
+            self._copiar(version)
+            return True
+
+    def _crear_conexion(self) -> sqlite3.Connection:
+        with self._lock:
+            generacion = self._generacion
+        conn = sqlite3.connect(self._uri(generacion), uri=True,
+                               check_same_thread=False,
+                               isolation_level=None,
+                               cached_statements=TAMANO_CACHE_SENTENCIAS)
+        conn.execute('PRAGMA query_only=ON')
+        with self._lock:
+            self._generacion_de[conn] = generacion
+        return conn
+
+    def _tomar(self) -> sqlite3.Connection:
+        while True:
+            conn = super()._tomar()
+            if self._generacion_de.get(conn) == self._generacion:
+                return conn
+            self._descartar(conn)
+
+    def _devolver(self, conn: sqlite3.Connection):
+        if self._generacion_de.get(conn) != self._generacion:
+            self._descartar(conn)
+        else:
+            super()._devolver(conn)
+
+    def _descartar(self, conn: sqlite3.Connection):
+        """Cierra una conexión de una generación anterior y libera su hueco."""
+        conn.close()
+        with self._lock:
+            self._generacion_de.pop(conn, None)
+            self._creadas -= 1
+
+    @contextmanager
+    def conexion(self):
+        """Presta una conexión a la copia en memoria, refrescándola si hace falta."""
+        self.refrescar()
+        with super().conexion() as conn:
+            yield conn
+
+    def cerrar(self):
+        """Cierra las conexiones libres, la copia en memoria y la vigilancia."""
+        super().cerrar()
+        with self._lock:
+            ancla, self._ancla = self._ancla, None
+        if ancla is not None:
+            ancla.close()
+        with self._vigia_lock:
+            self._vigia.close()
+
+
+_servicios: Dict[Tuple[str, bool], ServicioBD] = {}
+_servicios_lock = threading.Lock()
+
+
+def obtener_servicio(ruta_db: str = RUTA_DB, instantanea: bool = False) -> ServicioBD:
+    """Devuelve el servicio compartido para la base de datos indicada.
+
+    Con instantanea=True devuelve un ServicioInstantanea de solo lectura.
+    """
+    clave = (os.path.abspath(ruta_db), instantanea)
+    with _servicios_lock:
+        servicio = _servicios.get(clave)
+        if servicio is None or servicio._cerrado:
+            servicio = ServicioInstantanea(ruta_db) if instantanea else ServicioBD(ruta_db)
+            _servicios[clave] = servicio
+        return servicio
+
+
+
+def _iniciar_proceso(ruta_db: str):
+    """Abre el servicio propio de un proceso del pool antes de recibir trabajo."""
+    with obtener_servicio(ruta_db).conexion():
+        pass
+
+
+def pool_procesos(procesos: int, ruta_db: str = RUTA_DB) -> ProcessPoolExecutor:
+    """Pool de procesos en el que cada proceso tiene su propio servicio.
+
+    Los procesos se arrancan con spawn y no con fork: una conexión SQLite
+    abierta en este proceso no puede usarse en un hijo, y con fork el hijo
+    heredaría el servicio compartido con sus conexiones.
+    """
+    return ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context('spawn'),
+                               initializer=_iniciar_proceso, initargs=(ruta_db,))
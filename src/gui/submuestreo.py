@@ -0,0 +1,94 @@
+from typing import Optional
+
+import matplotlib.dates as mdates
+import numpy as np
+from matplotlib.lines import Line2D
+
+
+# Un punto dibujado por cada tantos píxeles de ancho del eje
+PIXELES_POR_PUNTO = 2
+MIN_PUNTOS = 3
+
+
+def lttb(x: np.ndarray, y: np.ndarray, puntos: int) -> np.ndarray:
+    """Índices de los puntos elegidos por Largest-Triangle-Three-Buckets.
+
+    Conserva el primero y el último; de cada tramo intermedio elige el
+    punto que forma el triángulo de mayor área con el elegido antes y la
+    media del tramo siguiente, así que los picos se mantienen. x debe estar
+    ordenado y sin NaN.
+    """
+    n = len(x)
+    if puntos >= n or puntos < MIN_PUNTOS:
+        return np.arange(n)
+    elegidos = np.empty(puntos, dtype=np.int64)
+    elegidos[0], elegidos[-1] = 0, n - 1
+    # Límites de los puntos - 2 tramos entre el primero y el último
+    limites = (np.arange(puntos - 1) * (n - 2) / (puntos - 2)).astype(np.int64) + 1
+    limites[-1] = n - 1
+    a = 0
+    for i in range(puntos - 2):
+        inicio, fin = limites[i], limites[i + 1]
+        siguiente = slice(fin, max(limites[i + 2] if i + 2 < len(limites) else n, fin + 1))
+        media_x, media_y = x[siguiente].mean(), y[siguiente].mean()
+        area = np.abs((x[a] - media_x) * (y[inicio:fin] - y[a])
+                      - (x[a] - x[inicio:fin]) * (media_y - y[a]))
+        a = inicio + int(np.argmax(area))
+        elegidos[i + 1] = a
+    return elegidos
+
+
+def reducir(x: np.ndarray, y: np.ndarray, puntos: int) -> np.ndarray:
+    """Como lttb, pero admite NaN en y: se eligen entre los puntos con valor.
+
+    Si todos caben se devuelven todos, NaN incluidos, para que la línea
+    conserve sus huecos.
+    """
+    if puntos >= len(x):
+        return np.arange(len(x))
+    con_valor = np.flatnonzero(~np.isnan(y))
+    return con_valor[lttb(x[con_valor], y[con_valor], puntos)]
+
+
+def puntos_eje(ax) -> int:
+    """Puntos que caben en el ancho actual del eje."""
+    return max(int(ax.bbox.width / PIXELES_POR_PUNTO), MIN_PUNTOS)
+
+
+class LineaReducida:
+    """Line2D que dibuja solo los puntos que caben en el tramo visible.
+
+    Guarda la serie completa y vuelve a reducir cuando cambian los límites
+    del eje x (zoom) o el tamaño de la figura, sin volver a consultar. Los
+    marcadores solo se muestran cuando se dibujan todos los puntos.
+    """
+    def __init__(self, linea: Line2D, marcador: Optional[str] = 'o'):
+        self.linea = linea
+        self.marcador = marcador
+        self.x = np.array([])
+        self.y = np.array([])
+        ax = linea.axes
+        ax.callbacks.connect('xlim_changed', lambda _ax: self.reducir())
+        ax.figure.canvas.mpl_connect('resize_event', lambda _evento: self.reducir())
+
+    def set_data(self, x, y):
+        """Serie completa; x puede ser datetime64."""
+        x = np.asarray(x)
+        if np.issubdtype(x.dtype, np.datetime64):
+            x = mdates.date2num(x)
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.reducir()
+
+    def reducir(self):
+        ax = self.linea.axes
+        xmin, xmax = sorted(ax.get_xlim())
+        # Un punto más a cada lado para que la línea llegue a los bordes
+        desde = max(int(np.searchsorted(self.x, xmin)) - 1, 0)
+        hasta = min(int(np.searchsorted(self.x, xmax, side='right')) + 1, len(self.x))
+        x, y = self.x[desde:hasta], self.y[desde:hasta]
+        puntos = puntos_eje(ax)
+        elegidos = reducir(x, y, puntos)
+        self.linea.set_data(x[elegidos], y[elegidos])
+        completa = len(elegidos) == len(x)
+        self.linea.set_marker(self.marcador if completa and self.marcador else '')
@@ -0,0 +1,113 @@
+import sys
+from typing import List, Sequence
+
+import numpy as np
+
+from medir_consultas import Muestra, muestras
+from motor_estadisticas import RESOLUCIONES, ResumenPeriodo, SeriesAgrupadas, resumen_periodo, series_periodo
+from servicio_bd import RUTA_DB, ServicioBD, obtener_servicio
+
+
+# Los mismos agregados calculados directamente sobre dimensiones, sin pasar
+# por dimensiones_diarias ni por NumPy
+BRUTO_PERIODO = """
+    SELECT p.codigo, COUNT(*), COUNT(DISTINCT r.fecha),
+           IFNULL(SUM(r.cantidad), 0), IFNULL(SUM(r.duracion), 0),
+           AVG(r.intensidad), COUNT(r.intensidad),
+           IFNULL(MAX(r.cantidad), 0), IFNULL(MAX(r.duracion), 0)
+    FROM pacientes pa
+    JOIN pensamientos p ON p.paciente_id = pa.id
+    JOIN dimensiones r ON r.pensamiento_id = p.id
+    WHERE pa.codigo = ? AND r.fecha BETWEEN ? AND ?
+    GROUP BY p.codigo
+    ORDER BY p.codigo
+"""
+
+BRUTO_AGRUPADO = """
+    SELECT p.codigo, {periodo} AS periodo, COUNT(*),
+           IFNULL(SUM(r.cantidad), 0), IFNULL(SUM(r.duracion), 0),
+           AVG(r.intensidad), COUNT(r.intensidad),
+           IFNULL(MAX(r.cantidad), 0), IFNULL(MAX(r.duracion), 0)
+    FROM pacientes pa
+    JOIN pensamientos p ON p.paciente_id = pa.id
+    JOIN dimensiones r ON r.pensamiento_id = p.id
+    WHERE pa.codigo = ? AND r.fecha BETWEEN ? AND ?
+    GROUP BY p.codigo, periodo
+    ORDER BY p.codigo, periodo
+"""
+
+COLUMNAS = ('registros', 'cantidad', 'duracion', 'intensidad', 'registros_intensidad',
+            'max_cantidad', 'max_duracion')
+
+
+def _distinto(esperado: Sequence, obtenido: Sequence) -> bool:
+    esperado = np.array([np.nan if v is None else v for v in esperado], dtype=float)
+    return not np.allclose(esperado, np.asarray(obtenido, dtype=float), rtol=1e-9, equal_nan=True)
+
+
+def comparar_resumen(resumen: ResumenPeriodo, filas: List[tuple]) -> List[str]:
+    """Columnas de resumen_periodo que no coinciden con el agregado directo."""
+    if not filas:
+        return [] if not len(resumen) else ['hay pensamientos sin registros en dimensiones']
+    codigos, registros, dias, *resto = zip(*filas)
+    if list(codigos) != list(resumen.codigos):
+        return ['pensamientos distintos']
+    esperadas = dict(zip(('registros', 'dias') + COLUMNAS[1:], (registros, dias, *resto)))
+    return [nombre for nombre, valores in esperadas.items()
+            if _distinto(valores, getattr(resumen, nombre))]
+
+
+def comparar_series(series: SeriesAgrupadas, filas: List[tuple]) -> List[str]:
+    """Columnas de series_periodo que no coinciden con el agregado directo."""
+    errores = []
+    posicion = {codigo: i for i, codigo in enumerate(series.codigos)}
+    if set(posicion) != {fila[0] for fila in filas}:
+        return ['pensamientos distintos']
+    for codigo, periodo, *valores in filas:
+        columna = np.searchsorted(series.periodos, np.datetime64(periodo, 'D'))
+        if columna == len(series.periodos) or series.periodos[columna] != np.datetime64(periodo, 'D'):
+            errores.append(f'{codigo} {periodo}: periodo fuera de la serie')
+            continue
+        for nombre, esperado in zip(COLUMNAS, valores):
+            if _distinto([esperado], [getattr(series, nombre)[posicion[codigo], columna]]):
+                errores.append(f'{codigo} {periodo}: {nombre}')
+    # Los periodos sin registros deben quedar vacíos
+    if int(series.registros.sum()) != sum(fila[2] for fila in filas):
+        errores.append('registros en periodos sin datos')
+    return errores
+
+
+def verificar(servicio: ServicioBD, muestra: Muestra) -> List[str]:
+    """Diferencias entre el motor y el agregado directo para un paciente y periodo."""
+    parametros = (muestra.paciente, muestra.desde, muestra.hasta)
+    errores = [f'resumen: {e}' for e in comparar_resumen(
+        resumen_periodo(servicio, *parametros), servicio.consultar(BRUTO_PERIODO, parametros))]
+    for resolucion, (periodo, _, _) in RESOLUCIONES.items():
+        series = series_periodo(servicio, *parametros, resolucion)
+        filas = servicio.consultar(BRUTO_AGRUPADO.format(periodo=periodo), parametros)
+        errores.extend(f'{resolucion}: {e}' for e in comparar_series(series, filas))
+    return errores
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Comprueba el motor de estadísticas contra agregados directos de dimensiones')
+    parser.add_argument('--db', default=RUTA_DB, help='ruta de la base de datos')
+    parser.add_argument('--muestras', type=int, default=20, help='pacientes y periodos al azar')
+    parser.add_argument('--dias', type=int, default=120, help='días de cada periodo')
+    parser.add_argument('--semilla', type=int, default=None)
+    args = parser.parse_args()
+
+    servicio = obtener_servicio(args.db)
+    with servicio.conexion() as conn:
+        elegidas = muestras(conn, args.muestras, args.dias, args.semilla)
+    fallos = 0
+    for muestra in elegidas:
+        errores = verificar(servicio, muestra)
+        fallos += bool(errores)
+        for error in errores:
+            print(f'FALLO {muestra.paciente} {muestra.desde}..{muestra.hasta} {error}')
+    print(f'{len(elegidas) - fallos}/{len(elegidas)} periodos coinciden')
+    sys.exit(1 if fallos else 0)
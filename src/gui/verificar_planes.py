@@ -0,0 +1,44 @@
+import sqlite3
+import sys
+from typing import List, Tuple
+
+from esquema import plan_consulta
+from medir_consultas import CONSULTAS, Muestra, muestras
+from servicio_bd import RUTA_DB, obtener_servicio
+
+
+def recorridos_completos(conn: sqlite3.Connection, muestra: Muestra) -> List[Tuple[str, str]]:
+    """[(consulta, paso)] de las consultas registradas que recorren una tabla completa.
+
+    Se comprueban las mismas sentencias que ejecutan las ventanas, con
+    parámetros reales; las pesadas y las que recorren a propósito no cuentan.
+    """
+    problemas = []
+    for nombre, consulta in CONSULTAS.items():
+        if consulta.pesada or consulta.recorrido:
+            continue
+        for detalle in plan_consulta(conn, consulta.sql, consulta.parametros(muestra)):
+            if detalle.startswith('SCAN') and detalle != 'SCAN CONSTANT ROW':
+                problemas.append((nombre, detalle))
+    return problemas
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Falla si alguna consulta de las ventanas '
+                                                 'recorre una tabla completa')
+    parser.add_argument('--db', default=RUTA_DB, help='ruta de la base de datos')
+    args = parser.parse_args()
+
+    with obtener_servicio(args.db).conexion() as conn:
+        elegidas = muestras(conn, 1, semilla=0)
+        if not elegidas:
+            print('La base no tiene dimensiones con las que comprobar')
+            sys.exit(1)
+        problemas = recorridos_completos(conn, elegidas[0])
+    for nombre, detalle in problemas:
+        print(f'{nombre}: {detalle}')
+    if problemas:
+        sys.exit(1)
+    print('Ninguna consulta recorre tablas completas')